@@ -0,0 +1,232 @@
+"""苦手なローマ字の並びを練習させる課題文の選び方（--adaptive）
+
+プレイヤーごとに、遅かったりミスしたりした2文字の並び（"ky"、"ts" など）の重みを
+打鍵のたびに加算しておく。次の課題文は、重みの大きい並びを多く含むものを
+「並び → その並びを含む課題文の番号」の転置インデックスから選ぶ。
+
+1回の選択で調べるのは、重みの大きい並び TOP_BIGRAMS 個の転置リストから
+SAMPLES 件ずつの候補だけで、候補の採点も転置リストの二分探索なので、
+課題文が何万件あっても1ミリ秒かからない。
+
+転置インデックスは課題文が設定されたときにバックグラウンドのスレッドで作り、
+出来上がったものと入れ替える（課題文パックでは数百ミリ秒かかるので、Tk の
+メインループでは作らない）。出来上がるまでは通常の山札から引く。
+"""
+import bisect
+import threading
+from array import array
+
+# 採点に使う苦手な並びの数と、並びごとに調べる候補の数
+TOP_BIGRAMS = 4
+SAMPLES = 16
+
+# 重み（ミス1回と、平均より遅かった割合）
+MISS_WEIGHT = 2.0
+MAX_SLOW_WEIGHT = 3.0
+# 課題文を選ぶたびに重みに掛ける値（昔の苦手より最近の苦手を優先）
+DECAY = 0.8
+MIN_WEIGHT = 0.05
+
+# ときどき苦手と関係なく山札から選ぶ割合
+EXPLORE_RATE = 0.2
+
+# 転置インデックスに入れる課題文の上限（課題文パックなど、これより多ければ間引く）
+MAX_INDEXED = 50000
+
+# 打鍵間隔の平均を更新する割合
+INTERVAL_SMOOTHING = 0.05
+
+
+def romaji_bigrams(romaji):
+    return {romaji[i : i + 2] for i in range(len(romaji) - 1)}
+
+
+class BigramIndex:
+    """ローマ字の2文字の並び → その並びを含む課題文の番号（昇順の array）
+
+    課題文リストに追加された課題文は sync() で追加分だけ索引に加える。
+    AdaptiveSelector が選択に使っている索引は変更せず、extended() で作った新しい索引と入れ替える。
+    """
+
+    def __init__(self, max_sentences=MAX_INDEXED):
+        self.max_sentences = max_sentences
+        self.postings = {}
+        self.words = None
+        self.indexed = 0  # 索引に入れた課題文の数（リストの場合）
+
+    def sync(self, words):
+        """words の索引を作る（同じリストに課題文が追加されていれば追加分だけ）"""
+        if words is not self.words or len(words) < self.indexed:
+            self.words = words
+            self.indexed = 0
+            self.postings = {}
+            if not isinstance(words, list) and len(words) > self.max_sentences:
+                # 課題文パックは等間隔に間引いて索引を作る
+                step = len(words) / self.max_sentences
+                for i in range(self.max_sentences):
+                    self._add(int(i * step), words[int(i * step)])
+                self.indexed = len(words)
+                return
+
+        for index in range(self.indexed, len(words)):
+            self._add(index, words[index])
+        self.indexed = len(words)
+
+    def extended(self, words):
+        """words の索引を新しく作る（この索引が同じリストのものなら、写してから追加分だけ加える）"""
+        index = BigramIndex(self.max_sentences)
+        if words is self.words and len(words) >= self.indexed:
+            index.words = words
+            index.indexed = self.indexed
+            index.postings = {
+                bigram: array("I", sentences) for bigram, sentences in self.postings.items()
+            }
+        index.sync(words)
+        return index
+
+    def is_ready(self, words):
+        """words の課題文をすべて索引に入れたか"""
+        return words is self.words and len(words) == self.indexed
+
+    def _add(self, index, word):
+        postings = self.postings
+        for bigram in romaji_bigrams(word["romaji"]):
+            sentences = postings.get(bigram)
+            if sentences is None:
+                sentences = postings[bigram] = array("I")
+            sentences.append(index)
+
+    def contains(self, bigram, index):
+        sentences = self.postings.get(bigram)
+        if not sentences:
+            return False
+        i = bisect.bisect_left(sentences, index)
+        return i < len(sentences) and sentences[i] == index
+
+
+class WeaknessTracker:
+    """1人分の苦手な並び（並び → 重み）"""
+
+    def __init__(self):
+        self.weights = {}
+        self.mean_interval = None  # 打鍵間隔の移動平均 (ns)
+
+    def record(self, previous, target, correct, interval):
+        bigram = previous + target
+        if not correct:
+            self.weights[bigram] = self.weights.get(bigram, 0.0) + MISS_WEIGHT
+            return
+
+        mean = self.mean_interval
+        if mean is None:
+            self.mean_interval = interval
+            return
+        # 平均より遅かった分だけ重くする
+        slow = interval / mean - 1 if mean > 0 else 0
+        if slow > 0:
+            self.weights[bigram] = self.weights.get(bigram, 0.0) + min(slow, MAX_SLOW_WEIGHT)
+        self.mean_interval = mean + (interval - mean) * INTERVAL_SMOOTHING
+
+    def decay(self):
+        self.weights = {
+            bigram: weight * DECAY
+            for bigram, weight in self.weights.items()
+            if weight * DECAY >= MIN_WEIGHT
+        }
+
+
+class AdaptiveSelector:
+    """全プレイヤーの苦手な並びを多く含む課題文を選ぶ（TypingEngine.selector に設定する）"""
+
+    def __init__(self, player_count, rng):
+        self.rng = rng
+        # 選択に使う、出来上がった転置インデックス（まだなければ空）
+        self.index = BigramIndex()
+        self.trackers = [WeaknessTracker() for _ in range(player_count)]
+
+        self._lock = threading.Lock()
+        self._indexing = None  # 別スレッドで索引を作っている課題文
+        self._pending = None  # その次に索引を作る課題文
+
+    def update_index(self, words, background=True):
+        """words の転置インデックスを作る（TypingEngine.set_words() から呼ばれる）
+
+        background なら別スレッドで作り、出来上がったら self.index と入れ替える。
+        作っている間に別の課題文が設定されたら、終わってから最後の課題文で作り直す。
+        """
+        if self.index.is_ready(words):
+            return
+        if not background:
+            self.index = self.index.extended(words)
+            return
+        with self._lock:
+            if self._indexing is not None:
+                if words is not self._indexing:
+                    self._pending = words
+                return
+            self._indexing = words
+        threading.Thread(target=self._build_index, args=(words,), daemon=True).start()
+
+    def _build_index(self, words):
+        while words is not None:
+            self.index = self.index.extended(words)
+            with self._lock:
+                words, self._pending = self._pending, None
+                self._indexing = words
+
+    def reset(self):
+        """苦手な並びを忘れる（転置インデックスはそのまま）"""
+        self.trackers = [WeaknessTracker() for _ in self.trackers]
+
+    def record_key(self, player, previous, target, correct, interval):
+        """1打鍵を記録する（previous は同じ課題文で直前に正しく入力した文字、interval はそこからの ns）"""
+        if previous is None or not target or player >= len(self.trackers):
+            return
+        self.trackers[player].record(previous, target, correct, interval)
+
+    def weak_bigrams(self):
+        """全プレイヤーの重みを合わせた、重みの大きい並び TOP_BIGRAMS 個"""
+        combined = {}
+        for tracker in self.trackers:
+            for bigram, weight in tracker.weights.items():
+                combined[bigram] = combined.get(bigram, 0.0) + weight
+        return sorted(combined.items(), key=lambda item: item[1], reverse=True)[:TOP_BIGRAMS]
+
+    def choose(self, words, deck):
+        """次の課題文の番号を deck から引いて返す（選べなければ None で、通常の山札から引く）
+
+        転置インデックスは出来上がったものを読むだけで、ここでは作らない。課題文が
+        追加されていれば追加分の索引をバックグラウンドで作り始め、それまでは
+        索引にある課題文から選ぶ。
+        """
+        index = self.index
+        if not index.is_ready(words):
+            self.update_index(words)
+        weak = self.weak_bigrams()
+        for tracker in self.trackers:
+            tracker.decay()
+        stale = index.words is not words or index.indexed > len(words)
+        if stale or not weak or self.rng.random() < EXPLORE_RATE:
+            return None
+
+        best = None
+        best_score = 0.0
+        for bigram, _ in weak:
+            sentences = index.postings.get(bigram)
+            if not sentences:
+                continue
+            # 転置リストのランダムな位置から SAMPLES 件を候補にする
+            start = self.rng.randrange(len(sentences))
+            for offset in range(min(SAMPLES, len(sentences))):
+                candidate = sentences[(start + offset) % len(sentences)]
+                if deck.is_drawn(candidate):
+                    continue
+                score = sum(
+                    weight for other, weight in weak if index.contains(other, candidate)
+                )
+                if score > best_score:
+                    best, best_score = candidate, score
+
+        if best is None or not deck.take(best):
+            return None
+        return best
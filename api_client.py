@@ -0,0 +1,288 @@
+"""課題文生成 API のクライアント（接続の共有・タイムアウト・リトライ・サーキットブレーカー）
+
+OpenAI クライアント自体のリトライは使わず、ここで次のように制御する。
+
+- クライアントは1つを使い回して接続（コネクションプール）を共有し、
+  接続と応答にそれぞれタイムアウトを設ける
+- 1回の呼び出しには全体の期限（deadline）があり、リトライを含めて期限を超えない
+- 429 / 5xx / 接続エラー / タイムアウトは、ジッター付きの指数バックオフでリトライする
+  （429 で Retry-After が返された場合はそれ以上待つ）
+- 失敗が続いたらサーキットブレーカーを開き、しばらくは API を呼ばずに
+  CircuitOpenError を返す（呼び出し側はすぐにキャッシュやデフォルトの課題文を使える）
+"""
+import asyncio
+import random
+import threading
+import time
+
+import openai
+from openai import AsyncOpenAI, OpenAI
+
+
+class CircuitOpenError(Exception):
+    """サーキットブレーカーが開いているため API を呼ばなかった"""
+
+
+class DeadlineExceeded(Exception):
+    """呼び出し全体の期限を過ぎた"""
+
+
+class CircuitBreaker:
+    """連続した失敗が threshold 回に達したら reset_timeout 秒間 API を呼ばない
+
+    期限が過ぎると1回だけ試し（half-open）、成功すれば閉じ、失敗すれば再び開く。
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self.trips = 0  # 開いた回数
+        self._trial = False  # half-open で試している呼び出しがある
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return self.CLOSED
+        if self.clock() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self):
+        """API を呼んでよいかどうか"""
+        with self._lock:
+            state = self.state
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def release_trial(self):
+        """成功とも失敗とも記録せずに half-open の試行を終える（キャンセルされた場合など）
+
+        次の呼び出しが改めて試行になる。
+        """
+        with self._lock:
+            self._trial = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.threshold:
+                if self.opened_at is None or self._trial:
+                    self.trips += 1
+                self.opened_at = self.clock()
+                self._trial = False
+
+
+class RetryPolicy:
+    """リトライするエラーの判定と待ち時間の計算（同期版・非同期版で共有）"""
+
+    def __init__(self, max_retries=3, base_delay=0.5, max_delay=8.0, rng=None):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rng = rng or random.Random()
+
+    @staticmethod
+    def is_retryable(error):
+        if isinstance(error, (openai.RateLimitError, openai.APIConnectionError)):
+            return True
+        return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+    def delay(self, attempt, error):
+        """attempt 回目（0 から）の失敗の後に待つ秒数（フルジッター）"""
+        delay = self.rng.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+        if isinstance(error, openai.RateLimitError):
+            retry_after = error.response.headers.get("retry-after")
+            try:
+                delay = max(delay, min(self.max_delay, float(retry_after)))
+            except (TypeError, ValueError):
+                pass
+        return delay
+
+
+class ApiStats:
+    """呼び出し回数などの集計（ベンチマークやログ用）"""
+
+    def __init__(self):
+        self.calls = 0
+        self.attempts = 0
+        self.retries = 0
+        self.failures = 0
+        self.rejected = 0  # サーキットブレーカーで呼ばなかった回数
+
+    def __repr__(self):
+        return (
+            f"calls={self.calls} attempts={self.attempts} retries={self.retries}"
+            f" failures={self.failures} rejected={self.rejected}"
+        )
+
+
+def _timeout(request_timeout, connect_timeout):
+    return openai.Timeout(request_timeout, connect=connect_timeout)
+
+
+class _ApiClientBase:
+    def __init__(
+        self,
+        request_timeout,
+        connect_timeout,
+        deadline,
+        retry,
+        breaker,
+    ):
+        self.request_timeout = request_timeout
+        self.connect_timeout = connect_timeout
+        self.deadline = deadline
+        self.retry = retry or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self.stats = ApiStats()
+
+    def _check_breaker(self):
+        self.stats.calls += 1
+        if not self.breaker.allow():
+            self.stats.rejected += 1
+            raise CircuitOpenError("sentence API is temporarily disabled after failures")
+
+    def _attempt_timeout(self, expires_at):
+        """今回の試行に使えるタイムアウト（期限を過ぎていれば DeadlineExceeded）"""
+        remaining = expires_at - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded(f"no response within {self.deadline:.0f} s")
+        return _timeout(min(self.request_timeout, remaining), self.connect_timeout)
+
+    def stream_failed(self):
+        """ストリーミング応答を読んでいる途中で失敗した（応答の開始は成功として記録済み）"""
+        self.stats.failures += 1
+        self.breaker.record_failure()
+
+    def _handle_failure(self, attempt, error, expires_at):
+        """失敗を記録し、リトライするなら待つ秒数を返す（しないなら例外を送出）"""
+        if not self.retry.is_retryable(error):
+            # 400 や 401 などはサーバーが応答しているので障害とはみなさない
+            self.breaker.record_success()
+            self.stats.failures += 1
+            raise error
+
+        self.breaker.record_failure()
+        breaker_closed = self.breaker.state == CircuitBreaker.CLOSED
+        if attempt >= self.retry.max_retries or not breaker_closed:
+            self.stats.failures += 1
+            raise error
+
+        delay = self.retry.delay(attempt, error)
+        if time.monotonic() + delay >= expires_at:
+            self.stats.failures += 1
+            raise error
+        self.stats.retries += 1
+        return delay
+
+
+class ApiClient(_ApiClientBase):
+    """OpenAI クライアントをリトライとサーキットブレーカーで包んだもの"""
+
+    def __init__(
+        self,
+        api_key=None,
+        base_url=None,
+        request_timeout=20.0,
+        connect_timeout=5.0,
+        deadline=45.0,
+        retry=None,
+        breaker=None,
+    ):
+        super().__init__(request_timeout, connect_timeout, deadline, retry, breaker)
+        # リトライはこのクラスで行うので OpenAI クライアントのリトライは無効にする
+        self.client = OpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            timeout=_timeout(request_timeout, connect_timeout),
+            max_retries=0,
+        )
+
+    def create_chat_completion(self, **kwargs):
+        """chat.completions.create() を期限・リトライ付きで呼ぶ"""
+        self._check_breaker()
+        expires_at = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            timeout = self._attempt_timeout(expires_at)
+            self.stats.attempts += 1
+            try:
+                response = self.client.chat.completions.create(timeout=timeout, **kwargs)
+            except openai.APIError as e:
+                time.sleep(self._handle_failure(attempt, e, expires_at))
+                attempt += 1
+                continue
+            except BaseException:
+                # API の失敗以外で中断しても half-open の試行を残さない（残すと二度と呼べない）
+                self.breaker.release_trial()
+                raise
+            self.breaker.record_success()
+            return response
+
+    def close(self):
+        self.client.close()
+
+
+class AsyncApiClient(_ApiClientBase):
+    """ApiClient の asyncio 版（同時リクエストは1つのコネクションプールを共有する）"""
+
+    def __init__(
+        self,
+        api_key=None,
+        base_url=None,
+        request_timeout=20.0,
+        connect_timeout=5.0,
+        deadline=45.0,
+        retry=None,
+        breaker=None,
+    ):
+        super().__init__(request_timeout, connect_timeout, deadline, retry, breaker)
+        self.client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            timeout=_timeout(request_timeout, connect_timeout),
+            max_retries=0,
+        )
+
+    async def create_chat_completion(self, **kwargs):
+        self._check_breaker()
+        expires_at = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            timeout = self._attempt_timeout(expires_at)
+            self.stats.attempts += 1
+            try:
+                response = await self.client.chat.completions.create(
+                    timeout=timeout, **kwargs
+                )
+            except openai.APIError as e:
+                await asyncio.sleep(self._handle_failure(attempt, e, expires_at))
+                attempt += 1
+                continue
+            except BaseException:
+                # CancelledError などでも half-open の試行を残さない
+                self.breaker.release_trial()
+                raise
+            self.breaker.record_success()
+            return response
+
+    async def close(self):
+        await self.client.close()
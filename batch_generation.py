@@ -0,0 +1,163 @@
+"""複数の推奨年齢の課題文をまとめて生成する
+
+推奨年齢ごと・バッチ（30 文）ごとのリクエストを非同期クライアントで同時に送り、
+結果を推奨年齢ごとの課題文プールにまとめてキャッシュに保存する。
+
+    python batch_generation.py --user-types 7歳 12歳 --batches 3 --concurrency 4
+
+    # ローカルの代替サーバーに向けて試す（API キーは任意の文字列でよい）
+    python benchmarks/fake_openai_server.py --port 8765 &
+    OPENAI_API_KEY=dummy python batch_generation.py \\
+        --base-url http://127.0.0.1:8765/v1 --batches 10
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from api_client import AsyncApiClient
+from dedup import DedupIndex
+from prompt import MODEL, get_kadai_list_creation_prompt
+from sentence_parser import make_word, parse_response
+
+USER_TYPES = ["7歳", "12歳", "15歳", "18歳", "20歳以上"]
+
+
+class BatchResult:
+    """バッチ生成の結果（推奨年齢ごとの課題文プールと失敗したリクエスト）"""
+
+    def __init__(self):
+        self.pools = {}  # 推奨年齢 -> 課題文データのリスト
+        self.errors = []  # (推奨年齢, 例外)
+        self.requests = 0
+        self.elapsed = 0.0
+        # 推奨年齢をまたいで、同じ内容の課題文は最初に生成されたプールにだけ入れる
+        self.seen = DedupIndex()
+
+    def merge(self, user_type, words):
+        """課題文をプールに追加し、追加した件数を返す"""
+        fresh = self.seen.filter(words)
+        self.pools.setdefault(user_type, []).extend(fresh)
+        return len(fresh)
+
+
+async def request_batch(client, user_type, semaphore):
+    """1バッチ分の課題文を生成して課題文データのリストを返す"""
+    async with semaphore:
+        response = await client.create_chat_completion(
+            model=MODEL,
+            messages=[
+                {"role": "user", "content": get_kadai_list_creation_prompt(user_type)}
+            ],
+            temperature=0.7,
+            max_tokens=2000,
+        )
+
+    words = []
+    for item in parse_response(response.choices[0].message.content):
+        word = make_word(item)
+        if word:
+            words.append(word)
+    return words
+
+
+async def generate_batches(client, user_types, batches=1, concurrency=4):
+    """推奨年齢ごとに batches 回ずつ、同時に最大 concurrency 件のリクエストで生成する"""
+    semaphore = asyncio.Semaphore(concurrency)
+    result = BatchResult()
+    started = time.perf_counter()
+
+    async def run(user_type):
+        try:
+            words = await request_batch(client, user_type, semaphore)
+        except Exception as e:
+            result.errors.append((user_type, e))
+            return
+        result.merge(user_type, words)
+
+    jobs = [run(user_type) for _ in range(batches) for user_type in user_types]
+    result.requests = len(jobs)
+    await asyncio.gather(*jobs)
+
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def run_batch_generation(
+    user_types,
+    batches=1,
+    concurrency=4,
+    api_key=None,
+    base_url=None,
+    cache=None,
+):
+    """バッチ生成を実行して BatchResult を返す（cache があれば推奨年齢ごとに保存する）
+
+    新しいイベントループで実行するので、Tk のメインループとは別のスレッドから呼ぶ。
+    """
+
+    async def main():
+        # 同時リクエストはすべて1つのコネクションプールを共有する
+        client = AsyncApiClient(api_key=api_key, base_url=base_url)
+        try:
+            return await generate_batches(client, user_types, batches, concurrency)
+        finally:
+            await client.close()
+
+    result = asyncio.run(main())
+
+    if cache is not None:
+        for user_type, words in result.pools.items():
+            if words:
+                cache.put(user_type, words)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="複数の推奨年齢の課題文をまとめて生成する")
+    parser.add_argument(
+        "--user-types",
+        nargs="+",
+        default=USER_TYPES,
+        metavar="USER_TYPE",
+        help="生成する推奨年齢（既定はすべて）",
+    )
+    parser.add_argument("--batches", type=int, default=1, help="推奨年齢ごとのリクエスト数")
+    parser.add_argument("--concurrency", type=int, default=4, help="同時に送るリクエスト数の上限")
+    parser.add_argument("--base-url", help="OpenAI 互換 API の URL")
+    parser.add_argument(
+        "--no-cache", action="store_true", help="生成した課題文をキャッシュに保存しない"
+    )
+    args = parser.parse_args()
+
+    cache = None
+    if not args.no_cache:
+        from sentence_cache import SentenceCache
+
+        cache = SentenceCache()
+
+    result = run_batch_generation(
+        args.user_types,
+        batches=args.batches,
+        concurrency=args.concurrency,
+        api_key=os.getenv("OPENAI_API_KEY"),
+        base_url=args.base_url,
+        cache=cache,
+    )
+
+    print(
+        f"{result.requests} requests in {result.elapsed:.2f} s"
+        f" ({result.requests / max(result.elapsed, 1e-9):.1f} req/s),"
+        f" {len(result.errors)} failed"
+    )
+    for user_type in args.user_types:
+        print(f"  {user_type:<8} {len(result.pools.get(user_type, [])):>5} sentences")
+    for user_type, error in result.errors:
+        print(f"  {user_type}: {error}")
+
+    if cache is not None:
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
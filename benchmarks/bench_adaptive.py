@@ -0,0 +1,121 @@
+"""苦手に合わせた課題文の選択（adaptive.py）の処理時間と効果を測る
+
+ランダムなカタカナから大量の課題文を作り、特定の並び（既定では "ky" と "ts"）で
+よくミスして遅くなるプレイヤーに試合をさせる。
+
+- 転置インデックスを作る時間
+- 課題文1回の選択にかかる時間 p50 / p99 / max
+- 出た課題文のうち苦手な並びを含むものの割合（通常の山札から選んだ場合と比べる）
+
+を表示する。選択の p99 が 1 ms を超えたら終了コード 1。
+
+    python benchmarks/bench_adaptive.py
+    python benchmarks/bench_adaptive.py --sentences 200000 --weak ky ts sh
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from adaptive import AdaptiveSelector, BigramIndex, romaji_bigrams  # noqa: E402
+from engine import COMPLETED, TypingEngine  # noqa: E402
+from romaji import katakana_to_romaji  # noqa: E402
+
+KANA = (
+    "アイウエオカキクケコサシスセソタチツテトナニヌネノハヒフヘホマミムメモヤユヨラリルレロワ"
+    "ガギグゲゴザジズゼゾダデドバビブベボパピプペポ"
+)
+YOUON = ("キャ", "キュ", "キョ", "シャ", "シュ", "ショ", "チャ", "チュ", "チョ", "リョ")
+
+
+def make_words(count, rng):
+    words = []
+    for _ in range(count):
+        parts = []
+        for _ in range(rng.randint(6, 14)):
+            parts.append(rng.choice(YOUON) if rng.random() < 0.08 else rng.choice(KANA))
+        katakana = "".join(parts)
+        words.append(
+            {"japanese": katakana, "katakana": katakana, "romaji": katakana_to_romaji(katakana)}
+        )
+    return words
+
+
+def play(words, keys, weak, adaptive, seed):
+    """苦手な並びでよくミスするプレイヤーに打鍵させ、(出た課題文, 選択時間) を返す"""
+    rng = random.Random(seed)
+    engine = TypingEngine(words, 1, rng=random.Random(seed))
+    choose_ns = []
+    if adaptive:
+        selector = AdaptiveSelector(1, engine.rng)
+        selector.update_index(words, background=False)
+        choose = selector.choose
+
+        def timed_choose(words, deck):
+            start = time.perf_counter_ns()
+            index = choose(words, deck)
+            choose_ns.append(time.perf_counter_ns() - start)
+            return index
+
+        selector.choose = timed_choose
+        engine.selector = selector
+
+    timestamp = 0
+    engine.start(timestamp)
+    shown = [engine.current_word_data]
+    player = engine.players[0]
+    for _ in range(keys):
+        expected = engine.automaton.expected_char(player.state)
+        bigram = (player.typed[-1] if player.typed else "") + expected
+        hard = bigram in weak
+        timestamp += 600_000_000 if hard else 150_000_000
+        char = expected
+        if hard and rng.random() < 0.4:
+            char = "q" if expected != "q" else "x"
+        if engine.feed(0, char, timestamp) == COMPLETED:
+            shown.append(engine.current_word_data)
+    return shown, choose_ns
+
+
+def weak_share(shown, weak):
+    return sum(1 for word in shown if romaji_bigrams(word["romaji"]) & weak) / len(shown)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sentences", type=int, default=100000, help="課題文の数")
+    parser.add_argument("--keys", type=int, default=50000, help="打鍵数")
+    parser.add_argument("--weak", nargs="+", default=["ky", "ts"], help="苦手な並び")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    weak = set(args.weak)
+    words = make_words(args.sentences, random.Random(args.seed))
+
+    start = time.perf_counter()
+    BigramIndex().sync(words)
+    print(f"index: {args.sentences} sentences in {time.perf_counter() - start:.2f} s")
+
+    baseline, _ = play(words, args.keys, weak, False, args.seed)
+    shown, choose_ns = play(words, args.keys, weak, True, args.seed)
+    choose_ns.sort()
+    p99 = choose_ns[len(choose_ns) * 99 // 100]
+    print(
+        f"choose: {len(choose_ns)} selections, p50 {choose_ns[len(choose_ns) // 2] / 1000:.0f} us,"
+        f" p99 {p99 / 1000:.0f} us, max {choose_ns[-1] / 1000:.0f} us"
+    )
+    print(
+        f"sentences with {'/'.join(sorted(weak))}:"
+        f" random {weak_share(baseline, weak) * 100:.1f}% ({len(baseline)} sentences),"
+        f" adaptive {weak_share(shown, weak) * 100:.1f}% ({len(shown)} sentences)"
+    )
+    if p99 > 1_000_000:
+        print("FAILED: selection p99 is over 1 ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
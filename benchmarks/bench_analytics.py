@@ -0,0 +1,146 @@
+"""試合の分析（match_analytics.py）の処理時間を測る
+
+合成した打鍵で多数の試合の記録（.vtdr）を作り、
+
+- 記録を読み込んで列にする時間
+- NPZ / CSV への書き出しと読み込みの時間
+- 分析（キーごとのミス率・2文字の並びごとの打鍵間隔・試合ごとの変化）の時間
+
+を表示する。列にした previous / interval_ns が、1打鍵ずつ求めた値と一致しなければ
+終了コード 1。
+
+    python benchmarks/bench_analytics.py
+    python benchmarks/bench_analytics.py --matches 5000 --keys 600
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import TypingEngine  # noqa: E402
+from match_analytics import (  # noqa: E402
+    analyze,
+    load_csv,
+    load_npz,
+    load_recordings,
+    recording_paths,
+    save_csv,
+    save_npz,
+)
+from recorder import KeystrokeRecorder  # noqa: E402
+from romaji import katakana_to_romaji  # noqa: E402
+
+SAMPLE_KATAKANA = [
+    "イヌモアルケバボウニアタル",
+    "ヒャクブンハイッケンニシカズ",
+    "キョウハコウエンデサッカーヲシマシタ",
+    "ナツヤスミニカゾクデウミヘイキマシタ",
+    "トショカンデシュクダイヲシテカエリマス",
+]
+
+
+def make_recording(words, keys, rng, started_at):
+    """2人が交互に打鍵する1試合分の記録（プレイヤーごとに苦手なキーと速さが違う）"""
+    engine = TypingEngine(words, 2, rng=rng)
+    engine.recorder = KeystrokeRecorder(2, started_at)
+    timestamp = 0
+    engine.start(timestamp)
+    for _ in range(keys):
+        player = rng.randrange(2)
+        timestamp += int(rng.expovariate(1 / (150e6 if player == 0 else 250e6)))
+        expected = engine.automaton.expected_char(engine.players[player].state)
+        miss_rate = 0.3 if expected in "ky" else 0.03
+        char = ("x" if expected != "x" else "q") if rng.random() < miss_rate else expected
+        engine.feed(player, char, timestamp)
+    return engine.recorder
+
+
+def reference_previous(columns, rows):
+    """rows の打鍵の previous / interval_ns を1打鍵ずつ求める（確認用）"""
+    results = []
+    for row in rows:
+        previous, interval = 0, -1
+        for other in range(row - 1, -1, -1):
+            same = all(
+                columns[name][other] == columns[name][row] for name in ("match", "player", "sentence")
+            )
+            if same and columns["correct"][other]:
+                previous = columns["char"][other]
+                interval = columns["timestamp_ns"][row] - columns["timestamp_ns"][other]
+                break
+            if columns["match"][other] != columns["match"][row]:
+                break
+        results.append((previous, interval))
+    return results
+
+
+def timed(label, function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    print(f"{label:<24} {time.perf_counter() - start:7.2f} s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--matches", type=int, default=2000, help="試合数")
+    parser.add_argument("--keys", type=int, default=500, help="1試合あたりの打鍵数")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    words = [
+        {"japanese": katakana, "katakana": katakana, "romaji": katakana_to_romaji(katakana)}
+        for katakana in SAMPLE_KATAKANA
+    ]
+
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        for i in range(args.matches):
+            recording = make_recording(words, args.keys, rng, 1_700_000_000 + i * 600)
+            recording.save(os.path.join(directory, f"match-{i:06d}.vtdr"))
+        print(
+            f"generated {args.matches} matches ({args.matches * args.keys} keystrokes)"
+            f" in {time.perf_counter() - start:.1f} s"
+        )
+
+        paths = recording_paths([directory])
+        columns, matches = timed("load recordings", load_recordings, paths)
+
+        npz_path = os.path.join(directory, "matches.npz")
+        csv_path = os.path.join(directory, "matches.csv")
+        timed("save npz", save_npz, npz_path, columns, matches)
+        timed("load npz", load_npz, npz_path)
+        timed("save csv", save_csv, csv_path, columns, matches)
+        csv_columns, _ = timed("load csv", load_csv, csv_path)
+        report = timed("analyze", analyze, columns, matches)
+        print()
+        print(report)
+        print()
+        print(
+            f"npz {os.path.getsize(npz_path) / 1e6:.1f} MB,"
+            f" csv {os.path.getsize(csv_path) / 1e6:.1f} MB"
+        )
+
+    ok = True
+    sample = rng.sample(range(len(columns["match"])), min(2000, len(columns["match"])))
+    expected = reference_previous(columns, sample)
+    for row, (previous, interval) in zip(sample, expected):
+        if (columns["previous"][row], columns["interval_ns"][row]) != (previous, interval):
+            print(f"FAILED: row {row} previous/interval differs from the reference")
+            ok = False
+            break
+    for name in ("previous", "interval_ns", "correct"):
+        if not (csv_columns[name] == columns[name]).all():
+            print(f"FAILED: column {name} changed after the CSV round trip")
+            ok = False
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""API クライアント（api_client.py）の障害時の振る舞いを確かめる
+
+障害を注入したローカル代替サーバー（fake_openai_server.py）に対して ApiClient で
+課題文生成を呼び出し、シナリオごとに成功数・1回の呼び出しにかかった時間・リトライ回数・
+サーキットブレーカーの状態を表示する。期待どおりでないシナリオがあれば終了コード 1。
+
+    python benchmarks/bench_api_client.py
+    python benchmarks/bench_api_client.py --calls 50 --latency 0.1
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api_client import ApiClient, CircuitBreaker, RetryPolicy  # noqa: E402
+from fake_openai_server import FakeOpenAIServer  # noqa: E402
+from prompt import MODEL, get_kadai_list_creation_prompt  # noqa: E402
+from sentence_parser import parse_response  # noqa: E402
+
+
+def run_scenario(name, calls, latency, seed, server_options, expect):
+    server = FakeOpenAIServer(latency=latency, seed=seed, **server_options)
+    server.start()
+    client = ApiClient(
+        api_key="fake",
+        base_url=server.base_url,
+        request_timeout=0.5 + latency,
+        connect_timeout=0.5,
+        deadline=3.0,
+        retry=RetryPolicy(max_retries=3, base_delay=0.05, max_delay=0.5),
+        breaker=CircuitBreaker(threshold=5, reset_timeout=60.0),
+    )
+
+    prompt = get_kadai_list_creation_prompt("12歳")
+    succeeded = 0
+    durations = []
+    try:
+        for _ in range(calls):
+            start = time.perf_counter()
+            try:
+                response = client.create_chat_completion(
+                    model=MODEL, messages=[{"role": "user", "content": prompt}]
+                )
+                parse_response(response.choices[0].message.content)
+                succeeded += 1
+            except Exception:
+                # 失敗した呼び出し（CircuitOpenError を含む）も時間は計測する
+                pass
+            durations.append(time.perf_counter() - start)
+    finally:
+        client.close()
+        server.shutdown()
+        server.server_close()
+
+    durations.sort()
+    result = {
+        "succeeded": succeeded,
+        "retries": client.stats.retries,
+        "rejected": client.stats.rejected,
+        "trips": client.breaker.trips,
+        "max_s": durations[-1],
+    }
+    problems = [message for check, message in expect if not check(result)]
+    print(
+        f"{name:<14} {succeeded:>3}/{calls} ok,"
+        f" p50 {durations[len(durations) // 2] * 1000:7.1f} ms,"
+        f" max {durations[-1] * 1000:7.1f} ms,"
+        f" injected {server.failures:>3}, {client.stats!r},"
+        f" breaker {client.breaker.state} (trips {client.breaker.trips})"
+        f"  {'ok' if not problems else 'FAILED: ' + '; '.join(problems)}"
+    )
+    return not problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=20, help="シナリオごとの呼び出し回数")
+    parser.add_argument("--latency", type=float, default=0.05, help="代替サーバーの応答時間")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    calls = args.calls
+
+    scenarios = [
+        (
+            "healthy",
+            {},
+            [(lambda r: r["succeeded"] == calls, "all calls should succeed")],
+        ),
+        (
+            "429 burst",
+            {"fail_first": 2, "fail_status": 429, "retry_after": 0.1},
+            [
+                (lambda r: r["succeeded"] == calls, "retries should absorb the 429s"),
+                (lambda r: r["retries"] == 2, "expected exactly 2 retries"),
+            ],
+        ),
+        (
+            "flaky 503",
+            {"fail_rate": 0.3},
+            [(lambda r: r["succeeded"] >= calls * 0.9, "retries should hide most 503s")],
+        ),
+        (
+            "hung server",
+            {"hang_rate": 1.0, "hang_time": 5.0},
+            [(lambda r: r["max_s"] < 3.5, "calls should give up at the deadline")],
+        ),
+        (
+            "outage",
+            {"fail_rate": 1.0, "fail_status": 500},
+            [
+                (lambda r: r["trips"] >= 1, "the circuit breaker should open"),
+                (lambda r: r["rejected"] >= calls - 2, "later calls should be rejected"),
+            ],
+        ),
+    ]
+
+    ok = True
+    for name, server_options, expect in scenarios:
+        ok &= run_scenario(name, calls, args.latency, args.seed, server_options, expect)
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""課題文のバッチ生成（batch_generation.py）のベンチマーク
+
+ローカルの代替サーバー（fake_openai_server.py）を起動し、同時リクエスト数を変えながら
+全推奨年齢の課題文を生成して、かかった時間とスループットを表示する。API は使わない。
+
+    python benchmarks/bench_generation.py --batches 4 --latency 1.0 --concurrency 1 4 16
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_generation import USER_TYPES, run_batch_generation  # noqa: E402
+from fake_openai_server import FakeOpenAIServer  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batches", type=int, default=4, help="推奨年齢ごとのリクエスト数")
+    parser.add_argument(
+        "--concurrency", type=int, nargs="+", default=[1, 4, 16], help="同時リクエスト数"
+    )
+    parser.add_argument("--latency", type=float, default=1.0, help="代替サーバーの応答時間")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(latency=args.latency, seed=args.seed)
+    server.start()
+    try:
+        for concurrency in args.concurrency:
+            result = run_batch_generation(
+                USER_TYPES,
+                batches=args.batches,
+                concurrency=concurrency,
+                api_key="fake",
+                base_url=server.base_url,
+            )
+            sentences = sum(len(pool) for pool in result.pools.values())
+            print(
+                f"concurrency {concurrency:>3}: {result.requests} requests"
+                f" in {result.elapsed:.2f} s"
+                f" ({result.requests / result.elapsed:.1f} req/s),"
+                f" {sentences} sentences, {len(result.errors)} failed"
+            )
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""打鍵処理（キー入力 → update_displays）のベンチマーク
+
+記録ファイル（.vtdr）または合成した打鍵列を再生し、スループットと
+1打鍵あたりの処理時間の p50 / p95 / p99 を表示する。
+
+    # Tk を使わずゲームルールと表示用データの計算だけを測る
+    python benchmarks/bench_keystrokes.py --keys 200000
+
+    # 実際の Tk ウィンドウで描画まで測る（画面がない環境では Xvfb を使う）
+    xvfb-run -a python benchmarks/bench_keystrokes.py --tk
+
+    # 基準値を保存し、以降の変更で悪化していないか確認する
+    python benchmarks/bench_keystrokes.py --save-baseline baseline.json
+    python benchmarks/bench_keystrokes.py --baseline baseline.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import TypingEngine  # noqa: E402
+from recorder import load_recording  # noqa: E402
+from romaji import katakana_to_romaji  # noqa: E402
+
+# 合成データ用の課題文
+SAMPLE_KATAKANA = [
+    "イヌモアルケバボウニアタル",
+    "ヒャクブンハイッケンニシカズ",
+    "ジュウニントイロ",
+    "アンズルヨリウムガヤスシ",
+    "チリモツモレバヤマトナル",
+    "キョウハコウエンデサッカーヲシマシタ",
+    "ナツヤスミニカゾクデウミヘイキマシタ",
+    "トショカンデシュクダイヲシテカエリマス",
+]
+
+
+class ScriptedEngine(TypingEngine):
+    """決められた順番で課題文を出すエンジン（記録の再生用）
+
+    順番を使い切ったら最初から繰り返す（山札を使わないので、課題文が少なくても
+    「All sentences used」の表示が計測に入らない）。
+    """
+
+    def __init__(self, words, order, player_count, rng=None):
+        super().__init__(words, player_count, rng)
+        self.order = list(order) or list(range(len(words)))
+        self.cursor = 0
+
+    def choose_word(self):
+        word = self.words[self.order[self.cursor % len(self.order)]]
+        self.cursor += 1
+        return word
+
+
+def sample_words():
+    return [
+        {"japanese": katakana, "katakana": katakana, "romaji": katakana_to_romaji(katakana)}
+        for katakana in SAMPLE_KATAKANA
+    ]
+
+
+def synthetic_stream(keys, miss_rate, seed):
+    """2人が交互に入力する打鍵列を作る"""
+    rng = random.Random(seed)
+    words = sample_words()
+    shuffled = list(range(len(words)))
+    rng.shuffle(shuffled)
+    engine = ScriptedEngine(words, shuffled, 2)
+    engine.start(0)
+    order = [words.index(engine.current_word_data)]
+
+    stream = []
+    for _ in range(keys):
+        player = rng.randrange(2)
+        expected = engine.automaton.expected_char(engine.players[player].state)
+        if rng.random() < miss_rate:
+            char = "z" if expected == "q" else "q"
+        else:
+            char = expected
+        before = engine.current_word_data
+        engine.feed(player, char, 0)
+        if engine.current_word_data is not before:
+            order.append(words.index(engine.current_word_data))
+        stream.append((player, char))
+
+    return words, order, 2, stream
+
+
+def recorded_stream(path):
+    recording = load_recording(path)
+    words = [recording.sentence_word(i) for i in range(len(recording.sentences))]
+    stream = [
+        (player, chr(code))
+        for player, code in zip(recording.players, recording.chars)
+    ]
+    return words, list(recording.sentence_ids), recording.player_count, stream
+
+
+def key_char(player, char):
+    """Tk のキー入力としての文字（PLAYER 2 は大文字）"""
+    return char.upper() if player == 1 else char
+
+
+def run_headless(words, order, player_count, stream):
+    """Tk を使わず、エンジンの処理と表示用ローマ字の計算を測る"""
+    engine = ScriptedEngine(words, order, player_count)
+    engine.start(0)
+    players = range(player_count)
+    clock = time.perf_counter_ns
+
+    samples = []
+    append = samples.append
+    for player, char in stream:
+        start = clock()
+        engine.feed(player, char, start)
+        for index in players:
+            engine.romaji_for(index)
+        append(clock() - start)
+    return samples
+
+
+def run_tk(words, order, player_count, stream):
+    """実際の Tk ウィンドウで Tk のキー入力から描画完了までを測る"""
+    import tkinter as tk
+
+    # ベンチマークが利用者のキャッシュや記録を書き換えないようにする
+    os.environ["VS_TYPING_DOJO_HOME"] = tempfile.mkdtemp(prefix="vtd-bench-")
+    from vs_typing_dojo import VsTypingDojo
+
+    root = tk.Tk()
+    game = VsTypingDojo(root)
+    game.engine = ScriptedEngine(words, order, player_count)
+    game.prefetcher.engine = game.engine
+    game.engine.start(0)
+    game.game_active = True
+    game.update_displays()
+    root.update()
+
+    clock = time.perf_counter_ns
+    samples = []
+    append = samples.append
+    for player, char in stream:
+        event = types.SimpleNamespace(char=key_char(player, char))
+        start = clock()
+        game.input_backend.on_key_press(event)
+        game.render_scheduler.flush()
+        root.update_idletasks()
+        append(clock() - start)
+
+    game.game_active = False
+    root.destroy()
+    return samples
+
+
+def percentile(sorted_samples, p):
+    index = min(len(sorted_samples) - 1, int(round(p / 100 * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    total = sum(samples)
+    return {
+        "keys": len(samples),
+        "keys_per_second": len(samples) / (total / 1e9) if total else 0,
+        "p50_us": percentile(ordered, 50) / 1000,
+        "p95_us": percentile(ordered, 95) / 1000,
+        "p99_us": percentile(ordered, 99) / 1000,
+        "max_us": ordered[-1] / 1000,
+    }
+
+
+def compare(result, baseline, tolerance):
+    """基準値より tolerance を超えて悪化した項目を返す"""
+    regressions = []
+    for key in ("p50_us", "p95_us", "p99_us"):
+        if result[key] > baseline[key] * (1 + tolerance):
+            regressions.append(f"{key}: {baseline[key]:.2f} -> {result[key]:.2f}")
+    if result["keys_per_second"] < baseline["keys_per_second"] / (1 + tolerance):
+        regressions.append(
+            f"keys_per_second: {baseline['keys_per_second']:,.0f}"
+            f" -> {result['keys_per_second']:,.0f}"
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--recording", help="再生する記録ファイル（.vtdr）")
+    parser.add_argument("--keys", type=int, default=100_000, help="合成する打鍵数")
+    parser.add_argument("--miss-rate", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tk", action="store_true", help="実際の Tk ウィンドウで測る")
+    parser.add_argument("--baseline", help="比較する基準値（JSON）")
+    parser.add_argument("--save-baseline", help="結果を基準値として保存する")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="基準値からの許容悪化率（既定 20%%）",
+    )
+    args = parser.parse_args()
+
+    if args.recording:
+        words, order, player_count, stream = recorded_stream(args.recording)
+    else:
+        words, order, player_count, stream = synthetic_stream(
+            args.keys, args.miss_rate, args.seed
+        )
+
+    if args.tk:
+        if sys.platform.startswith("linux") and not os.environ.get("DISPLAY"):
+            parser.error("--tk needs a display; run it under xvfb-run -a")
+        mode = "tk"
+        samples = run_tk(words, order, player_count, stream)
+    else:
+        mode = "headless"
+        samples = run_headless(words, order, player_count, stream)
+
+    result = summarize(samples)
+    result["mode"] = mode
+    print(
+        f"{mode}: {result['keys']:,} keys, {result['keys_per_second']:,.0f} keys/s,"
+        f" p50 {result['p50_us']:.2f} us, p95 {result['p95_us']:.2f} us,"
+        f" p99 {result['p99_us']:.2f} us, max {result['max_us']:.2f} us"
+    )
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"Saved baseline to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("mode") != mode:
+            parser.error(f"baseline was measured in {baseline.get('mode')} mode")
+        regressions = compare(result, baseline, args.tolerance)
+        if regressions:
+            print("Regression detected:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("No regression against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""LAN 対戦（netplay.py）の打鍵1回あたりの往復時間と通信量を測る
+
+ループバックでホストとクライアントを起動し、各クライアントが前の打鍵の結果を
+受け取ってから次の打鍵を送る。打鍵を送ってから自分の結果が届くまでの時間の
+p50 / p95 / p99 と、打鍵1回あたりの送受信バイト数を表示する。最後に各クライアントが
+再現した状態（スコア・入力済みの綴り）がホストと一致するかを確かめ、
+一致しなければ終了コード 1。
+
+    python benchmarks/bench_netplay.py
+    python benchmarks/bench_netplay.py --clients 3 --keys 5000 --miss-rate 0.1
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import COMPLETED, TypingEngine  # noqa: E402
+from netplay import MirrorEngine, NetplayClient, NetplayHost  # noqa: E402
+from romaji import katakana_to_romaji  # noqa: E402
+
+SAMPLE_KATAKANA = [
+    "イヌモアルケバボウニアタル",
+    "ヒャクブンハイッケンニシカズ",
+    "キョウハコウエンデサッカーヲシマシタ",
+    "ナツヤスミニカゾクデウミヘイキマシタ",
+    "トショカンデシュクダイヲシテカエリマス",
+]
+
+
+class BenchClient:
+    """結果を受け取るたびに次の打鍵を送るクライアント"""
+
+    def __init__(self, port, player_count, rng, miss_rate):
+        self.engine = MirrorEngine([], player_count)
+        self.client = NetplayClient(None, "127.0.0.1", port, self.on_message)
+        self.rng = rng
+        self.miss_rate = miss_rate
+        self.acked = threading.Event()
+
+    def on_message(self, kind, *args):
+        # root=None なのでクライアントのループのスレッドで呼ばれる
+        self.engine.apply(kind, *args)
+        if kind == "key" and args[0] == self.client.player:
+            self.acked.set()
+
+    def next_char(self):
+        # 課題文が届くまで待つ
+        while self.engine.automaton is None:
+            time.sleep(0.0001)
+        state = self.engine.players[self.client.player].state
+        expected = self.engine.automaton.expected_char(state)
+        if self.rng.random() < self.miss_rate:
+            return "q" if expected != "q" else "x"
+        return expected
+
+    def type_keys(self, count):
+        for _ in range(count):
+            self.acked.clear()
+            self.client.send_key(self.next_char())
+            if not self.acked.wait(5):
+                raise RuntimeError("no response from host")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=1, help="接続するクライアント数")
+    parser.add_argument("--keys", type=int, default=2000, help="クライアントごとの打鍵数")
+    parser.add_argument("--miss-rate", type=float, default=0.05, help="ミスタイプの割合")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    player_count = args.clients + 1
+    words = [
+        {"japanese": katakana, "katakana": katakana, "romaji": katakana_to_romaji(katakana)}
+        for katakana in SAMPLE_KATAKANA
+    ]
+    engine = TypingEngine(words, player_count, rng=random.Random(args.seed))
+    host = None
+
+    def on_key(player, char, timestamp, event):
+        # root=None なのでホストのループのスレッドで呼ばれる
+        result = engine.feed(player, char, timestamp)
+        host.key_result(player, char, result)
+        if result == COMPLETED:
+            host.sentence(engine.current_word_data)
+
+    host = NetplayHost(None, on_key, player_count, first_player=1, port=0)
+    host.start()
+
+    clients = []
+    for i in range(args.clients):
+        client = BenchClient(host.port, player_count, random.Random(args.seed + i), args.miss_rate)
+        client.client.start()
+        clients.append(client)
+    while len(host.remote_players) < args.clients:
+        time.sleep(0.01)
+
+    host.game_started(60, 0)
+    engine.start()
+    host.game_go()
+    host.sentence(engine.current_word_data)
+
+    threads = [threading.Thread(target=client.type_keys, args=(args.keys,)) for client in clients]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    host.game_ended()
+
+    # 最後の結果が全員に届くのを待つ
+    time.sleep(0.2)
+
+    ok = True
+    total_keys = args.keys * args.clients
+    print(
+        f"{args.clients} client(s), {total_keys} keys in {elapsed:.2f} s"
+        f" ({total_keys / elapsed:,.0f} keys/s)"
+    )
+    print(f"host:     {host.stats.summary()}")
+    # 打鍵の結果は全クライアントに送るので、下りは試合全体の打鍵数で割る
+    print(
+        f"per keystroke: {host.stats.bytes_received / total_keys:.1f} B up,"
+        f" {host.stats.bytes_sent / total_keys / args.clients:.1f} B down to each client"
+        f" (including sentence changes)"
+    )
+    for i, client in enumerate(clients):
+        print(f"client {i + 1}: {client.client.stats.summary()}")
+
+        for player in range(player_count):
+            expected = engine.players[player]
+            actual = client.engine.players[player]
+            if (expected.score, expected.total_chars, engine.romaji_for(player)) != (
+                actual.score,
+                actual.total_chars,
+                client.engine.romaji_for(player),
+            ):
+                print(f"client {i + 1}: player {player + 1} state differs from the host")
+                ok = False
+
+    for client in clients:
+        client.client.stop()
+    host.stop()
+    if not ok:
+        sys.exit(1)
+    print("all clients match the host")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""課題文パック（.vtdp）のベンチマーク
+
+合成した課題文で指定した件数のパックを作り、別プロセスで開いて
+「開くまでの時間」「ランダムに課題文を引く時間」「常駐メモリの増加量」を表示する。
+
+    python benchmarks/bench_pack.py --sentences 1000000
+    python benchmarks/bench_pack.py --sentences 5000000 --pack /tmp/big.vtdp
+"""
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sentence_deck import SentenceDeck  # noqa: E402
+from sentence_pack import SentencePack, write_pack  # noqa: E402
+
+USER_TYPES = ["7歳", "12歳", "15歳", "18歳", "20歳以上"]
+SYLLABLES = [
+    ("犬", "イヌ", "inu"),
+    ("猫", "ネコ", "neko"),
+    ("公園", "コウエン", "kouen"),
+    ("学校", "ガッコウ", "gakkou"),
+    ("図書館", "トショカン", "toshokan"),
+    ("夏休み", "ナツヤスミ", "natsuyasumi"),
+    ("家族", "カゾク", "kazoku"),
+    ("海", "ウミ", "umi"),
+]
+
+
+def synthetic_entries(count, seed):
+    rng = random.Random(seed)
+    for _ in range(count):
+        parts = [rng.choice(SYLLABLES) for _ in range(rng.randint(4, 20))]
+        yield rng.choice(USER_TYPES), {
+            "japanese": "".join(part[0] for part in parts),
+            "katakana": "".join(part[1] for part in parts),
+            "romaji": "".join(part[2] for part in parts),
+        }
+
+
+def resident_kb():
+    """現在の常駐メモリ (KB) を (ヒープなど, mmap したファイル) で返す
+
+    mmap したページはアクセスした分だけ常駐するが、OS がいつでも捨てられるので分けて表示する。
+    """
+    usage = {}
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("RssAnon", "RssFile"):
+                    usage[key] = int(value.split()[0])
+    except OSError:
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, 0
+    return usage.get("RssAnon", 0), usage.get("RssFile", 0)
+
+
+def measure(path, draws, seed):
+    """パックを開いて計測する（ビルド時のメモリが混ざらないよう別プロセスで実行）"""
+    anon_before, file_before = resident_kb()
+
+    start = time.perf_counter()
+    pack = SentencePack(path)
+    section = pack.select("12歳")
+    open_ms = (time.perf_counter() - start) * 1000
+
+    deck = SentenceDeck(len(section), random.Random(seed))
+    start = time.perf_counter()
+    for _ in range(draws):
+        index = deck.draw()
+        if index is None:
+            deck.reset()
+            index = deck.draw()
+        section[index]
+    draw_us = (time.perf_counter() - start) / draws * 1e6
+
+    anon_after, file_after = resident_kb()
+    print(
+        f"{len(pack):,} sentences ({os.path.getsize(path) / 2**20:,.1f} MiB):"
+        f" open {open_ms:.2f} ms, draw {draw_us:.2f} us"
+    )
+    print(
+        f"resident after {draws:,} draws: heap +{anon_after - anon_before:,} KB,"
+        f" mapped file +{file_after - file_before:,} KB"
+    )
+    pack.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sentences", type=int, default=1_000_000)
+    parser.add_argument("--draws", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pack", help="パックの保存先（既にあれば作らずに使う）")
+    parser.add_argument("--measure", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(args.pack, args.draws, args.seed)
+        return
+
+    with tempfile.TemporaryDirectory(prefix="vtd-bench-") as directory:
+        path = args.pack or os.path.join(directory, "bench.vtdp")
+        if not os.path.exists(path):
+            start = time.perf_counter()
+            write_pack(path, synthetic_entries(args.sentences, args.seed))
+            print(f"Built {path} in {time.perf_counter() - start:.1f} s")
+
+        subprocess.run(
+            [
+                sys.executable,
+                os.path.abspath(__file__),
+                "--measure",
+                "--pack",
+                path,
+                "--draws",
+                str(args.draws),
+                "--seed",
+                str(args.seed),
+            ],
+            check=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""katakana_to_romaji のマイクロベンチマーク
+
+テーブル方式の変換器と、以前の jaconv + str.replace による変換を比較する。
+
+    python benchmarks/bench_romaji.py --sentences 100000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from romaji import KANA_SPELLINGS, katakana_to_romaji  # noqa: E402
+
+try:
+    import jaconv
+except ImportError:
+    jaconv = None
+
+
+def jaconv_katakana_to_romaji(text):
+    """以前の実装（比較用）"""
+    result = jaconv.kata2alphabet(text)
+    result = result.replace("ー", "-")
+    result = result.replace("－", "-")
+    result = result.replace("—", "-")
+    result = result.replace("‐", "-")
+    return result
+
+
+def make_corpus(size, unique, seed):
+    """ランダムなカタカナ文を unique 種類作り、size 件になるまで繰り返す"""
+    rng = random.Random(seed)
+    kana = [token for token in KANA_SPELLINGS if not token.startswith("ッ")]
+    kana += ["ン", "ー"]
+    base = []
+    for _ in range(unique):
+        length = rng.randint(8, 40)
+        parts = []
+        for _ in range(length):
+            if rng.random() < 0.08:
+                parts.append("ッ")
+            parts.append(rng.choice(kana))
+        base.append("".join(parts))
+    return [base[i % unique] for i in range(size)]
+
+
+def run(name, func, corpus):
+    start = time.perf_counter()
+    for text in corpus:
+        func(text)
+    elapsed = time.perf_counter() - start
+    rate = len(corpus) / elapsed
+    print(f"{name:<24} {elapsed * 1000:10.1f} ms {rate:14,.0f} sentences/s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sentences", type=int, default=100_000)
+    parser.add_argument(
+        "--unique",
+        type=int,
+        default=None,
+        help="異なり文数（省略時は全件が異なる文）",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    unique = args.unique or args.sentences
+    corpus = make_corpus(args.sentences, unique, args.seed)
+    print(f"{args.sentences:,} sentences ({unique:,} unique)")
+
+    run("table", katakana_to_romaji, corpus)
+
+    if jaconv is None:
+        print("jaconv is not installed; skipping the jaconv comparison")
+    else:
+        run("jaconv + replace", jaconv_katakana_to_romaji, corpus)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""観戦配信（spectator.py）の負荷試験
+
+ループバックで SpectatorServer を起動し、別プロセスから多数の観戦者を接続して、
+試合と同じ頻度でスナップショットを配信する。一部の観戦者は受信しない（遅い観戦者）。
+
+- publish() の呼び出しにかかる時間（試合側が待たされる時間）
+- 配信側プロセスの CPU 時間（1フレームあたり、観戦者1人・1フレームあたり）
+- 通常の観戦者にスナップショットが届くまでの時間 p50 / p99 と受信フレーム数
+- 遅い観戦者のために捨てたフレーム数と、送信が進まず切断した観戦者数
+
+を表示する。実際の試合の数秒で遅い観戦者の送信バッファが一杯になるよう、
+観戦者ごとの送信バッファを小さくし（--buffer）、スナップショットを --snapshot-bytes
+まで水増しする。次のどれかに当てはまれば終了コード 1。
+
+- 遅い観戦者がいるせいで、通常の観戦者に全フレームの 95% 以上が届かない
+- 遅い観戦者に送らずに捨てたフレームがない（送信バッファが一杯になっていない）
+- 遅い観戦者が全員 stall_timeout で切断されていない
+
+    python benchmarks/bench_spectator.py
+    python benchmarks/bench_spectator.py --viewers 500 --slow 20 --fps 30 --seconds 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from spectator import SpectatorServer  # noqa: E402
+
+
+def make_snapshot(seq, remaining, size):
+    """実際の試合と同じ内容で、JSON にすると約 size バイトのスナップショット"""
+    snapshot = {
+        "seq": seq,
+        "t": time.monotonic_ns(),
+        "active": True,
+        "remaining": remaining,
+        "sentence": "夏休みに家族で海へ行きました",
+        "players": [
+            {
+                "score": 1230 + seq,
+                "romaji": "natsuyasuminikazokudeumiheikimashita",
+                "position": seq % 36,
+                "words": 12,
+                "accuracy": 96.5,
+                "perfect": 4,
+            }
+            for _ in range(2)
+        ],
+        "leaders": [0],
+    }
+    padding = size - len(json.dumps(snapshot, separators=(",", ":"))) - len(',"pad":""')
+    snapshot["pad"] = "x" * max(0, padding)
+    return snapshot
+
+
+async def run_viewers(port, viewers, slow, seconds):
+    """観戦者を接続し、受信したスナップショットの遅れを記録する"""
+    latencies = []
+    received = [0] * viewers
+
+    async def viewer(index):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    return
+                latencies.append(time.monotonic_ns() - json.loads(line)["t"])
+                received[index] += 1
+        finally:
+            writer.close()
+
+    async def slow_viewer():
+        # 受信バッファを小さくして、まったく読まない
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        sock.connect(("127.0.0.1", port))
+        await asyncio.sleep(seconds + 5)
+        sock.close()
+
+    tasks = [asyncio.ensure_future(viewer(i)) for i in range(viewers)]
+    tasks += [asyncio.ensure_future(slow_viewer()) for _ in range(slow)]
+    print("ready", flush=True)
+    await asyncio.wait(tasks[:viewers])
+    for task in tasks[viewers:]:
+        task.cancel()
+    return latencies, received
+
+
+def viewers_main(args):
+    latencies, received = asyncio.run(
+        run_viewers(args.port, args.viewers, args.slow, args.seconds)
+    )
+    latencies.sort()
+    print(
+        json.dumps(
+            {
+                "p50_ms": latencies[len(latencies) // 2] / 1e6 if latencies else None,
+                "p99_ms": latencies[len(latencies) * 99 // 100] / 1e6 if latencies else None,
+                "min_received": min(received),
+            }
+        )
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--viewers", type=int, default=200, help="通常の観戦者数")
+    parser.add_argument("--slow", type=int, default=10, help="受信しない観戦者数")
+    parser.add_argument("--fps", type=int, default=15, help="1秒あたりのスナップショット数")
+    parser.add_argument("--seconds", type=float, default=6.0)
+    parser.add_argument(
+        "--snapshot-bytes", type=int, default=1024, help="スナップショットの大きさ（水増し後）"
+    )
+    parser.add_argument(
+        "--buffer", type=int, default=8 * 1024, help="観戦者ごとの送信バッファ（バイト）"
+    )
+    parser.add_argument("--stall-timeout", type=float, default=2.0)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--viewers-only", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.viewers_only:
+        viewers_main(args)
+        return
+
+    # 遅い観戦者の送信バッファが数秒で一杯になり、切断されるよう、どちらも小さくする
+    server = SpectatorServer(
+        port=0,
+        host="127.0.0.1",
+        max_viewers=100000,
+        stall_timeout=args.stall_timeout,
+        write_buffer_limit=args.buffer,
+        send_buffer=args.buffer,
+    )
+    server.start()
+
+    # 観戦者は別プロセスで動かし、このプロセスの CPU 時間を配信側の負荷とみなす
+    viewers = subprocess.Popen(
+        [
+            sys.executable,
+            os.path.abspath(__file__),
+            "--viewers-only",
+            "--port",
+            str(server.port),
+            "--viewers",
+            str(args.viewers),
+            "--slow",
+            str(args.slow),
+            "--seconds",
+            str(args.seconds),
+        ],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    viewers.stdout.readline()
+    deadline = time.monotonic() + 30
+    while server.viewer_count < args.viewers + args.slow:
+        if time.monotonic() > deadline:
+            server.stop()
+            viewers.kill()
+            sys.exit(f"only {server.viewer_count} viewers connected")
+        time.sleep(0.01)
+
+    frames = int(args.fps * args.seconds)
+    interval = 1.0 / args.fps
+    publish_ns = []
+    cpu_start = time.process_time()
+    next_at = time.monotonic()
+    for seq in range(frames):
+        snapshot = make_snapshot(seq, frames - seq, args.snapshot_bytes)
+        data = json.dumps(snapshot, separators=(",", ":"))
+        start = time.perf_counter_ns()
+        server.publish(data.encode("utf-8") + b"\n")
+        publish_ns.append(time.perf_counter_ns() - start)
+        next_at += interval
+        time.sleep(max(0.0, next_at - time.monotonic()))
+    # 最後のフレームが送られるのを待つ
+    time.sleep(0.5)
+    cpu = time.process_time() - cpu_start
+    server.stop()
+
+    result = json.loads(viewers.communicate()[0].splitlines()[-1])
+    publish_ns.sort()
+    viewer_count = args.viewers + args.slow
+
+    print(server.stats.summary(viewer_count))
+    print(
+        f"publish(): p50 {publish_ns[len(publish_ns) // 2] / 1000:.1f} us,"
+        f" max {publish_ns[-1] / 1000:.1f} us"
+    )
+    print(
+        f"server CPU: {cpu * 1000 / frames:.2f} ms per frame,"
+        f" {cpu * 1e6 / frames / viewer_count:.2f} us per viewer per frame"
+    )
+    print(
+        f"delivery: p50 {result['p50_ms']:.2f} ms, p99 {result['p99_ms']:.2f} ms,"
+        f" fewest frames received {result['min_received']}/{frames}"
+    )
+    ok = True
+    if result["min_received"] < frames * 0.95:
+        print("FAILED: slow viewers held back the others")
+        ok = False
+    if args.slow and server.stats.dropped == 0:
+        print("FAILED: no frames were skipped, the slow viewers never filled their buffers")
+        ok = False
+    if server.stats.stalled != args.slow:
+        print(f"FAILED: {server.stats.stalled} of {args.slow} slow viewers were disconnected")
+        ok = False
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
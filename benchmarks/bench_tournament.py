@@ -0,0 +1,109 @@
+"""大会結果のデータベース（tournament.py の ResultsStore）の性能を測る
+
+一時ファイルのデータベースに、多数の大会・プレイヤーの試合結果を保存してから、
+
+- record_match() 1回（1試合の保存）にかかる時間
+- 順位表（大会ごと・通算、勝ち点・最高得点・最高 CPM 順）を引く時間 p50 / p99
+
+を表示する。順位表のクエリがインデックスを使わない（表全体を読んで並べ替える）
+場合は終了コード 1。
+
+    python benchmarks/bench_tournament.py
+    python benchmarks/bench_tournament.py --matches 100000 --events 500 --players 2000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tournament import ALL_EVENTS, LEADERBOARD_ORDERS, ResultsStore  # noqa: E402
+
+
+def random_result(rng, name):
+    return {
+        "name": name,
+        "score": rng.randint(0, 3000),
+        "cpm": rng.uniform(50, 400),
+        "accuracy": rng.uniform(70, 100),
+        "perfect_count": rng.randint(0, 10),
+        "words_typed": rng.randint(0, 20),
+    }
+
+
+def percentile(samples, fraction):
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--matches", type=int, default=30000, help="保存する試合数")
+    parser.add_argument("--events", type=int, default=200, help="大会数")
+    parser.add_argument("--players", type=int, default=1000, help="プレイヤー数")
+    parser.add_argument("--queries", type=int, default=500, help="順位表の種類ごとのクエリ数")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    names = [f"player{i:05d}" for i in range(args.players)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = ResultsStore(os.path.join(directory, "results.sqlite3"))
+        event_ids = [store.create_event(f"event {i}", "round-robin") for i in range(args.events)]
+
+        record_ns = []
+        start = time.perf_counter()
+        for i in range(args.matches):
+            a, b = rng.sample(names, 2)
+            results = [random_result(rng, a), random_result(rng, b)]
+            begin = time.perf_counter_ns()
+            store.record_match(rng.choice(event_ids), i % 8 + 1, "12歳", 60, results)
+            record_ns.append(time.perf_counter_ns() - begin)
+        elapsed = time.perf_counter() - start
+        record_ns.sort()
+        print(
+            f"record_match: {args.matches} matches in {elapsed:.2f} s,"
+            f" p50 {percentile(record_ns, 0.5) / 1000:.0f} us,"
+            f" p99 {percentile(record_ns, 0.99) / 1000:.0f} us"
+        )
+
+        ok = True
+        for by, order in LEADERBOARD_ORDERS.items():
+            for label, pick in (
+                ("event", lambda: rng.choice(event_ids)),
+                ("all-time", lambda: ALL_EVENTS),
+            ):
+                query_ns = []
+                for _ in range(args.queries):
+                    event_id = pick()
+                    begin = time.perf_counter_ns()
+                    store.leaderboard(event_id, by, 10)
+                    query_ns.append(time.perf_counter_ns() - begin)
+                query_ns.sort()
+                print(
+                    f"leaderboard by {by:<6} ({label:<8}): p50"
+                    f" {percentile(query_ns, 0.5) / 1000:.0f} us,"
+                    f" p99 {percentile(query_ns, 0.99) / 1000:.0f} us"
+                )
+
+            # 並べ替えに一時的な B-tree を使っていれば、インデックスが効いていない
+            plan = store._conn.execute(
+                f"EXPLAIN QUERY PLAN SELECT player_id FROM standings WHERE event_id = ?"
+                f" ORDER BY {order} LIMIT 10",
+                (ALL_EVENTS,),
+            ).fetchall()
+            details = "; ".join(row[-1] for row in plan)
+            if "TEMP B-TREE" in details or "USING INDEX" not in details:
+                print(f"FAILED: leaderboard by {by} does not use an index ({details})")
+                ok = False
+        store.close()
+
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
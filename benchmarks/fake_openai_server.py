@@ -0,0 +1,290 @@
+"""OpenAI 互換の課題文生成 API のローカル代替サーバー
+
+/v1/chat/completions に対して、プロンプトの推奨年齢に合わせた課題文 JSON を返す。
+応答までの待ち時間を指定できるので、API を使わずに並列生成やストリーミングを試せる。
+
+    python benchmarks/fake_openai_server.py --port 8765 --latency 1.5
+
+stream=true のリクエストには Server-Sent Events で少しずつ応答する。
+
+クライアントのリトライなどを試すために、障害を起こすこともできる。
+
+    # 最初の 2 件は 429、その後は 30% の確率で 503、5% の確率で応答しない
+    python benchmarks/fake_openai_server.py --fail-first 2 --fail-status 429 \
+        --fail-rate 0.3 --hang-rate 0.05
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 課題文を組み立てる語句 (日本語, カタカナ)
+SUBJECTS = [
+    ("犬が", "イヌガ"),
+    ("猫が", "ネコガ"),
+    ("友達と", "トモダチト"),
+    ("家族で", "カゾクデ"),
+    ("先生が", "センセイガ"),
+    ("弟と", "オトウトト"),
+]
+PLACES = [
+    ("公園で", "コウエンデ"),
+    ("学校で", "ガッコウデ"),
+    ("図書館で", "トショカンデ"),
+    ("海で", "ウミデ"),
+    ("山の上で", "ヤマノウエデ"),
+    ("駅の前で", "エキノマエデ"),
+]
+ACTIONS = [
+    ("元気に遊びました", "ゲンキニアソビマシタ"),
+    ("本を読みました", "ホンヲヨミマシタ"),
+    ("お弁当を食べました", "オベントウヲタベマシタ"),
+    ("写真を撮りました", "シャシンヲトリマシタ"),
+    ("歌を歌いました", "ウタヲウタイマシタ"),
+    ("ゆっくり休みました", "ユックリヤスミマシタ"),
+]
+
+_USER_TYPE = re.compile(r"一般的な学力の(.+?)が")
+
+
+def make_content(prompt, count, rng):
+    """プロンプトに対する応答本文（コードブロックで囲んだ JSON）を作る"""
+    match = _USER_TYPE.search(prompt)
+    user_type = match.group(1) if match else ""
+    sentences = []
+    for _ in range(count):
+        parts = [rng.choice(SUBJECTS), rng.choice(PLACES), rng.choice(ACTIONS)]
+        if user_type.startswith(("18", "20")):
+            parts.insert(0, rng.choice(PLACES))
+        sentences.append(
+            {
+                "sentence": "".join(part[0] for part in parts),
+                "katakana": "".join(part[1] for part in parts),
+            }
+        )
+    body = json.dumps({"sentences": sentences}, ensure_ascii=False, indent=2)
+    return f"```json\n{body}\n```"
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def send_json(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, status):
+        body = json.dumps(
+            {"error": {"message": f"injected failure {status}", "type": "fake_error"}}
+        ).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if status == 429 and self.server.retry_after is not None:
+            self.send_header("Retry-After", str(self.server.retry_after))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/v1/chat/completions":
+            self.send_json(404, {"error": {"message": "not found"}})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        prompt = "".join(
+            message.get("content", "") for message in request.get("messages", [])
+        )
+
+        server = self.server
+        with server.lock:
+            server.request_count += 1
+            request_id = server.request_count
+            seed = server.rng.random()
+            failure = server.pick_failure(request_id)
+        content = make_content(prompt, server.sentences, random.Random(seed))
+
+        time.sleep(server.latency)
+
+        if failure == "hang":
+            # 応答しない（クライアントのタイムアウトを試す）
+            time.sleep(server.hang_time)
+            self.close_connection = True
+            return
+        if failure is not None:
+            self.send_error_json(failure)
+            return
+
+        completion_id = f"chatcmpl-fake-{request_id}"
+        model = request.get("model", "fake")
+        if request.get("stream"):
+            self.stream_content(completion_id, model, content)
+            return
+
+        self.send_json(
+            200,
+            {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            },
+        )
+
+    def stream_content(self, completion_id, model, content):
+        """本文を数文字ずつ Server-Sent Events で送る"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def send_chunk(delta, finish_reason=None):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode())
+            self.wfile.flush()
+
+        send_chunk({"role": "assistant", "content": ""})
+        step = self.server.chunk_size
+        for i in range(0, len(content), step):
+            send_chunk({"content": content[i : i + step]})
+            time.sleep(self.server.chunk_delay)
+        send_chunk({}, "stop")
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        port=0,
+        latency=0.5,
+        chunk_delay=0.01,
+        chunk_size=8,
+        sentences=30,
+        seed=None,
+        verbose=False,
+        fail_rate=0.0,
+        fail_status=503,
+        fail_first=0,
+        hang_rate=0.0,
+        hang_time=30.0,
+        retry_after=None,
+    ):
+        super().__init__(("127.0.0.1", port), FakeOpenAIHandler)
+        self.latency = latency  # 応答を返し始めるまでの秒数
+        self.chunk_delay = chunk_delay  # ストリーミング時のチャンク間の秒数
+        self.chunk_size = chunk_size  # ストリーミング時の1チャンクの文字数
+        self.sentences = sentences
+        self.verbose = verbose
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.request_count = 0
+
+        # 障害の注入
+        self.fail_rate = fail_rate  # fail_status を返す確率
+        self.fail_status = fail_status
+        self.fail_first = fail_first  # 最初の何件を必ず失敗させるか
+        self.hang_rate = hang_rate  # 応答しない確率
+        self.hang_time = hang_time
+        self.retry_after = retry_after  # 429 の Retry-After（秒）
+        self.failures = 0
+
+    def pick_failure(self, request_id):
+        """このリクエストで起こす障害（ステータスコード、"hang"、なければ None）"""
+        failure = None
+        if request_id <= self.fail_first:
+            failure = self.fail_status
+        else:
+            roll = self.rng.random()
+            if roll < self.hang_rate:
+                failure = "hang"
+            elif roll < self.hang_rate + self.fail_rate:
+                failure = self.fail_status
+        if failure is not None:
+            self.failures += 1
+        return failure
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        """別スレッドで起動する（ベンチマークなどから使う）"""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5, help="応答までの秒数")
+    parser.add_argument(
+        "--chunk-delay", type=float, default=0.01, help="ストリーミング時のチャンク間の秒数"
+    )
+    parser.add_argument("--sentences", type=int, default=30, help="1応答の課題文数")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--verbose", action="store_true", help="リクエストをログに出す")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="エラーを返す確率")
+    parser.add_argument("--fail-status", type=int, default=503, help="返すエラーのステータス")
+    parser.add_argument("--fail-first", type=int, default=0, help="最初の何件を失敗させるか")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="応答しない確率")
+    parser.add_argument("--hang-time", type=float, default=30.0, help="応答しない秒数")
+    parser.add_argument("--retry-after", type=float, help="429 の Retry-After（秒）")
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(
+        args.port,
+        latency=args.latency,
+        chunk_delay=args.chunk_delay,
+        sentences=args.sentences,
+        seed=args.seed,
+        verbose=args.verbose,
+        fail_rate=args.fail_rate,
+        fail_status=args.fail_status,
+        fail_first=args.fail_first,
+        hang_rate=args.hang_rate,
+        hang_time=args.hang_time,
+        retry_after=args.retry_after,
+    )
+    print(f"Serving fake OpenAI API at {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
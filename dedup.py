@@ -0,0 +1,56 @@
+import hashlib
+import re
+import unicodedata
+
+# ひらがな → カタカナ（表記の違いだけの課題文を同じとみなす）
+_KANA_TABLE = {code: code + 0x60 for code in range(0x3041, 0x3097)}
+
+# 空白・句読点・記号は比較に含めない
+_IGNORED = re.compile(r"[\W_]+")
+
+
+def normalize(text):
+    """重複判定用に課題文を正規化する（全角・半角、かな、空白、句読点の違いを無視）"""
+    text = unicodedata.normalize("NFKC", text).translate(_KANA_TABLE).casefold()
+    return _IGNORED.sub("", text)
+
+
+def content_hash(text):
+    """正規化した課題文のハッシュ（SQLite の INTEGER に収まる 64 ビット符号付き整数）"""
+    digest = hashlib.blake2b(normalize(text).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def word_hash(word):
+    return content_hash(word["japanese"])
+
+
+class DedupIndex:
+    """課題文の内容ハッシュの集合
+
+    課題文データ（辞書）を渡して、同じ内容の課題文が既にあるかを調べる。
+    ハッシュは 64 ビット整数なので、課題文が増えても1件あたりの検索は一定時間。
+    """
+
+    def __init__(self, words=()):
+        self._hashes = set()
+        for word in words:
+            self.add(word)
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def __contains__(self, word):
+        return word_hash(word) in self._hashes
+
+    def add(self, word):
+        """課題文を登録し、新しい内容だったかどうかを返す"""
+        key = word_hash(word)
+        if key in self._hashes:
+            return False
+        self._hashes.add(key)
+        return True
+
+    def filter(self, words):
+        """words のうち未登録の課題文だけを登録して返す（words 内の重複も除く）"""
+        return [word for word in words if self.add(word)]
@@ -0,0 +1,261 @@
+import random
+import time
+
+from sentence_deck import SentenceDeck
+from typing_stats import RollingStats
+from typing_automaton import REJECT, compile_word
+
+# スコア
+CHAR_SCORE = 10  # 1文字ごと
+SENTENCE_BONUS = 50  # 課題文を入力し終えたとき
+PERFECT_BONUS = 100  # 課題文をノーミスで入力し終えたとき
+
+# feed() の結果
+IGNORED = -1  # 課題文が表示されていない
+MISS = 0
+HIT = 1
+COMPLETED = 2  # 課題文を入力し終えて次の課題文に進んだ
+
+
+class PlayerState:
+    """1人分のプレイ状況"""
+
+    __slots__ = (
+        "score",
+        "words_typed",
+        "correct_chars",
+        "total_chars",
+        "perfect_count",
+        "perfect_typing",
+        "state",
+        "typed",
+        "last_input_time",
+        "rolling",
+    )
+
+    def __init__(self):
+        self.rolling = RollingStats()  # 直近の CPM など（打鍵ごとに更新）
+        self.reset()
+
+    def reset(self):
+        self.score = 0
+        self.words_typed = 0
+        self.correct_chars = 0
+        self.total_chars = 0
+        self.perfect_count = 0  # パーフェクトタイピング回数
+        self.last_input_time = None
+        self.rolling.reset()
+        self.reset_sentence()
+
+    def reset_sentence(self):
+        self.perfect_typing = True  # 現在の文章でパーフェクトタイピング中かどうか
+        self.state = 0  # 入力オートマトン上の状態
+        self.typed = []  # 現在の課題文で入力済みの文字（実際に選んだ綴り）
+        self.rolling.new_sentence()
+
+    @property
+    def current_position(self):
+        return len(self.typed)
+
+    @property
+    def accuracy(self):
+        if self.total_chars == 0:
+            return 0
+        return (self.correct_chars / self.total_chars) * 100
+
+
+class TypingEngine:
+    """対戦タイピングのルール（Tk に依存しない）
+
+    全員が同じ課題文を入力し、誰かが入力し終えたら次の課題文に進む。
+    プレイヤーは 0 から始まる番号で指定し、時刻は time.monotonic_ns() の値を使う。
+    """
+
+    def __init__(self, words, player_count=2, rng=None):
+        self.words = words
+        self.players = [PlayerState() for _ in range(player_count)]
+        self.rng = rng or random.Random()
+
+        self.current_word_data = None
+        self.automaton = None
+
+        # 課題文の山札（1ゲーム内で重複を防ぐ）
+        self.deck = SentenceDeck(len(words), self.rng)
+
+        # 打鍵の記録（KeystrokeRecorder、記録しない場合は None）
+        self.recorder = None
+
+        # 苦手に合わせた課題文の選択（AdaptiveSelector、使わない場合は None）
+        self.selector = None
+
+    def set_words(self, words):
+        self.words = words
+        self.deck.size = len(words)
+        self.deck.reset()
+        if self.selector is not None:
+            self.selector.update_index(words)
+
+    def reset(self):
+        """課題文と全プレイヤーの状態をリセット"""
+        self.current_word_data = None
+        self.automaton = None
+        self.deck.reset()
+        for player in self.players:
+            player.reset()
+        if self.selector is not None:
+            self.selector.reset()
+
+    def start(self, timestamp=None):
+        """ゲームを開始して最初の課題文を選ぶ"""
+        self.reset()
+        self.new_word(timestamp)
+
+    def _sync_deck(self):
+        # 課題文が追加されていれば山札に加える
+        if self.deck.size != len(self.words):
+            self.deck.resize(len(self.words))
+
+    def remaining_words(self):
+        """このラウンドでまだ出していない課題文の数"""
+        self._sync_deck()
+        return self.deck.remaining()
+
+    def choose_word(self):
+        """次の課題文を山札から選ぶ（なければ None）"""
+        self._sync_deck()
+        index = None
+        if self.selector is not None:
+            index = self.selector.choose(self.words, self.deck)
+        if index is None:
+            index = self.deck.draw()
+
+        # 使用可能な文章がない場合は、すべての文章を山札に戻す
+        if index is None:
+            self.deck.reset()
+            index = self.deck.draw()
+            if index is None:
+                return None
+            print("All sentences used, resetting for new round")
+
+        return self.words[index]
+
+    def new_word(self, timestamp=None):
+        word = self.choose_word()
+        if word is None:
+            print("No words available")
+            return None
+        return self.show_word(word, timestamp)
+
+    def show_word(self, word, timestamp=None):
+        """word を現在の課題文にして、全プレイヤーの入力を最初からにする"""
+        self.current_word_data = word
+        # 課題文ごとに1回だけ入力オートマトンを作る（表記ゆれを受理）
+        self.automaton = compile_word(word)
+
+        for player in self.players:
+            player.reset_sentence()
+
+        if self.recorder is not None:
+            if timestamp is None:
+                timestamp = time.monotonic_ns()
+            self.recorder.record_sentence(self.current_word_data, timestamp)
+
+        return self.current_word_data
+
+    @property
+    def current_romaji(self):
+        return self.automaton.canonical if self.automaton else ""
+
+    def accepts(self, player, char):
+        """player が char を正しく入力できる状態かどうか"""
+        if self.automaton is None:
+            return False
+        return self.automaton.step(self.players[player].state, char) != REJECT
+
+    def player_expecting(self, char):
+        """char を入力できる状態の最初のプレイヤー（誰も入力できなければ 0）
+
+        どのプレイヤーの入力か区別できないキー（Tk 入力のハイフンなど）の振り分けに使う。
+        """
+        for player in range(len(self.players)):
+            if self.accepts(player, char):
+                return player
+        return 0
+
+    def feed(self, player, char, timestamp):
+        """1打鍵を処理して結果（MISS / HIT / COMPLETED / IGNORED）を返す"""
+        automaton = self.automaton
+        if automaton is None:
+            return IGNORED
+
+        state = self.players[player]
+        state.total_chars += 1
+
+        next_state = automaton.transitions[state.state].get(char, REJECT)
+        if self.selector is not None and state.typed:
+            # 直前に正しく入力した文字との並びを、苦手の記録に使う
+            self.selector.record_key(
+                player,
+                state.typed[-1],
+                char if next_state != REJECT else automaton.expected_char(state.state),
+                next_state != REJECT,
+                timestamp - state.last_input_time,
+            )
+        if next_state == REJECT:
+            # ミスタイプ：パーフェクトタイピングフラグをオフ
+            state.perfect_typing = False
+            state.rolling.miss()
+            if self.recorder is not None:
+                self.recorder.record_key(
+                    player,
+                    char,
+                    automaton.expected_char(state.state),
+                    False,
+                    False,
+                    timestamp,
+                )
+            return MISS
+
+        if self.recorder is not None:
+            self.recorder.record_key(
+                player,
+                char,
+                automaton.expected_char(state.state),
+                True,
+                automaton.accepting[next_state],
+                timestamp,
+            )
+
+        state.state = next_state
+        state.typed.append(char)
+        state.correct_chars += 1
+        state.score += CHAR_SCORE
+        state.last_input_time = timestamp
+        state.rolling.hit(timestamp)
+
+        if not automaton.accepting[next_state]:
+            return HIT
+
+        # 単語完了
+        state.words_typed += 1
+        state.score += SENTENCE_BONUS
+
+        # パーフェクトタイピングボーナス
+        if state.perfect_typing:
+            state.score += PERFECT_BONUS
+            state.perfect_count += 1
+
+        self.new_word(timestamp)  # 誰かが完了したら次の単語へ
+        return COMPLETED
+
+    def romaji_for(self, player):
+        """player に表示するローマ字（入力済みの綴り + 標準表記での残り）"""
+        if self.automaton is None:
+            return ""
+        state = self.players[player]
+        return "".join(state.typed) + self.automaton.remaining[state.state]
+
+    def leaders(self):
+        """最高得点のプレイヤー番号の一覧（全員同点なら全員）"""
+        best = max(player.score for player in self.players)
+        return [i for i, player in enumerate(self.players) if player.score == best]
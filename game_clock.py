@@ -0,0 +1,93 @@
+import math
+import time
+
+
+class GameClock:
+    """カウントダウン・残り時間・ゲーム終了を1つの単調時計で管理する
+
+    時刻はすべて time.monotonic() で、開始時刻からの経過時間として計算するため、
+    after() の呼び出しが遅れても誤差が蓄積しない。表示する秒数が変わる時刻に合わせて
+    次の tick を予約し、コールバックは表示する値が変わったときだけ呼ぶ。
+
+    - on_countdown(value): カウントダウンの数字が変わった（3, 2, 1）
+    - on_start(): カウントダウンが終わりゲームが始まった
+    - on_second(remaining): 残り秒数の表示が変わった
+    - on_end(): 制限時間になった
+    """
+
+    def __init__(self, root, on_countdown, on_start, on_second, on_end):
+        self.root = root
+        self.on_countdown = on_countdown
+        self.on_start = on_start
+        self.on_second = on_second
+        self.on_end = on_end
+
+        self.countdown = 0
+        self.duration = 0
+        self.game_started_at = None  # ゲーム開始時刻（カウントダウン終了時刻）
+        self.running = False
+        self.playing = False
+        self._shown = None
+        self._job = None
+
+    def start(self, duration, countdown=3):
+        """カウントダウンを開始する"""
+        self.cancel()
+        self.countdown = countdown
+        self.duration = duration
+        self.game_started_at = time.monotonic() + countdown
+        self.running = True
+        self.playing = False
+        self._shown = None
+        self._tick()
+
+    def cancel(self):
+        if self._job is not None:
+            self.root.after_cancel(self._job)
+            self._job = None
+        self.running = False
+        self.playing = False
+
+    def elapsed(self):
+        """ゲーム開始からの経過秒数（カウントダウン中は 0）"""
+        if self.game_started_at is None:
+            return 0.0
+        return max(0.0, time.monotonic() - self.game_started_at)
+
+    def _schedule(self, seconds):
+        # 表示が変わる境界の直後に起きるよう 1ms 足す
+        self._job = self.root.after(max(1, math.ceil(seconds * 1000) + 1), self._tick)
+
+    def _tick(self):
+        self._job = None
+        if not self.running:
+            return
+
+        now = time.monotonic()
+        until_start = self.game_started_at - now
+        if until_start > 0:
+            # カウントダウン中
+            value = math.ceil(until_start)
+            if value != self._shown:
+                self._shown = value
+                self.on_countdown(value)
+            self._schedule(until_start - (value - 1))
+            return
+
+        if not self.playing:
+            self.playing = True
+            self._shown = None
+            self.on_start()
+
+        remaining = self.duration - (now - self.game_started_at)
+        if remaining <= 0:
+            self.running = False
+            self.playing = False
+            self.on_end()
+            return
+
+        shown = math.ceil(remaining)
+        if shown != self._shown:
+            self._shown = shown
+            self.on_second(shown)
+        self._schedule(remaining - (shown - 1))
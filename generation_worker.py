@@ -0,0 +1,99 @@
+import queue
+import threading
+
+
+class GenerationWorker:
+    """課題文生成をバックグラウンドスレッドで実行するワーカー
+
+    OpenAI への問い合わせなどブロッキングする処理を別スレッドで実行し、
+    結果はキュー経由で Tk のメインループへ返す。メインループ側は
+    poll() を定期的に呼び出して途中経過・完了のコールバックを実行する。
+    """
+
+    def __init__(self):
+        self._results = queue.Queue()
+        self._lock = threading.Lock()
+        self._job_id = 0
+        self._active_job_id = None
+        self._callbacks = {}
+
+    def submit(self, func, *args, on_done=None, on_progress=None):
+        """func(*args) をバックグラウンドで実行し、ジョブIDを返す
+
+        実行中のジョブがあればキャンセルしてから開始する。
+        on_done(result, error) は poll() を呼んだスレッド（メインループ）で呼ばれる。
+        on_progress を指定すると func は on_progress キーワード引数で途中経過を
+        報告する関数を受け取り、報告した値ごとに on_progress(value) がメインループで
+        呼ばれる。報告する関数はキャンセルされていれば False を返す。
+        """
+        with self._lock:
+            self._job_id += 1
+            job_id = self._job_id
+            self._active_job_id = job_id
+            self._callbacks = {job_id: (on_done, on_progress)}
+
+        kwargs = {}
+        if on_progress is not None:
+            kwargs["on_progress"] = lambda value: self._report(job_id, value)
+
+        thread = threading.Thread(
+            target=self._run, args=(job_id, func, args, kwargs), daemon=True
+        )
+        thread.start()
+        return job_id
+
+    def _run(self, job_id, func, args, kwargs):
+        try:
+            result = func(*args, **kwargs)
+            error = None
+        except Exception as e:
+            result = None
+            error = e
+        self._results.put((job_id, True, result, error))
+
+    def _report(self, job_id, value):
+        with self._lock:
+            if job_id != self._active_job_id:
+                return False
+        self._results.put((job_id, False, value, None))
+        return True
+
+    def cancel(self):
+        """実行中のジョブをキャンセルする
+
+        HTTP リクエスト自体は中断できないため、スレッドはそのまま終了させ、
+        結果だけを破棄する。
+        """
+        with self._lock:
+            cancelled = self._active_job_id is not None
+            self._active_job_id = None
+            self._callbacks = {}
+        return cancelled
+
+    def is_busy(self):
+        with self._lock:
+            return self._active_job_id is not None
+
+    def poll(self):
+        """途中経過と完了したジョブの結果を取り出してコールバックを実行する"""
+        while True:
+            try:
+                job_id, done, result, error = self._results.get_nowait()
+            except queue.Empty:
+                return
+
+            with self._lock:
+                # キャンセル済み、または古いジョブの結果は破棄
+                if job_id != self._active_job_id:
+                    continue
+                if done:
+                    self._active_job_id = None
+                    on_done, _ = self._callbacks.pop(job_id, (None, None))
+                else:
+                    _, on_progress = self._callbacks.get(job_id, (None, None))
+
+            if not done:
+                if on_progress:
+                    on_progress(result)
+            elif on_done:
+                on_done(result, error)
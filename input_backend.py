@@ -0,0 +1,294 @@
+"""キー入力の取得方法（入力バックエンド）
+
+どのバックエンドも、1打鍵ごとに on_key(player, char, timestamp, event) を
+Tk のメインループ上で呼ぶ。player が None のときは、どちらのプレイヤーの
+入力か文字からは決められない（入力を待っているプレイヤーに振り分ける）。
+
+- TkInputBackend: Tk の <KeyPress>。Player 1 は小文字、Player 2 は大文字で入力する
+- DeviceInputBackend: キーボードごとにプレイヤーを割り当て、専用スレッドで読み取る。
+  Linux の evdev（open_evdev_keyboards()）か、テスト用の FakeKeyboard を使う
+"""
+import os
+import queue
+import select
+import struct
+import threading
+import time
+import tkinter as tk
+
+# Linux の入力イベント（linux/input-event-codes.h）
+EV_KEY = 1
+KEY_RELEASE = 0
+KEY_PRESS = 1
+KEY_REPEAT = 2
+
+# キーコード -> 入力文字（US 配列、シフトなし）
+KEYMAP = {
+    2: "1", 3: "2", 4: "3", 5: "4", 6: "5", 7: "6", 8: "7", 9: "8", 10: "9", 11: "0",
+    12: "-",
+    16: "q", 17: "w", 18: "e", 19: "r", 20: "t", 21: "y", 22: "u", 23: "i", 24: "o",
+    25: "p",
+    30: "a", 31: "s", 32: "d", 33: "f", 34: "g", 35: "h", 36: "j", 37: "k", 38: "l",
+    40: "'",
+    44: "z", 45: "x", 46: "c", 47: "v", 48: "b", 49: "n", 50: "m",
+    51: ",", 52: ".", 53: "/",
+    57: " ",
+}  # fmt: skip
+KEYCODES = {char: code for code, char in KEYMAP.items()}
+
+
+class MainLoopQueue:
+    """別スレッドから Tk のメインループに処理を渡すキュー
+
+    put(*args) はどのスレッドからでも呼べ、メインループ上で handler(*args) が呼ばれる。
+    Tk 側はパイプのファイルハンドラで起こされるので、after() でポーリングするより
+    遅れが小さい。root が None のときは put() したスレッドですぐに handler を呼ぶ
+    （Tk を使わないテストやベンチマーク用）。
+    """
+
+    def __init__(self, root, handler):
+        self.root = root
+        self.handler = handler
+        self._items = queue.SimpleQueue()
+        self._wake_read = self._wake_write = None
+
+    def start(self):
+        if self.root is None:
+            return
+        self._wake_read, self._wake_write = os.pipe()
+        self.root.tk.createfilehandler(self._wake_read, tk.READABLE, self._on_wake)
+
+    def stop(self):
+        if self._wake_read is None:
+            return
+        self.root.tk.deletefilehandler(self._wake_read)
+        os.close(self._wake_read)
+        os.close(self._wake_write)
+        self._wake_read = self._wake_write = None
+
+    def put(self, *args):
+        if self._wake_write is None:
+            self.handler(*args)
+            return
+        self._items.put(args)
+        os.write(self._wake_write, b"x")
+
+    def _on_wake(self, fd, mask):
+        os.read(self._wake_read, 4096)
+        self.drain()
+
+    def drain(self):
+        """たまっている処理をすべて実行する"""
+        while True:
+            try:
+                args = self._items.get_nowait()
+            except queue.Empty:
+                return
+            self.handler(*args)
+
+
+class TkInputBackend:
+    """Tk の <KeyPress> で入力を受け取る
+
+    player を省略すると1台のキーボードを2人で使う（Player 1 は小文字、Player 2 は大文字）。
+    player を指定すると、すべての入力をそのプレイヤーの入力にする。
+    """
+
+    def __init__(self, root, on_key, player=None):
+        self.root = root
+        self.on_key = on_key
+        self.player = player
+        self.player_count = 2 if player is None else 1
+
+    def start(self):
+        self.root.bind("<KeyPress>", self.on_key_press)
+
+    def stop(self):
+        self.root.unbind("<KeyPress>")
+
+    def on_key_press(self, event):
+        # 特殊キーは無視
+        if len(event.char) != 1 or not event.char.isprintable():
+            return
+
+        typed_char = event.char
+        timestamp = time.monotonic_ns()
+
+        if self.player is not None:
+            player = self.player
+        # Player 1 は小文字、Player 2 は大文字で入力する
+        elif typed_char == "-":
+            # ハイフンは大文字・小文字がないので、入力を待っているプレイヤーに振り分ける
+            player = None
+        elif typed_char.islower():
+            player = 0
+        elif typed_char.isupper():
+            player = 1
+        else:
+            return
+
+        self.on_key(player, typed_char.lower(), timestamp, event)
+
+
+class DeviceInputBackend:
+    """キーボードごとにプレイヤーを割り当てて入力を受け取る
+
+    devices[i] の入力は Player i+1 の入力になる。デバイスは fileno() と、
+    読み取れたイベント（type, code, value 属性を持つ）を返す read() を持つもの
+    （evdev.InputDevice または FakeKeyboard）。
+
+    読み取りは専用スレッドで select() して行い、受け取った時刻を付けて
+    MainLoopQueue でメインループに渡す。
+    """
+
+    def __init__(self, root, devices, on_key):
+        self.devices = list(devices)
+        self.player_count = len(self.devices)
+
+        self._keys = MainLoopQueue(root, on_key)
+        self._stop_read, self._stop_write = os.pipe()
+        self._thread = None
+
+    def start(self):
+        self._keys.start()
+        self._thread = threading.Thread(target=self._read_loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """読み取りを止めてデバイスを閉じる（start() していなくても、何度呼んでもよい）"""
+        if self._stop_read is None:
+            return
+        if self._thread is not None:
+            os.write(self._stop_write, b"x")
+            self._thread.join()
+            self._thread = None
+        self._keys.stop()
+        os.close(self._stop_read)
+        os.close(self._stop_write)
+        self._stop_read = self._stop_write = None
+        for device in self.devices:
+            device.close()
+
+    def _read_loop(self):
+        players = {device.fileno(): player for player, device in enumerate(self.devices)}
+        devices = {device.fileno(): device for device in self.devices}
+        watched = list(devices) + [self._stop_read]
+        put = self._keys.put
+        clock = time.monotonic_ns
+
+        while True:
+            ready, _, _ = select.select(watched, [], [])
+            if self._stop_read in ready:
+                return
+
+            for fd in ready:
+                timestamp = clock()
+                try:
+                    device_events = devices[fd].read()
+                except OSError:
+                    # 抜かれたキーボードは以降読まない
+                    watched.remove(fd)
+                    continue
+                for event in device_events:
+                    if event.type != EV_KEY or event.value != KEY_PRESS:
+                        continue
+                    char = KEYMAP.get(event.code)
+                    if char is not None:
+                        put(players[fd], char, timestamp, None)
+
+
+def open_evdev_keyboards(paths=None, grab=True):
+    """evdev でキーボードを開く（paths を省略すると接続されているキーボードすべて）
+
+    grab すると、そのキーボードの入力は他のアプリケーション（Tk を含む）に届かない。
+    """
+    try:
+        import evdev
+    except ImportError:
+        raise RuntimeError("evdev is required for --input evdev (pip install evdev)")
+
+    keyboards = []
+    try:
+        if paths is None:
+            for path in sorted(evdev.list_devices()):
+                device = evdev.InputDevice(path)
+                keys = device.capabilities().get(evdev.ecodes.EV_KEY, [])
+                if evdev.ecodes.KEY_A in keys and evdev.ecodes.KEY_Z in keys:
+                    keyboards.append(device)
+                else:
+                    device.close()
+        else:
+            for path in paths:
+                keyboards.append(evdev.InputDevice(path))
+
+        if grab:
+            for device in keyboards:
+                device.grab()
+    except BaseException:
+        # 途中で失敗したら、開いたキーボードを閉じてから呼び出し側に任せる（grab も解除される）
+        for device in keyboards:
+            device.close()
+        raise
+
+    if not keyboards:
+        # 呼び出し側が Tk のキー入力に切り替えられるようにする
+        raise RuntimeError("no keyboards found (is the user in the input group?)")
+    return keyboards
+
+
+class FakeEvent:
+    __slots__ = ("type", "code", "value")
+
+    def __init__(self, type, code, value):
+        self.type = type
+        self.code = code
+        self.value = value
+
+
+class FakeKeyboard:
+    """テスト用のキーボード（type() した文字が入力イベントとして読み出される）
+
+    evdev と同じように、パイプに書き込んだイベントを read() で読み出す。
+    """
+
+    _EVENT = struct.Struct("<HHi")
+
+    def __init__(self):
+        self._read_fd, self._write_fd = os.pipe()
+
+    def fileno(self):
+        return self._read_fd
+
+    def type(self, text):
+        """text の各文字のキーを押して離す"""
+        data = bytearray()
+        for char in text:
+            code = KEYCODES[char.lower()]
+            data += self._EVENT.pack(EV_KEY, code, KEY_PRESS)
+            data += self._EVENT.pack(EV_KEY, code, KEY_RELEASE)
+        os.write(self._write_fd, bytes(data))
+
+    def read(self):
+        data = os.read(self._read_fd, self._EVENT.size * 256)
+        if not data:
+            raise OSError("fake keyboard closed")
+        return [
+            FakeEvent(*self._EVENT.unpack_from(data, offset))
+            for offset in range(0, len(data) - len(data) % self._EVENT.size, self._EVENT.size)
+        ]
+
+    def close(self):
+        for fd in (self._read_fd, self._write_fd):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+def create_input_backend(kind, root, on_key, keyboards=None, player=None):
+    """--input の値に応じた入力バックエンドを作る（player は Tk 入力を1人で使う場合）"""
+    if kind == "tk":
+        return TkInputBackend(root, on_key, player)
+    if kind == "evdev":
+        return DeviceInputBackend(root, open_evdev_keyboards(keyboards), on_key)
+    raise ValueError(f"unknown input backend {kind!r}")
@@ -0,0 +1,62 @@
+import json
+
+
+class ObjectStreamParser:
+    """少しずつ届く JSON テキストから、閉じた時点でオブジェクトを取り出すパーサー
+
+    feed() に受信したテキストを渡すと、その時点で閉じ括弧まで届いた
+    「中にオブジェクトを含まないオブジェクト」を dict のリストで返す。
+    {"sentences": [{...}, {...}]} のような応答なら、全体が届く前に配列の要素を
+    1つずつ取り出せる。コードブロックの ``` など JSON の外側の文字は無視する。
+    """
+
+    def __init__(self):
+        self._buffer = []  # 受信したテキスト（text で連結して返す）
+        self._current = None  # 読み込み中の最も内側のオブジェクトの文字
+        self._depth = 0  # オブジェクトの入れ子の深さ
+        self._in_string = False
+        self._escape = False
+
+    @property
+    def text(self):
+        return "".join(self._buffer)
+
+    def feed(self, chunk):
+        self._buffer.append(chunk)
+        objects = []
+        current = self._current
+        in_string = self._in_string
+        escape = self._escape
+
+        for char in chunk:
+            if current is not None:
+                current.append(char)
+
+            if in_string:
+                if escape:
+                    escape = False
+                elif char == "\\":
+                    escape = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char == "{":
+                self._depth += 1
+                # より内側のオブジェクトが始まったら、そちらを読み込み直す
+                current = ["{"]
+            elif char == "}" and self._depth:
+                self._depth -= 1
+                if current is not None:
+                    try:
+                        value = json.loads("".join(current))
+                    except ValueError:
+                        value = None
+                    if isinstance(value, dict):
+                        objects.append(value)
+                    current = None
+
+        self._current = current
+        self._in_string = in_string
+        self._escape = escape
+        return objects
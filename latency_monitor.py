@@ -0,0 +1,103 @@
+import collections
+import os
+import time
+
+from paths import get_data_dir
+
+
+class LatencyMonitor:
+    """キー入力から画面の描画完了までの遅延を計測して HUD に表示する
+
+    on_key() でキー入力を受け付けた時刻を、on_render() の後に Tk がアイドルに
+    なった（＝再描画が終わった）時刻を記録し、その差を遅延とする。
+    X サーバーの event.time との差からイベントがキューで待たされた時間も求める。
+    """
+
+    def __init__(self, root, hud_label, fps=60, window=120):
+        self.root = root
+        self.hud_label = hud_label
+        self.frame_ns = 1_000_000_000 // fps
+
+        self.pending = []  # 描画待ちのキー入力 (受付時刻 ns, キュー待ち ms)
+        self.samples = []  # (描画までの遅延 ms, キュー待ち ms)
+        self.recent = collections.deque(maxlen=window)
+        self.dropped_frames = 0
+        self._event_offset = None
+        self._paint_job = None
+        self._last_hud_update = 0
+
+    def reset(self):
+        self.pending.clear()
+        self.samples.clear()
+        self.recent.clear()
+        self.dropped_frames = 0
+        self._event_offset = None
+        if self._paint_job is not None:
+            self.root.after_cancel(self._paint_job)
+            self._paint_job = None
+        self.hud_label.config(text="")
+
+    def on_key(self, event, received_ns):
+        """描画が必要なキー入力を受け付けた"""
+        # event.time はX サーバーの時刻(ms)で基準が異なるため、最小の差を基準にする
+        queue_ms = 0.0
+        event_time = getattr(event, "time", None)
+        if event_time:
+            offset = received_ns / 1_000_000 - event_time
+            if self._event_offset is None or offset < self._event_offset:
+                self._event_offset = offset
+            queue_ms = offset - self._event_offset
+        self.pending.append((received_ns, queue_ms))
+
+    def on_render(self):
+        """表示を更新した（実際の再描画は Tk のアイドル処理で行われる）"""
+        if self.pending and self._paint_job is None:
+            self._paint_job = self.root.after_idle(self._painted)
+
+    def _painted(self):
+        self._paint_job = None
+        now = time.monotonic_ns()
+
+        oldest = now
+        for received_ns, queue_ms in self.pending:
+            latency_ms = (now - received_ns) / 1_000_000
+            self.samples.append((latency_ms, queue_ms))
+            self.recent.append(latency_ms)
+            oldest = min(oldest, received_ns)
+        self.pending.clear()
+
+        # 最も古い入力から描画までに過ぎたフレーム数のうち、1フレームを超えた分を落としたとみなす
+        self.dropped_frames += max(0, (now - oldest) // self.frame_ns - 1)
+
+        # HUD 自体の更新で遅延が増えないよう、更新は 4 回/秒まで
+        if now - self._last_hud_update >= 250_000_000:
+            self._last_hud_update = now
+            self.update_hud()
+
+    def update_hud(self):
+        if not self.recent:
+            return
+        ordered = sorted(self.recent)
+        p50 = ordered[len(ordered) // 2]
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        self.hud_label.config(
+            text=f"遅延 p50 {p50:.1f}ms / p95 {p95:.1f}ms\nフレーム落ち {self.dropped_frames}"
+        )
+
+    def dump(self, path=None):
+        """計測結果を CSV に書き出してパスを返す（計測値がなければ None）"""
+        if not self.samples:
+            return None
+
+        if path is None:
+            directory = os.path.join(get_data_dir(), "latency")
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(
+                directory, time.strftime("latency-%Y%m%d-%H%M%S.csv")
+            )
+
+        with open(path, "w") as f:
+            f.write("key_to_paint_ms,event_queue_ms\n")
+            for latency_ms, queue_ms in self.samples:
+                f.write(f"{latency_ms:.3f},{queue_ms:.3f}\n")
+        return path
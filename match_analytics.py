@@ -0,0 +1,385 @@
+"""試合の打鍵記録（.vtdr）の列形式への書き出しと、苦手なキーの分析
+
+記録を打鍵1回を1行とする列（NumPy 配列）にまとめ、CSV または NPZ に書き出す。
+分析はすべて配列の演算で行うので、数千試合分（数百万打鍵）でも数秒で終わる。
+NumPy が必要（pip install numpy）。ゲーム本体は NumPy がなくても動く。
+
+    # ~/.vs-typing-dojo/recordings/ の記録をまとめて書き出す
+    python match_analytics.py export matches.npz
+    python match_analytics.py export matches.csv path/to/recordings/
+
+    # キーごとのミス率・2文字の並びごとの打鍵間隔・試合を重ねるごとの変化
+    python match_analytics.py analyze
+    python match_analytics.py analyze matches.npz --player 2 --top 15
+"""
+import argparse
+import csv
+import glob
+import os
+import sys
+
+from paths import get_data_dir
+from recorder import FLAG_COMPLETED, FLAG_CORRECT, KeystrokeRecorder, load_recording
+
+# 打鍵ごとの列（CSV の列の順番）
+KEY_COLUMNS = (
+    "match",  # 試合の番号（matches_* の添字）
+    "player",  # 0 から始まるプレイヤー番号
+    "sentence",  # 試合内で何番目に出た課題文か
+    "char",  # 入力した文字
+    "expected",  # 期待していた文字（標準の綴りでの次の文字）
+    "target",  # 打とうとした文字（正しければ char、ミスなら expected）
+    "previous",  # 同じ課題文で直前に正しく入力した文字（なければ 0）
+    "correct",
+    "completed",
+    "timestamp_ns",
+    "interval_ns",  # previous を入力してからの時間（previous がなければ -1）
+)
+CHAR_COLUMNS = ("char", "expected", "target", "previous")
+
+# 試合ごとの列（NPZ では matches_ を付けて保存する）
+MATCH_COLUMNS = ("started_at", "player_count")
+
+# 分析で平均を出すのに必要な最小の回数
+MIN_SAMPLES = 20
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError("match analytics needs NumPy (pip install numpy)") from None
+    return numpy
+
+
+def recording_paths(inputs):
+    """入力（ファイルまたはディレクトリ）を記録ファイルの一覧にする（省略すると保存先の全記録）"""
+    if not inputs:
+        directory = os.path.join(get_data_dir(), "recordings")
+        if not os.path.isdir(directory):
+            return []
+        inputs = [directory]
+    paths = []
+    for path in inputs:
+        if os.path.isdir(path):
+            paths.extend(sorted(glob.glob(os.path.join(path, "*.vtdr"))))
+        else:
+            paths.append(path)
+    return paths
+
+
+def recording_columns(recording, match):
+    """1試合分の記録を生の列にする（previous と interval_ns は add_previous() で求める）"""
+    np = _numpy()
+    flags = np.frombuffer(recording.flags.tobytes(), dtype=np.uint8)
+    key_index = np.frombuffer(recording.sentence_key_index.tobytes(), dtype="<u4")
+    count = len(recording)
+    # 打鍵の直前に出ていた課題文（課題文の切り替えは「何打鍵目の後か」で記録されている）
+    sentence = np.searchsorted(key_index, np.arange(count), side="right") - 1
+    return {
+        "match": np.full(count, match, dtype=np.int32),
+        "player": np.frombuffer(recording.players.tobytes(), dtype=np.uint8),
+        "sentence": sentence.astype(np.int32),
+        "char": np.frombuffer(recording.chars.tobytes(), dtype=np.uint8),
+        "expected": np.frombuffer(recording.expected.tobytes(), dtype=np.uint8),
+        "correct": (flags & FLAG_CORRECT) != 0,
+        "completed": (flags & FLAG_COMPLETED) != 0,
+        "timestamp_ns": np.frombuffer(recording.timestamps.tobytes(), dtype="<i8"),
+    }
+
+
+def add_previous(columns):
+    """target・previous・interval_ns の列を加える
+
+    試合・プレイヤー・課題文ごとに打鍵を時刻順に並べ、各打鍵より前で最後に正しく
+    入力した打鍵を累積最大値で求める。
+    """
+    np = _numpy()
+    correct = columns["correct"]
+    columns["target"] = np.where(correct, columns["char"], columns["expected"])
+
+    count = len(correct)
+    # 同じ試合・プレイヤー・課題文の打鍵が隣り合うように並べる（元の順番は保つ）
+    order = np.lexsort(
+        (np.arange(count), columns["sentence"], columns["player"], columns["match"])
+    )
+    group = (
+        columns["match"][order].astype(np.int64) << 40
+        | columns["player"][order].astype(np.int64) << 32
+        | columns["sentence"][order].astype(np.int64)
+    )
+    positions = np.arange(count)
+    last_correct = np.maximum.accumulate(np.where(correct[order], positions, -1))
+    # 自分より前（自分は含まない）で最後に正しく入力した打鍵
+    before = np.empty(count, dtype=np.int64)
+    before[:1] = -1
+    before[1:] = last_correct[:-1]
+    valid = before >= 0
+    valid[valid] = group[before[valid]] == group[valid]
+
+    previous = np.zeros(count, dtype=np.uint8)
+    interval = np.full(count, -1, dtype=np.int64)
+    source = order[before[valid]]
+    previous[order[valid]] = columns["char"][source]
+    interval[order[valid]] = columns["timestamp_ns"][order[valid]] - columns["timestamp_ns"][source]
+    columns["previous"] = previous
+    columns["interval_ns"] = interval
+    return columns
+
+
+def load_recordings(paths):
+    """記録ファイルを読み込んで (打鍵の列, 試合の列) を返す（読めないファイルは飛ばす）"""
+    np = _numpy()
+    parts = []
+    started_at = []
+    player_count = []
+    for path in paths:
+        try:
+            recording = load_recording(path)
+        except (OSError, ValueError) as e:
+            print(f"Skipping {path}: {e}", file=sys.stderr)
+            continue
+        parts.append(recording_columns(recording, len(started_at)))
+        started_at.append(recording.started_at)
+        player_count.append(recording.player_count)
+
+    if parts:
+        columns = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+    else:
+        columns = recording_columns(KeystrokeRecorder(), 0)
+    matches = {
+        "started_at": np.array(started_at, dtype=np.float64),
+        "player_count": np.array(player_count, dtype=np.uint8),
+    }
+    return add_previous(columns), matches
+
+
+def save_npz(path, columns, matches):
+    np = _numpy()
+    arrays = dict(columns)
+    arrays.update({f"matches_{name}": values for name, values in matches.items()})
+    np.savez_compressed(path, **arrays)
+
+
+def load_npz(path):
+    np = _numpy()
+    with np.load(path) as data:
+        columns = {name: data[name] for name in KEY_COLUMNS}
+        matches = {name: data[f"matches_{name}"] for name in MATCH_COLUMNS}
+    return columns, matches
+
+
+def save_csv(path, columns, matches):
+    """打鍵1回を1行にして書き出す（文字は文字のまま、試合の開始時刻を各行に付ける）"""
+    np = _numpy()
+    started_at = matches["started_at"][columns["match"]] if len(columns["match"]) else []
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(KEY_COLUMNS + ("started_at",))
+        values = []
+        for name in KEY_COLUMNS:
+            column = columns[name]
+            if name in CHAR_COLUMNS:
+                column = np.array([chr(code) if code else "" for code in range(256)])[column]
+            elif column.dtype == bool:
+                column = column.astype(np.uint8)
+            values.append(column.tolist())
+        values.append(np.asarray(started_at).tolist())
+        writer.writerows(zip(*values))
+
+
+def load_csv(path):
+    np = _numpy()
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        rows = list(zip(*reader)) or [()] * len(header)
+    raw = dict(zip(header, rows))
+
+    columns = {}
+    for name in KEY_COLUMNS:
+        if name in CHAR_COLUMNS:
+            columns[name] = np.array([ord(c) if c else 0 for c in raw[name]], dtype=np.uint8)
+        elif name in ("correct", "completed"):
+            columns[name] = np.array(raw[name], dtype=np.uint8).astype(bool)
+        else:
+            columns[name] = np.array(raw[name], dtype=np.int64)
+
+    # 試合ごとの開始時刻は各行に付いているものから戻す
+    match_count = int(columns["match"].max()) + 1 if len(columns["match"]) else 0
+    started_at = np.zeros(match_count)
+    started_at[columns["match"]] = np.array(raw["started_at"], dtype=np.float64)
+    player_count = np.zeros(match_count, dtype=np.uint8)
+    np.maximum.at(player_count, columns["match"], columns["player"].astype(np.uint8) + 1)
+    return columns, {"started_at": started_at, "player_count": player_count}
+
+
+def load_inputs(inputs):
+    """.npz / .csv ならそのまま、それ以外は記録ファイル（.vtdr やディレクトリ）として読み込む"""
+    if len(inputs) == 1 and inputs[0].endswith(".npz"):
+        return load_npz(inputs[0])
+    if len(inputs) == 1 and inputs[0].endswith(".csv"):
+        return load_csv(inputs[0])
+    return load_recordings(recording_paths(inputs))
+
+
+def key_miss_rates(columns, min_samples=MIN_SAMPLES):
+    """キーごとの (文字, 打鍵数, ミス数, ミス率) をミス率の高い順に返す"""
+    np = _numpy()
+    target = columns["target"]
+    totals = np.bincount(target, minlength=256)
+    misses = np.bincount(target[~columns["correct"]], minlength=256)
+    keys = np.flatnonzero(totals >= max(min_samples, 1))
+    rates = misses[keys] / totals[keys]
+    ranked = keys[np.argsort(-rates, kind="stable")]
+    return [(chr(k), int(totals[k]), int(misses[k]), float(misses[k] / totals[k])) for k in ranked]
+
+
+def bigram_latencies(columns, min_samples=MIN_SAMPLES):
+    """2文字の並びごとの (並び, 回数, 平均打鍵間隔 ms, ミス率) を打鍵間隔の長い順に返す
+
+    打鍵間隔は1文字目を正しく入力してから2文字目を正しく入力するまでの時間
+    （間のミスタイプを含む）。
+    """
+    np = _numpy()
+    has_previous = columns["interval_ns"] >= 0
+    bigram = columns["previous"].astype(np.int64) * 256 + columns["target"]
+    attempts = np.bincount(bigram[has_previous], minlength=65536)
+    misses = np.bincount(bigram[has_previous & ~columns["correct"]], minlength=65536)
+
+    hits = has_previous & columns["correct"]
+    counts = np.bincount(bigram[hits], minlength=65536)
+    sums = np.bincount(bigram[hits], weights=columns["interval_ns"][hits], minlength=65536)
+
+    codes = np.flatnonzero(counts >= max(min_samples, 1))
+    means = sums[codes] / counts[codes] / 1e6
+    ranked = np.argsort(-means, kind="stable")
+    return [
+        (
+            chr(codes[i] >> 8) + chr(codes[i] & 0xFF),
+            int(counts[codes[i]]),
+            float(means[i]),
+            float(misses[codes[i]] / attempts[codes[i]]),
+        )
+        for i in ranked
+    ]
+
+
+def match_progress(columns, matches, player=None):
+    """試合ごとの (開始時刻, 打鍵数, ミス率, 入力中の CPM) を開始時刻の順に返す
+
+    入力中の CPM は、正しい打鍵の数を打鍵間隔の合計（課題文の切り替えや入力していない
+    時間を除く）で割ったもの。
+    """
+    np = _numpy()
+    rows = np.ones(len(columns["match"]), dtype=bool)
+    if player is not None:
+        rows = columns["player"] == player
+    match = columns["match"][rows]
+    correct = columns["correct"][rows]
+    interval = columns["interval_ns"][rows]
+    timed = correct & (interval >= 0)
+
+    match_count = len(matches["started_at"])
+    keys = np.bincount(match, minlength=match_count)
+    misses = np.bincount(match[~correct], minlength=match_count)
+    timed_keys = np.bincount(match[timed], minlength=match_count)
+    typing_ns = np.bincount(match[timed], weights=interval[timed], minlength=match_count)
+
+    played = np.flatnonzero(keys > 0)
+    played = played[np.argsort(matches["started_at"][played], kind="stable")]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        miss_rate = misses[played] / keys[played]
+        cpm = np.where(typing_ns[played] > 0, timed_keys[played] * 60e9 / typing_ns[played], 0)
+    return matches["started_at"][played], keys[played], miss_rate, cpm
+
+
+def trend(values):
+    """試合を重ねるごとの変化（100試合あたりの傾き、最初と最後の 1/10 の平均）"""
+    np = _numpy()
+    if len(values) < 2:
+        return None
+    slope = np.polyfit(np.arange(len(values)), values, 1)[0] * 100
+    tenth = max(1, len(values) // 10)
+    return slope, float(values[:tenth].mean()), float(values[-tenth:].mean())
+
+
+def analyze(columns, matches, player=None, top=10):
+    """分析結果を表示用の文字列にする"""
+    if player is not None:
+        rows = columns["player"] == player
+        selected = {name: values[rows] for name, values in columns.items()}
+    else:
+        selected = columns
+
+    lines = [
+        f"{len(matches['started_at'])} matches, {len(selected['match'])} keystrokes"
+        + (f" (player {player + 1})" if player is not None else "")
+    ]
+
+    lines.append("")
+    lines.append("Keys with the highest miss rate:")
+    for char, total, missed, rate in key_miss_rates(selected)[:top]:
+        lines.append(f"  {char!r:<5} {rate * 100:5.1f}%  ({missed}/{total})")
+
+    lines.append("")
+    lines.append("Slowest bigrams (mean time from the first to the second key):")
+    for bigram, count, mean_ms, rate in bigram_latencies(selected)[:top]:
+        lines.append(f"  {bigram!r:<6} {mean_ms:7.1f} ms  miss {rate * 100:5.1f}%  ({count} times)")
+
+    started_at, keys, miss_rate, cpm = match_progress(columns, matches, player)
+    lines.append("")
+    lines.append(f"Over {len(started_at)} matches:")
+    for label, values, unit in (("miss rate", miss_rate * 100, "%"), ("typing CPM", cpm, "")):
+        result = trend(values)
+        if result is None:
+            lines.append(f"  {label}: not enough matches")
+            continue
+        slope, first, last = result
+        lines.append(
+            f"  {label}: {first:.1f}{unit} -> {last:.1f}{unit}"
+            f" (first/last 10% of matches, {slope:+.2f}{unit} per 100 matches)"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="VS Typing Dojo match analytics")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export = subparsers.add_parser("export", help="記録を列形式（.npz / .csv）で書き出す")
+    export.add_argument("output", help="書き出すファイル（拡張子 .npz または .csv）")
+    export.add_argument(
+        "inputs", nargs="*", help="記録ファイルかディレクトリ（省略すると保存先の全記録）"
+    )
+
+    analyze_parser = subparsers.add_parser("analyze", help="苦手なキーと上達の様子を表示する")
+    analyze_parser.add_argument(
+        "inputs", nargs="*", help="書き出したファイル、記録ファイルかディレクトリ"
+    )
+    analyze_parser.add_argument("--player", type=int, help="プレイヤー番号（1 から）")
+    analyze_parser.add_argument("--top", type=int, default=10, help="表示する件数")
+
+    args = parser.parse_args()
+    try:
+        if args.command == "export":
+            columns, matches = load_recordings(recording_paths(args.inputs))
+            if args.output.endswith(".csv"):
+                save_csv(args.output, columns, matches)
+            else:
+                save_npz(args.output, columns, matches)
+            print(
+                f"Exported {len(columns['match'])} keystrokes from"
+                f" {len(matches['started_at'])} matches to {args.output}"
+            )
+        else:
+            columns, matches = load_inputs(args.inputs)
+            player = args.player - 1 if args.player is not None else None
+            print(analyze(columns, matches, player, args.top))
+    except (RuntimeError, OSError, ValueError, KeyError) as e:
+        print(f"Cannot {args.command}: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
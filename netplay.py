@@ -0,0 +1,419 @@
+"""LAN 対戦（1台がホストになり、ほかの端末が TCP で接続して対戦する）
+
+試合の状態はホストのエンジンだけが持つ。クライアントは打鍵をホストに送り、
+ホストは打鍵の結果などの差分だけを全員に送る。クライアントは MirrorEngine に
+差分を同じ順番で適用して、ホストと同じ状態を手元で再現して描画する。
+
+メッセージは先頭1バイトが種類で、続く内容はリトルエンディアン。
+
+    ホスト → クライアント
+    WELCOME   <BB  自分のプレイヤー番号, プレイヤー数
+    START     <HB  ゲーム時間（秒）, カウントダウン（秒）
+    GO             カウントダウンが終わり、最初の課題文を待つ
+    SENTENCE  <H   長さ + "日本語\\x1fカタカナ\\x1fローマ字" (UTF-8)
+    KEY       <BBb プレイヤー番号, 文字, feed() の結果
+    END            ゲーム終了
+
+    クライアント → ホスト
+    TYPE      <B   文字
+
+打鍵1回あたりの通信量は、上り 2 バイト・下り 4 バイト（× 接続数）。
+試合の途中で接続したクライアントは、次の試合から参加する。
+"""
+import asyncio
+import collections
+import struct
+import threading
+import time
+
+from engine import IGNORED, TypingEngine
+from input_backend import MainLoopQueue
+
+DEFAULT_PORT = 8766
+
+WELCOME = ord("W")
+START = ord("S")
+GO = ord("G")
+SENTENCE = ord("N")
+KEY = ord("K")
+END = ord("E")
+TYPE = ord("k")
+
+_WELCOME = struct.Struct("<BB")
+_START = struct.Struct("<HB")
+_KEY = struct.Struct("<BBb")
+_TYPE = struct.Struct("<B")
+_LENGTH = struct.Struct("<H")
+
+# 種類ごとの内容のバイト数（None は長さ付き）
+_PAYLOAD_SIZES = {
+    WELCOME: _WELCOME.size,
+    START: _START.size,
+    GO: 0,
+    SENTENCE: None,
+    KEY: _KEY.size,
+    END: 0,
+    TYPE: _TYPE.size,
+}
+
+FIELD_SEPARATOR = "\x1f"
+UNKNOWN_CHAR = ord("?")
+
+# 送信待ちがこれを超えたクライアントは応答がないとみなして切断する
+MAX_BUFFERED = 256 * 1024
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def _char_code(char):
+    code = ord(char)
+    # ローマ字入力に使わない文字は、どれも不正解になる1文字にまとめる
+    return code if code < 128 else UNKNOWN_CHAR
+
+
+def encode_sentence(word):
+    text = FIELD_SEPARATOR.join((word["japanese"], word["katakana"], word["romaji"]))
+    data = text.encode("utf-8")
+    return bytes((SENTENCE,)) + _LENGTH.pack(len(data)) + data
+
+
+def decode_sentence(payload):
+    japanese, katakana, romaji = payload.decode("utf-8").split(FIELD_SEPARATOR)
+    return {"japanese": japanese, "katakana": katakana, "romaji": romaji}
+
+
+def read_messages(buffer):
+    """buffer から完全なメッセージを取り出す
+
+    (種類, 内容) のリストと、読み終えたバイト数を返す。
+    """
+    messages = []
+    offset = 0
+    end = len(buffer)
+    while offset < end:
+        kind = buffer[offset]
+        size = _PAYLOAD_SIZES.get(kind, -1)
+        if size == -1:
+            raise ProtocolError(f"unknown message type {kind}")
+        start = offset + 1
+        if size is None:
+            if start + _LENGTH.size > end:
+                break
+            (size,) = _LENGTH.unpack_from(buffer, start)
+            start += _LENGTH.size
+        if start + size > end:
+            break
+        messages.append((kind, bytes(buffer[start : start + size])))
+        offset = start + size
+    return messages, offset
+
+
+class NetStats:
+    """通信量と打鍵の往復時間"""
+
+    def __init__(self):
+        self.keys = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.round_trips = []  # ns
+
+    def summary(self):
+        text = f"{self.keys} keys, sent {self.bytes_sent} B, received {self.bytes_received} B"
+        if self.round_trips:
+            ordered = sorted(self.round_trips)
+            p50, p95, p99 = (
+                ordered[min(len(ordered) - 1, len(ordered) * p // 100)] / 1_000_000
+                for p in (50, 95, 99)
+            )
+            text += f", round trip p50 {p50:.2f} ms, p95 {p95:.2f} ms, p99 {p99:.2f} ms"
+        return text
+
+
+class EventLoopThread:
+    """asyncio のイベントループを動かすスレッド"""
+
+    def __init__(self, name):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name=name, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def call(self, callback, *args):
+        """callback をループのスレッドで実行する（どのスレッドからでも呼べる）"""
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    def run(self, coroutine, timeout=None):
+        """coroutine をループで実行して結果を待つ"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(timeout)
+
+    def stop(self):
+        if self.thread.is_alive():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+        self.loop.close()
+
+
+class NetplayHost:
+    """LAN 対戦のホスト
+
+    接続してきたクライアントにプレイヤー番号 first_player, first_player+1, ... を
+    割り当て、クライアントの打鍵を入力バックエンドと同じ形で
+    on_key(player, char, timestamp, None) に渡す。
+    ゲームの進行（game_started() など）は Tk のメインループから呼ぶ。
+    """
+
+    def __init__(
+        self, root, on_key, player_count=2, first_player=1, port=DEFAULT_PORT, host="0.0.0.0"
+    ):
+        self.player_count = player_count
+        self.first_player = first_player
+        self.host = host
+        self.port = port
+        self.stats = NetStats()
+
+        self._keys = MainLoopQueue(root, on_key)
+        self._loop = EventLoopThread("netplay-host")
+        self._server = None
+        self._writers = {}  # プレイヤー番号 -> StreamWriter
+
+    def start(self):
+        """待ち受けを開始する（ポートが使えなければ OSError）"""
+        self._keys.start()
+        self._loop.start()
+        try:
+            self._loop.run(self._listen())
+        except OSError:
+            self._loop.stop()
+            self._keys.stop()
+            raise
+
+    async def _listen(self):
+        self._server = await asyncio.start_server(self._serve_client, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    def stop(self):
+        self._loop.run(self._close())
+        self._loop.stop()
+        self._keys.stop()
+
+    async def _close(self):
+        self._server.close()
+        for writer in list(self._writers.values()):
+            writer.close()
+
+    @property
+    def remote_players(self):
+        return sorted(self._writers)
+
+    async def _serve_client(self, reader, writer):
+        player = next(
+            (
+                player
+                for player in range(self.first_player, self.player_count)
+                if player not in self._writers
+            ),
+            None,
+        )
+        if player is None:
+            print("Netplay: rejected a client (no free player slot)")
+            writer.close()
+            return
+
+        peer = writer.get_extra_info("peername")
+        print(f"Netplay: player {player + 1} connected from {peer}")
+        self._writers[player] = writer
+        self._send(writer, bytes((WELCOME,)) + _WELCOME.pack(player, self.player_count))
+
+        buffer = bytearray()
+        try:
+            while True:
+                data = await reader.read(4096)
+                if not data:
+                    break
+                timestamp = time.monotonic_ns()
+                self.stats.bytes_received += len(data)
+                buffer += data
+                messages, consumed = read_messages(buffer)
+                del buffer[:consumed]
+                for kind, payload in messages:
+                    if kind != TYPE:
+                        raise ProtocolError(f"unexpected message type {kind} from client")
+                    self.stats.keys += 1
+                    self._keys.put(player, chr(payload[0]), timestamp, None)
+        except (ConnectionError, ProtocolError) as e:
+            print(f"Netplay: player {player + 1} error: {e}")
+        finally:
+            del self._writers[player]
+            writer.close()
+            print(f"Netplay: player {player + 1} disconnected")
+
+    def _send(self, writer, message):
+        if writer.transport.get_write_buffer_size() > MAX_BUFFERED:
+            writer.close()
+            return
+        writer.write(message)
+        self.stats.bytes_sent += len(message)
+
+    def _broadcast(self, message):
+        for writer in list(self._writers.values()):
+            self._send(writer, message)
+
+    def _send_key(self, player, message, result):
+        # 接続していないプレイヤーの無視された打鍵は送らない（クライアントの打鍵には
+        # 必ず結果を返す。クライアントはこれで往復時間を測る）
+        if result == IGNORED and player not in self._writers:
+            return
+        self._broadcast(message)
+
+    # 以下は Tk のメインループから呼ぶ
+    def game_started(self, duration, countdown):
+        self._loop.call(self._broadcast, bytes((START,)) + _START.pack(duration, countdown))
+
+    def game_go(self):
+        self._loop.call(self._broadcast, bytes((GO,)))
+
+    def sentence(self, word):
+        if word is not None:
+            self._loop.call(self._broadcast, encode_sentence(word))
+
+    def key_result(self, player, char, result):
+        message = bytes((KEY,)) + _KEY.pack(player, _char_code(char), result)
+        self._loop.call(self._send_key, player, message, result)
+
+    def game_ended(self):
+        self._loop.call(self._broadcast, bytes((END,)))
+
+
+class NetplayClient:
+    """LAN 対戦のクライアント
+
+    ホストから届いたメッセージを、メインループ上で on_message(kind, *args) として渡す。
+
+    - ("welcome", player, player_count)
+    - ("start", duration, countdown)
+    - ("go",)
+    - ("sentence", word)
+    - ("key", player, char, result)
+    - ("end",)
+    - ("disconnected", error)  error は切断の理由（ホストが閉じた場合は None）
+    """
+
+    def __init__(self, root, host, port=DEFAULT_PORT, on_message=None):
+        self.host = host
+        self.port = port
+        self.player = None
+        self.stats = NetStats()
+
+        self._messages = MainLoopQueue(root, on_message)
+        self._loop = EventLoopThread("netplay-client")
+        self._writer = None
+        self._read_task = None
+        self._sent_at = collections.deque()  # 結果待ちの打鍵を送った時刻
+
+    def start(self, timeout=5.0):
+        """ホストに接続する（接続できなければ OSError）"""
+        self._messages.start()
+        self._loop.start()
+        try:
+            self._loop.run(asyncio.wait_for(self._connect(), timeout))
+        except (OSError, asyncio.TimeoutError) as e:
+            self._loop.stop()
+            self._messages.stop()
+            raise OSError(f"cannot connect to {self.host}:{self.port}: {e}") from e
+
+    async def _connect(self):
+        reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        self._read_task = asyncio.get_running_loop().create_task(self._read_loop(reader))
+
+    def stop(self):
+        self._loop.run(self._close())
+        self._loop.stop()
+        self._messages.stop()
+
+    async def _close(self):
+        self._read_task.cancel()
+        self._writer.close()
+        try:
+            await self._read_task
+        except asyncio.CancelledError:
+            pass
+
+    def send_key(self, char):
+        """1打鍵をホストに送る（どのスレッドからでも呼べる）"""
+        self._sent_at.append(time.monotonic_ns())
+        self._loop.call(self._write, bytes((TYPE, _char_code(char))))
+
+    def _write(self, message):
+        self._writer.write(message)
+        self.stats.keys += 1
+        self.stats.bytes_sent += len(message)
+
+    async def _read_loop(self, reader):
+        put = self._messages.put
+        buffer = bytearray()
+        error = None
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                received_at = time.monotonic_ns()
+                self.stats.bytes_received += len(data)
+                buffer += data
+                messages, consumed = read_messages(buffer)
+                del buffer[:consumed]
+                for kind, payload in messages:
+                    if kind == KEY:
+                        player, code, result = _KEY.unpack(payload)
+                        if player == self.player and self._sent_at:
+                            self.stats.round_trips.append(received_at - self._sent_at.popleft())
+                        put("key", player, chr(code), result)
+                    elif kind == SENTENCE:
+                        put("sentence", decode_sentence(payload))
+                    elif kind == WELCOME:
+                        self.player, player_count = _WELCOME.unpack(payload)
+                        put("welcome", self.player, player_count)
+                    elif kind == START:
+                        put("start", *_START.unpack(payload))
+                    elif kind == GO:
+                        put("go")
+                    elif kind == END:
+                        put("end")
+                    else:
+                        raise ProtocolError(f"unexpected message type {kind} from host")
+        except (ConnectionError, ProtocolError) as e:
+            error = e
+        self._writer.close()
+        put("disconnected", error)
+
+
+class MirrorEngine(TypingEngine):
+    """ホストから届いた差分で試合の状態を再現するエンジン（クライアント用）
+
+    課題文はホストが選んで SENTENCE で送ってくるので、自分では選ばない。
+    打鍵はホストと同じ順番で feed() するので、スコアや入力済みの綴りはホストと一致する。
+    """
+
+    def new_word(self, timestamp=None):
+        # 次の課題文が届くまでは何も表示しない
+        self.current_word_data = None
+        self.automaton = None
+        return None
+
+    def apply(self, kind, *args):
+        """on_message() で受け取った差分を適用する（描画が必要なら True）"""
+        if kind == "go":
+            self.start()
+        elif kind == "sentence":
+            self.show_word(args[0])
+        elif kind == "key":
+            player, char, result = args
+            if result == IGNORED or player >= len(self.players):
+                return False
+            self.feed(player, char, time.monotonic_ns())
+        else:
+            return False
+        return True
@@ -0,0 +1,10 @@
+import os
+
+
+def get_data_dir():
+    """キャッシュや記録ファイルを保存するディレクトリを返す（なければ作成）"""
+    path = os.getenv("VS_TYPING_DOJO_HOME") or os.path.join(
+        os.path.expanduser("~"), ".vs-typing-dojo"
+    )
+    os.makedirs(path, exist_ok=True)
+    return path
@@ -0,0 +1,88 @@
+from dedup import DedupIndex
+from generation_worker import GenerationWorker
+
+
+class SentencePrefetcher:
+    """まだ出していない課題文が少なくなったら、バックグラウンドで補充する
+
+    check() を課題文が切り替わるたびに呼ぶと、残りが low_water 以下になった時点で
+    fetch(user_type, known) を別スレッドで実行する。fetch は known（既にある課題文の
+    DedupIndex）に含まれない課題文データのリストを返す。取得した課題文はメインループ上で
+    エンジンの課題文リストに追加され、次に山札から引くときから出題される。
+
+    ユーザーが押す「生成開始」とは別のワーカーを使うので、互いにキャンセルし合わない。
+    """
+
+    def __init__(self, root, engine, fetch, low_water=5, retry_interval=30.0):
+        self.root = root
+        self.engine = engine
+        self.fetch = fetch
+        self.low_water = low_water
+        self.retry_interval = retry_interval  # 補充できなかったときに次に試せるまでの秒数
+
+        self.worker = GenerationWorker()
+        self.user_type = None
+        self._poll_job = None
+        self._cooldown_job = None
+
+    def check(self, user_type):
+        """残りの課題文を確認し、少なければ補充を始める"""
+        self.user_type = user_type
+        if self.worker.is_busy() or self._cooldown_job is not None:
+            return
+
+        words = self.engine.words
+        # 課題文パックなど、追加できない課題文は十分な数があるので補充しない
+        if not isinstance(words, list):
+            return
+        if self.engine.remaining_words() > self.low_water:
+            return
+
+        known = DedupIndex(words)
+        self.worker.submit(
+            self.fetch,
+            user_type,
+            known,
+            on_done=lambda new_words, error: self._on_fetched(user_type, new_words, error),
+        )
+        self._schedule_poll()
+
+    def _schedule_poll(self):
+        if self._poll_job is None:
+            self._poll_job = self.root.after(100, self._poll)
+
+    def _poll(self):
+        self._poll_job = None
+        self.worker.poll()
+        if self.worker.is_busy():
+            self._schedule_poll()
+
+    def _on_fetched(self, user_type, new_words, error):
+        words = self.engine.words
+        added = 0
+        # 取得中にユーザータイプや課題文が切り替わった場合は追加しない
+        if not error and user_type == self.user_type and isinstance(words, list):
+            fresh = DedupIndex(words).filter(new_words or [])
+            words.extend(fresh)
+            added = len(fresh)
+
+        if added:
+            print(f"Prefetched {added} sentences for {user_type}")
+        else:
+            if error:
+                print(f"Sentence prefetch failed: {error}")
+            # API の障害中などに毎回問い合わせないよう、しばらくは補充しない
+            self._cooldown_job = self.root.after(
+                int(self.retry_interval * 1000), self._end_cooldown
+            )
+
+    def _end_cooldown(self):
+        self._cooldown_job = None
+
+    def cancel(self):
+        self.worker.cancel()
+        for job in (self._poll_job, self._cooldown_job):
+            if job is not None:
+                self.root.after_cancel(job)
+        self._poll_job = None
+        self._cooldown_job = None
@@ -1,3 +1,10 @@
+# プロンプトを変更した場合はインクリメントする（課題文キャッシュのキーに使用）
+PROMPT_VERSION = 1
+
+# 課題文生成に使用するモデル
+MODEL = "gpt-3.5-turbo"
+
+
 def get_kadai_list_creation_prompt(user_type: str) -> str:
     return f"""
 あなたはタイピングゲームの課題文章を作成するエキスパートです。
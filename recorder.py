@@ -0,0 +1,190 @@
+import os
+import struct
+import sys
+import time
+from array import array
+
+from paths import get_data_dir
+
+MAGIC = b"VTDR"
+FORMAT_VERSION = 1
+
+# ヘッダ: magic, version, プレイヤー数, 予約, 開始時刻(UNIX秒), 打鍵数, 課題文切り替え数, 課題文数
+_HEADER = struct.Struct("<4sHBBdIII")
+_STRING_LENGTH = struct.Struct("<H")
+
+# flags のビット
+FLAG_CORRECT = 1
+FLAG_COMPLETED = 2  # この打鍵で課題文を入力し終えた
+
+UNKNOWN_CHAR = ord("?")
+
+
+def _char_code(char):
+    code = ord(char) if char else 0
+    return code if code < 256 else UNKNOWN_CHAR
+
+
+def _little_endian(values):
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+class KeystrokeRecorder:
+    """1試合分の打鍵をコンパクトに記録する
+
+    打鍵ごとに「プレイヤー・入力文字・期待していた文字・正誤・時刻(ns)」を
+    配列に追記するだけにしておき、ファイルへの書き出しは試合終了時に一括で行う。
+    """
+
+    def __init__(self, player_count=2, started_at=None):
+        self.player_count = player_count
+        self.started_at = time.time() if started_at is None else started_at
+
+        # 打鍵
+        self.players = array("B")
+        self.chars = array("B")
+        self.expected = array("B")
+        self.flags = array("B")
+        self.timestamps = array("q")
+
+        # 課題文の切り替え（何打鍵目の後に、どの課題文になったか）
+        self.sentence_key_index = array("I")
+        self.sentence_timestamps = array("q")
+        self.sentence_ids = array("I")
+
+        # 課題文テーブル (japanese, katakana, romaji)
+        self.sentences = []
+        self._sentence_ids = {}
+
+    def record_key(self, player, char, expected, correct, completed, timestamp):
+        self.players.append(player)
+        self.chars.append(_char_code(char))
+        self.expected.append(_char_code(expected))
+        self.flags.append(
+            (FLAG_CORRECT if correct else 0) | (FLAG_COMPLETED if completed else 0)
+        )
+        self.timestamps.append(timestamp)
+
+    def record_sentence(self, word, timestamp):
+        key = word["japanese"]
+        sentence_id = self._sentence_ids.get(key)
+        if sentence_id is None:
+            sentence_id = len(self.sentences)
+            self._sentence_ids[key] = sentence_id
+            self.sentences.append(
+                (word["japanese"], word.get("katakana", ""), word["romaji"])
+            )
+
+        self.sentence_key_index.append(len(self.timestamps))
+        self.sentence_timestamps.append(timestamp)
+        self.sentence_ids.append(sentence_id)
+
+    def sentence_word(self, sentence_id):
+        """課題文テーブルの内容を課題文データ（辞書）として返す"""
+        japanese, katakana, romaji = self.sentences[sentence_id]
+        return {"japanese": japanese, "katakana": katakana, "romaji": romaji}
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def to_bytes(self):
+        parts = [
+            _HEADER.pack(
+                MAGIC,
+                FORMAT_VERSION,
+                self.player_count,
+                0,
+                self.started_at,
+                len(self.timestamps),
+                len(self.sentence_ids),
+                len(self.sentences),
+            ),
+            self.players.tobytes(),
+            self.chars.tobytes(),
+            self.expected.tobytes(),
+            self.flags.tobytes(),
+            _little_endian(self.timestamps),
+            _little_endian(self.sentence_key_index),
+            _little_endian(self.sentence_timestamps),
+            _little_endian(self.sentence_ids),
+        ]
+        for sentence in self.sentences:
+            for text in sentence:
+                encoded = text.encode("utf-8")
+                parts.append(_STRING_LENGTH.pack(len(encoded)))
+                parts.append(encoded)
+        return b"".join(parts)
+
+    def save(self, path=None):
+        """記録をファイルに書き出してパスを返す"""
+        if path is None:
+            directory = os.path.join(get_data_dir(), "recordings")
+            os.makedirs(directory, exist_ok=True)
+            name = time.strftime("match-%Y%m%d-%H%M%S", time.localtime(self.started_at))
+            path = os.path.join(directory, f"{name}.vtdr")
+
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+        return path
+
+
+def _read_array(data, offset, typecode, count):
+    values = array(typecode)
+    end = offset + values.itemsize * count
+    values.frombytes(data[offset:end])
+    if sys.byteorder == "big" and values.itemsize > 1:
+        values.byteswap()
+    return values, end
+
+
+def load_recording(path):
+    """save() で書き出した記録を KeystrokeRecorder として読み込む"""
+    with open(path, "rb") as f:
+        data = f.read()
+
+    (
+        magic,
+        version,
+        player_count,
+        _,
+        started_at,
+        key_count,
+        sentence_event_count,
+        sentence_count,
+    ) = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a keystroke recording")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"unsupported recording version {version}")
+
+    recording = KeystrokeRecorder(player_count, started_at)
+    offset = _HEADER.size
+    recording.players, offset = _read_array(data, offset, "B", key_count)
+    recording.chars, offset = _read_array(data, offset, "B", key_count)
+    recording.expected, offset = _read_array(data, offset, "B", key_count)
+    recording.flags, offset = _read_array(data, offset, "B", key_count)
+    recording.timestamps, offset = _read_array(data, offset, "q", key_count)
+    recording.sentence_key_index, offset = _read_array(
+        data, offset, "I", sentence_event_count
+    )
+    recording.sentence_timestamps, offset = _read_array(
+        data, offset, "q", sentence_event_count
+    )
+    recording.sentence_ids, offset = _read_array(
+        data, offset, "I", sentence_event_count
+    )
+
+    for _ in range(sentence_count):
+        texts = []
+        for _ in range(3):
+            (length,) = _STRING_LENGTH.unpack_from(data, offset)
+            offset += _STRING_LENGTH.size
+            texts.append(data[offset : offset + length].decode("utf-8"))
+            offset += length
+        recording._sentence_ids[texts[0]] = len(recording.sentences)
+        recording.sentences.append(tuple(texts))
+
+    return recording
@@ -0,0 +1,49 @@
+import time
+
+
+class RenderScheduler:
+    """表示の更新要求を溜めて、1フレーム（既定では約60Hz）に1回だけ描画する
+
+    キー入力やタイマーでは mark_dirty() で更新が必要な部分に印を付けるだけにし、
+    実際のウィジェット更新は flush() でまとめて行う。直前の描画から1フレーム以上
+    経っていればすぐに、そうでなければ次のフレームの時刻に描画する。
+    """
+
+    def __init__(self, root, fps=60):
+        self.root = root
+        self.frame_interval = 1.0 / fps
+        self._handlers = []
+        self._dirty = set()
+        self._job = None
+        self._last_flush = 0.0
+
+    def register(self, name, handler):
+        """描画処理を登録する（flush() では登録順に呼ばれる）"""
+        self._handlers.append((name, handler))
+
+    def mark_dirty(self, *names):
+        self._dirty.update(names)
+        if self._job is None:
+            wait = self._last_flush + self.frame_interval - time.perf_counter()
+            delay_ms = max(0, int(wait * 1000))
+            self._job = self.root.after(delay_ms, self.flush)
+
+    def flush(self):
+        """溜まっている更新をすぐに描画する"""
+        if self._job is not None:
+            self.root.after_cancel(self._job)
+            self._job = None
+
+        dirty = self._dirty
+        self._dirty = set()
+        self._last_flush = time.perf_counter()
+        for name, handler in self._handlers:
+            if name in dirty:
+                handler()
+
+    def cancel(self):
+        """溜まっている更新を描画せずに破棄する"""
+        if self._job is not None:
+            self.root.after_cancel(self._job)
+            self._job = None
+        self._dirty.clear()
@@ -0,0 +1,288 @@
+import unicodedata
+
+# カナ1文字または2文字（拗音など）→ ローマ字表記の一覧（先頭が標準の表記）
+KANA_SPELLINGS = {
+    "ア": ("a",),
+    "イ": ("i", "yi"),
+    "ウ": ("u", "wu", "whu"),
+    "エ": ("e",),
+    "オ": ("o",),
+    "カ": ("ka", "ca"),
+    "キ": ("ki",),
+    "ク": ("ku", "cu", "qu"),
+    "ケ": ("ke",),
+    "コ": ("ko", "co"),
+    "サ": ("sa",),
+    "シ": ("shi", "si", "ci"),
+    "ス": ("su",),
+    "セ": ("se", "ce"),
+    "ソ": ("so",),
+    "タ": ("ta",),
+    "チ": ("chi", "ti"),
+    "ツ": ("tsu", "tu"),
+    "テ": ("te",),
+    "ト": ("to",),
+    "ナ": ("na",),
+    "ニ": ("ni",),
+    "ヌ": ("nu",),
+    "ネ": ("ne",),
+    "ノ": ("no",),
+    "ハ": ("ha",),
+    "ヒ": ("hi",),
+    "フ": ("fu", "hu"),
+    "ヘ": ("he",),
+    "ホ": ("ho",),
+    "マ": ("ma",),
+    "ミ": ("mi",),
+    "ム": ("mu",),
+    "メ": ("me",),
+    "モ": ("mo",),
+    "ヤ": ("ya",),
+    "ユ": ("yu",),
+    "ヨ": ("yo",),
+    "ラ": ("ra",),
+    "リ": ("ri",),
+    "ル": ("ru",),
+    "レ": ("re",),
+    "ロ": ("ro",),
+    "ワ": ("wa",),
+    "ヰ": ("wi",),
+    "ヱ": ("we",),
+    "ヲ": ("wo",),
+    "ガ": ("ga",),
+    "ギ": ("gi",),
+    "グ": ("gu",),
+    "ゲ": ("ge",),
+    "ゴ": ("go",),
+    "ザ": ("za",),
+    "ジ": ("ji", "zi"),
+    "ズ": ("zu",),
+    "ゼ": ("ze",),
+    "ゾ": ("zo",),
+    "ダ": ("da",),
+    "ヂ": ("di",),
+    "ヅ": ("du",),
+    "デ": ("de",),
+    "ド": ("do",),
+    "バ": ("ba",),
+    "ビ": ("bi",),
+    "ブ": ("bu",),
+    "ベ": ("be",),
+    "ボ": ("bo",),
+    "パ": ("pa",),
+    "ピ": ("pi",),
+    "プ": ("pu",),
+    "ペ": ("pe",),
+    "ポ": ("po",),
+    "ヴ": ("vu",),
+    # 小書き文字（単独で使われた場合）
+    "ァ": ("xa", "la"),
+    "ィ": ("xi", "li", "xyi", "lyi"),
+    "ゥ": ("xu", "lu"),
+    "ェ": ("xe", "le", "xye", "lye"),
+    "ォ": ("xo", "lo"),
+    "ャ": ("xya", "lya"),
+    "ュ": ("xyu", "lyu"),
+    "ョ": ("xyo", "lyo"),
+    "ヮ": ("xwa", "lwa"),
+    "ヵ": ("xka", "lka"),
+    "ヶ": ("xke", "lke"),
+    "ッ": ("xtu", "ltu", "xtsu", "ltsu"),
+    # 拗音
+    "キャ": ("kya",),
+    "キィ": ("kyi",),
+    "キュ": ("kyu",),
+    "キェ": ("kye",),
+    "キョ": ("kyo",),
+    "シャ": ("sha", "sya"),
+    "シィ": ("syi",),
+    "シュ": ("shu", "syu"),
+    "シェ": ("she", "sye"),
+    "ショ": ("sho", "syo"),
+    "チャ": ("cha", "tya", "cya"),
+    "チィ": ("tyi", "cyi"),
+    "チュ": ("chu", "tyu", "cyu"),
+    "チェ": ("che", "tye", "cye"),
+    "チョ": ("cho", "tyo", "cyo"),
+    "ニャ": ("nya",),
+    "ニィ": ("nyi",),
+    "ニュ": ("nyu",),
+    "ニェ": ("nye",),
+    "ニョ": ("nyo",),
+    "ヒャ": ("hya",),
+    "ヒィ": ("hyi",),
+    "ヒュ": ("hyu",),
+    "ヒェ": ("hye",),
+    "ヒョ": ("hyo",),
+    "ミャ": ("mya",),
+    "ミィ": ("myi",),
+    "ミュ": ("myu",),
+    "ミェ": ("mye",),
+    "ミョ": ("myo",),
+    "リャ": ("rya",),
+    "リィ": ("ryi",),
+    "リュ": ("ryu",),
+    "リェ": ("rye",),
+    "リョ": ("ryo",),
+    "ギャ": ("gya",),
+    "ギィ": ("gyi",),
+    "ギュ": ("gyu",),
+    "ギェ": ("gye",),
+    "ギョ": ("gyo",),
+    "ジャ": ("ja", "zya", "jya"),
+    "ジィ": ("zyi", "jyi"),
+    "ジュ": ("ju", "zyu", "jyu"),
+    "ジェ": ("je", "zye", "jye"),
+    "ジョ": ("jo", "zyo", "jyo"),
+    "ヂャ": ("dya",),
+    "ヂィ": ("dyi",),
+    "ヂュ": ("dyu",),
+    "ヂェ": ("dye",),
+    "ヂョ": ("dyo",),
+    "ビャ": ("bya",),
+    "ビィ": ("byi",),
+    "ビュ": ("byu",),
+    "ビェ": ("bye",),
+    "ビョ": ("byo",),
+    "ピャ": ("pya",),
+    "ピィ": ("pyi",),
+    "ピュ": ("pyu",),
+    "ピェ": ("pye",),
+    "ピョ": ("pyo",),
+    # 外来語の表記
+    "イェ": ("ye",),
+    "ウィ": ("wi", "whi"),
+    "ウェ": ("we", "whe"),
+    "ウォ": ("who",),
+    "クァ": ("kwa", "qa"),
+    "クィ": ("qi", "qwi"),
+    "クェ": ("qe", "qwe"),
+    "クォ": ("qo", "qwo"),
+    "スィ": ("swi",),
+    "ツァ": ("tsa",),
+    "ツィ": ("tsi",),
+    "ツェ": ("tse",),
+    "ツォ": ("tso",),
+    "ティ": ("thi",),
+    "テュ": ("thu",),
+    "ディ": ("dhi",),
+    "デュ": ("dhu",),
+    "トゥ": ("twu",),
+    "ドゥ": ("dwu",),
+    "ファ": ("fa", "fwa"),
+    "フィ": ("fi", "fwi", "fyi"),
+    "フェ": ("fe", "fwe", "fye"),
+    "フォ": ("fo", "fwo"),
+    "フュ": ("fyu",),
+    "ヴァ": ("va",),
+    "ヴィ": ("vi",),
+    "ヴェ": ("ve",),
+    "ヴォ": ("vo",),
+    "ヴュ": ("vyu",),
+}
+
+# 長音・ダッシュ類はハイフンとして入力する
+HYPHENS = frozenset("ー－—‐-")
+
+# 入力対象外として読み飛ばす文字
+SKIP_CHARS = frozenset(" 　、。，．,.・「」『』（）()！？!?…")
+
+SOKUON = "ッ"
+HATSUON = "ン"
+VOWELS = frozenset("aiueo")
+
+# ひらがな → カタカナ、長音・ダッシュ類 → "-" の変換テーブル
+_NORMALIZE_TABLE = {
+    code: code + ord("ァ") - ord("ぁ") for code in range(ord("ぁ"), ord("ゖ") + 1)
+}
+_NORMALIZE_TABLE.update({ord(char): "-" for char in HYPHENS})
+
+# 最長一致用の2文字トークン
+_PAIR_TOKENS = frozenset(token for token in KANA_SPELLINGS if len(token) == 2)
+
+
+def tokenize(text):
+    """カナ文字列を最長一致で表記単位（拗音は2文字）に分割する
+
+    ひらがなはカタカナとして、長音記号は "-" として扱い、句読点や空白は読み飛ばす。
+    英字はそのまま（小文字で）1文字ずつのトークンにする。
+    ローマ字入力できない文字（漢字や数字など）があれば ValueError を送出する。
+    """
+    if not unicodedata.is_normalized("NFKC", text):
+        text = unicodedata.normalize("NFKC", text)
+    text = text.translate(_NORMALIZE_TABLE)
+
+    tokens = []
+    append = tokens.append
+    i = 0
+    n = len(text)
+    while i < n:
+        pair = text[i : i + 2]
+        if pair in _PAIR_TOKENS:
+            append(pair)
+            i += 2
+            continue
+
+        char = text[i]
+        if char in KANA_SPELLINGS or char == HATSUON or char == "-":
+            append(char)
+        elif char.isascii() and char.isalpha():
+            append(char.lower())
+        elif char not in SKIP_CHARS and not char.isspace():
+            raise ValueError(f"cannot convert {char!r} to romaji")
+        i += 1
+
+    return tuple(tokens)
+
+
+def token_spellings(token):
+    """トークン単体のローマ字表記の一覧（ッ・ンは前後関係を考慮しない）"""
+    if token == HATSUON:
+        return ("nn", "n", "xn", "n'")
+    return KANA_SPELLINGS.get(token, (token,))
+
+
+_CANONICAL = {token: spellings[0] for token, spellings in KANA_SPELLINGS.items()}
+_CANONICAL[HATSUON] = "nn"
+_SOKUON_SPELLING = _CANONICAL[SOKUON]
+_HATSUON_SPELLING = _CANONICAL[HATSUON]
+
+
+def hatsuon_needs_double(next_spelling):
+    """ン の後に続く表記が母音・y・n で始まるなら "nn" と入力する必要がある"""
+    return next_spelling[0] in VOWELS or next_spelling[0] in "yn"
+
+
+def sokuon_prefix(next_spelling):
+    """ッ の後に続く表記から促音の子音を求める（重ねられない場合は None）"""
+    if not next_spelling:
+        return None
+    head = next_spelling[0]
+    # 母音・ン・小書き文字（x/l）の前では子音を重ねられない
+    if head in VOWELS or head in "nxl" or not head.isalpha():
+        return None
+    return head
+
+
+def katakana_to_romaji(text):
+    """Convert katakana (or hiragana) text to the standard romaji spelling
+
+    Raises ValueError if the text contains characters that cannot be typed
+    as romaji. Results are not memoized: callers convert each new sentence
+    once and keep the romaji with it (SentenceCache, sentence packs).
+    """
+    parts = [_CANONICAL.get(token, token) for token in tokenize(text)]
+
+    # ッ・ン は後続の表記によって綴りが変わる
+    last = len(parts) - 1
+    for i, part in enumerate(parts):
+        if part == _SOKUON_SPELLING:
+            prefix = sokuon_prefix(parts[i + 1]) if i < last else None
+            if prefix:
+                parts[i] = prefix
+        elif part == _HATSUON_SPELLING:
+            # 文末は "n" だけで良いが、母音などが続く場合は "nn"
+            if i == last or not hatsuon_needs_double(parts[i + 1]):
+                parts[i] = "n"
+
+    return "".join(parts)
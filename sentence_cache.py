@@ -0,0 +1,191 @@
+import os
+import sqlite3
+import threading
+import time
+
+from dedup import word_hash
+from paths import get_data_dir
+from prompt import PROMPT_VERSION
+
+SCHEMA_VERSION = 2
+
+
+class SentenceCache:
+    """生成済み課題文を SQLite に保存するローカルキャッシュ
+
+    推奨年齢（ユーザータイプ）とプロンプトのバージョンをキーにして課題文を保持する。
+    課題文は正規化した内容のハッシュで一意になっており、別の推奨年齢やバッチで
+    同じ課題文が生成されても1件しか保存しない。
+    キーごとの件数上限と全体の件数上限を超えた分は最終使用日時の古い順（LRU）に、
+    有効期限（TTL）を過ぎた分は作成日時を基準に削除する。
+    """
+
+    def __init__(
+        self,
+        path=None,
+        max_per_key=300,
+        max_total=3000,
+        ttl=30 * 24 * 60 * 60,
+    ):
+        if path is None:
+            path = os.path.join(get_data_dir(), "sentence_cache.sqlite3")
+        self.path = path
+        self.max_per_key = max_per_key
+        self.max_total = max_total
+        self.ttl = ttl
+
+        # 生成ワーカーのスレッドからも使用するためロックで保護する
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._setup_schema()
+
+    def _setup_schema(self):
+        with self._lock, self._conn:
+            version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            if version != SCHEMA_VERSION:
+                # キャッシュなので互換性のないスキーマは作り直す
+                self._conn.execute("DROP TABLE IF EXISTS sentences")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS sentences (
+                    prompt_version INTEGER NOT NULL,
+                    content_hash INTEGER NOT NULL,
+                    user_type TEXT NOT NULL,
+                    japanese TEXT NOT NULL,
+                    katakana TEXT NOT NULL,
+                    romaji TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (prompt_version, content_hash)
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS sentences_user_type"
+                " ON sentences (user_type, prompt_version, last_used)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS sentences_last_used"
+                " ON sentences (last_used)"
+            )
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def get(self, user_type, prompt_version=PROMPT_VERSION):
+        """有効期限内の課題文を取得し、最終使用日時を更新する"""
+        now = time.time()
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                """
+                SELECT japanese, katakana, romaji FROM sentences
+                WHERE user_type = ? AND prompt_version = ? AND created_at >= ?
+                ORDER BY last_used DESC
+                LIMIT ?
+                """,
+                (user_type, prompt_version, now - self.ttl, self.max_per_key),
+            ).fetchall()
+            self._conn.execute(
+                "UPDATE sentences SET last_used = ?"
+                " WHERE user_type = ? AND prompt_version = ?",
+                (now, user_type, prompt_version),
+            )
+
+        return [
+            {"japanese": japanese, "katakana": katakana, "romaji": romaji}
+            for japanese, katakana, romaji in rows
+        ]
+
+    def put(self, user_type, words, prompt_version=PROMPT_VERSION):
+        """課題文を保存し、新しく追加した件数を返す（上限を超えた分は削除する）
+
+        既に同じ内容の課題文があれば追加せず、作成日時と最終使用日時だけを更新する。
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            rows = [
+                (
+                    prompt_version,
+                    word_hash(word),
+                    user_type,
+                    word["japanese"],
+                    word.get("katakana", ""),
+                    word["romaji"],
+                    now,
+                    now,
+                )
+                for word in words
+            ]
+            self._conn.executemany(
+                """
+                INSERT OR IGNORE INTO sentences
+                (prompt_version, content_hash, user_type, japanese, katakana, romaji,
+                 created_at, last_used)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                rows,
+            )
+            added = self._conn.total_changes - before
+            if added < len(rows):
+                self._conn.executemany(
+                    "UPDATE sentences SET created_at = ?, last_used = ?"
+                    " WHERE prompt_version = ? AND content_hash = ?",
+                    [(now, now, row[0], row[1]) for row in rows],
+                )
+            self._evict(user_type, prompt_version, now)
+        return added
+
+    def contains(self, word, prompt_version=PROMPT_VERSION):
+        """同じ内容の課題文が保存されているかどうか"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM sentences WHERE prompt_version = ? AND content_hash = ?",
+                (prompt_version, word_hash(word)),
+            ).fetchone()
+        return row is not None
+
+    def _evict(self, user_type, prompt_version, now):
+        # 有効期限切れ
+        self._conn.execute(
+            "DELETE FROM sentences WHERE created_at < ?", (now - self.ttl,)
+        )
+
+        # キーごとの上限（LRU）
+        self._conn.execute(
+            """
+            DELETE FROM sentences WHERE rowid IN (
+                SELECT rowid FROM sentences
+                WHERE user_type = ? AND prompt_version = ?
+                ORDER BY last_used DESC, created_at DESC
+                LIMIT -1 OFFSET ?
+            )
+            """,
+            (user_type, prompt_version, self.max_per_key),
+        )
+
+        # 全体の上限（LRU）
+        self._conn.execute(
+            """
+            DELETE FROM sentences WHERE rowid IN (
+                SELECT rowid FROM sentences
+                ORDER BY last_used DESC, created_at DESC
+                LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_total,),
+        )
+
+    def count(self, user_type=None, prompt_version=PROMPT_VERSION):
+        with self._lock:
+            if user_type is None:
+                query, params = "SELECT COUNT(*) FROM sentences", ()
+            else:
+                query = (
+                    "SELECT COUNT(*) FROM sentences"
+                    " WHERE user_type = ? AND prompt_version = ?"
+                )
+                params = (user_type, prompt_version)
+            return self._conn.execute(query, params).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,76 @@
+import random
+
+
+class SentenceDeck:
+    """課題文の番号を重複なくランダムな順番で引く山札
+
+    Fisher–Yates シャッフルを1枚引くごとに1ステップずつ行う。入れ替えた位置だけを
+    辞書に持つので、課題文が 15 個でも 100 万個でも初期化と1回の draw() は O(1)。
+    山札の途中で課題文が追加された場合は、まだ引いていない範囲に加わる。
+    位置 → 番号の辞書と逆向きの辞書を持つので、特定の番号を引く take() も O(1)。
+    """
+
+    def __init__(self, size=0, rng=None):
+        self.rng = rng or random.Random()
+        self.size = size
+        self.cursor = 0  # これより前の位置は引いた番号
+        self._swaps = {}  # 位置 → 番号（位置と番号が同じなら持たない）
+        self._positions = {}  # 番号 → 位置（_swaps の逆）
+
+    def _place(self, position, number):
+        if position == number:
+            self._swaps.pop(position, None)
+            self._positions.pop(number, None)
+        else:
+            self._swaps[position] = number
+            self._positions[number] = position
+
+    def draw(self):
+        """まだ引いていない番号を1つ返す（引き切っていれば None）"""
+        cursor = self.cursor
+        if cursor >= self.size:
+            return None
+
+        j = self.rng.randrange(cursor, self.size)
+        picked = self._swaps.get(j, j)
+        if j != cursor:
+            self._place(j, self._swaps.get(cursor, cursor))
+        self._place(cursor, picked)
+        self.cursor = cursor + 1
+        return picked
+
+    def take(self, number):
+        """まだ引いていない number を引く（引けたら True）"""
+        if not 0 <= number < self.size:
+            return False
+        position = self._positions.get(number, number)
+        cursor = self.cursor
+        if position < cursor:
+            return False
+
+        if position != cursor:
+            self._place(position, self._swaps.get(cursor, cursor))
+        self._place(cursor, number)
+        self.cursor = cursor + 1
+        return True
+
+    def is_drawn(self, number):
+        return self._positions.get(number, number) < self.cursor
+
+    def remaining(self):
+        return self.size - self.cursor
+
+    def resize(self, size):
+        """課題文の数が変わった（増えた分は未使用として山札に加える）"""
+        if size < self.size:
+            # 減った場合は番号が変わっているので最初から
+            self.size = size
+            self.reset()
+        else:
+            self.size = size
+
+    def reset(self):
+        """すべての番号を山札に戻す"""
+        self.cursor = 0
+        self._swaps.clear()
+        self._positions.clear()
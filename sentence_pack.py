@@ -0,0 +1,307 @@
+"""課題文パック（.vtdp）の作成と読み込み
+
+大量の課題文を1つのファイルにまとめ、mmap で開いて必要な課題文だけを読み出す。
+
+    # JSON Lines（1行に {"user_type", "japanese", "katakana"[, "romaji"]}）から作る
+    python sentence_pack.py build sentences.vtdp sentences.jsonl
+
+    # セクションごとの件数を表示する
+    python sentence_pack.py info sentences.vtdp
+
+ファイルの構成（数値はすべてリトルエンディアン）:
+
+    ヘッダ       magic, version, セクション数, 課題文数, インデックス位置, データ位置
+    セクション表 (推奨年齢, 長さの区分, 最初の課題文番号, 件数) をセクション数だけ
+    インデックス 課題文ごとのデータ内の開始位置 (uint64) を課題文数 + 1 個
+    データ       "日本語\\x1fカタカナ\\x1fローマ字" (UTF-8) を区切りなしで連結
+
+課題文は (推奨年齢, 長さの区分) の順に並べて書き出すので、1つの推奨年齢の課題文は
+ファイル上で連続した範囲になる。
+"""
+import argparse
+import json
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+from array import array
+from collections.abc import Sequence
+
+from dedup import DedupIndex
+from romaji import katakana_to_romaji
+
+MAGIC = b"VTDP"
+FORMAT_VERSION = 1
+
+# ヘッダ: magic, version, セクション数, 課題文数, インデックス位置, データ位置
+_HEADER = struct.Struct("<4sHHIQQ")
+# セクション: 推奨年齢の長さ（この後に UTF-8 で推奨年齢が続く）
+_NAME_LENGTH = struct.Struct("<H")
+# セクション: 長さの区分, 最初の課題文番号, 件数
+_SECTION = struct.Struct("<BII")
+_OFFSET_PAIR = struct.Struct("<QQ")
+
+FIELD_SEPARATOR = "\x1f"
+
+# 長さの区分（日本語の文字数）
+LENGTH_SHORT = 0  # 30 文字未満
+LENGTH_MEDIUM = 1  # 30〜49 文字
+LENGTH_LONG = 2  # 50 文字以上
+LENGTH_NAMES = ("short", "medium", "long")
+
+
+def length_class(japanese):
+    length = len(japanese)
+    if length < 30:
+        return LENGTH_SHORT
+    if length < 50:
+        return LENGTH_MEDIUM
+    return LENGTH_LONG
+
+
+def _little_endian(values):
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def write_pack(path, entries):
+    """(推奨年齢, 課題文データ) の列から課題文パックを作り、課題文数を返す
+
+    課題文はセクションごとの一時ファイルに書き出してから連結するので、
+    メモリに残るのは課題文1つにつき開始位置と重複判定用のハッシュだけ。
+    内容が同じ課題文は（推奨年齢が違っても）最初の1つだけを収録する。
+    """
+    sections = {}  # (推奨年齢, 長さの区分) -> [一時ファイル, 各課題文の長さ]
+    seen = DedupIndex()
+    try:
+        for user_type, word in entries:
+            if not seen.add(word):
+                continue
+            record = FIELD_SEPARATOR.join(
+                (word["japanese"], word.get("katakana", ""), word["romaji"])
+            ).encode("utf-8")
+            key = (user_type, length_class(word["japanese"]))
+            section = sections.get(key)
+            if section is None:
+                section = sections[key] = [tempfile.TemporaryFile(), array("Q")]
+            section[0].write(record)
+            section[1].append(len(record))
+
+        ordered = sorted(sections)
+        total = sum(len(sections[key][1]) for key in ordered)
+
+        table = []
+        first = 0
+        for user_type, length in ordered:
+            name = user_type.encode("utf-8")
+            count = len(sections[(user_type, length)][1])
+            table.append(_NAME_LENGTH.pack(len(name)))
+            table.append(name)
+            table.append(_SECTION.pack(length, first, count))
+            first += count
+        table = b"".join(table)
+
+        index_offset = _HEADER.size + len(table)
+        data_offset = index_offset + 8 * (total + 1)
+
+        offsets = array("Q", [0])
+        position = 0
+        for key in ordered:
+            for size in sections[key][1]:
+                position += size
+                offsets.append(position)
+
+        temp_path = f"{path}.tmp"
+        try:
+            with open(temp_path, "wb") as f:
+                f.write(
+                    _HEADER.pack(
+                        MAGIC, FORMAT_VERSION, len(ordered), total, index_offset, data_offset
+                    )
+                )
+                f.write(table)
+                f.write(_little_endian(offsets))
+                for key in ordered:
+                    spool = sections[key][0]
+                    spool.seek(0)
+                    shutil.copyfileobj(spool, f)
+            os.replace(temp_path, path)
+        except BaseException:
+            # 書きかけのファイル（ディスクがいっぱいなど）を残さない
+            try:
+                os.remove(temp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        return total
+    finally:
+        for spool, _ in sections.values():
+            spool.close()
+
+
+class PackSection(Sequence):
+    """課題文パックの連続した範囲（TypingEngine の words としてそのまま使える）
+
+    課題文データ（辞書）は取り出すたびにファイルから読み出して作る。
+    """
+
+    def __init__(self, pack, start, count):
+        self.pack = pack
+        self.start = start
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self.count)
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return PackSection(self.pack, self.start + start, max(0, stop - start))
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("pack section index out of range")
+        return self.pack.read(self.start + index)
+
+
+class SentencePack(PackSection):
+    """mmap で開いた課題文パック
+
+    開くときに読むのはヘッダとセクション表だけで、課題文数によらず一定時間で開ける。
+    ページはアクセスしたところだけ OS が読み込むので、常駐メモリも課題文数に比例しない。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            (
+                magic,
+                version,
+                section_count,
+                count,
+                self._index_offset,
+                self._data_offset,
+            ) = _HEADER.unpack_from(self._mmap)
+        except struct.error:
+            self.close()
+            raise ValueError(f"{path} is not a sentence pack")
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a sentence pack")
+        if version != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"unsupported sentence pack version {version}")
+
+        super().__init__(self, 0, count)
+
+        # (推奨年齢, 長さの区分, 最初の課題文番号, 件数)
+        self.sections = []
+        offset = _HEADER.size
+        for _ in range(section_count):
+            (name_length,) = _NAME_LENGTH.unpack_from(self._mmap, offset)
+            offset += _NAME_LENGTH.size
+            user_type = self._mmap[offset : offset + name_length].decode("utf-8")
+            offset += name_length
+            length, first, entries = _SECTION.unpack_from(self._mmap, offset)
+            offset += _SECTION.size
+            self.sections.append((user_type, length, first, entries))
+
+    def read(self, index):
+        """index 番目の課題文をデータ（辞書）として読み出す"""
+        start, end = _OFFSET_PAIR.unpack_from(self._mmap, self._index_offset + 8 * index)
+        base = self._data_offset
+        japanese, katakana, romaji = (
+            self._mmap[base + start : base + end].decode("utf-8").split(FIELD_SEPARATOR)
+        )
+        return {"japanese": japanese, "katakana": katakana, "romaji": romaji}
+
+    def user_types(self):
+        seen = []
+        for user_type, _, _, _ in self.sections:
+            if user_type not in seen:
+                seen.append(user_type)
+        return seen
+
+    def select(self, user_type, length=None):
+        """推奨年齢（と長さの区分）の課題文を PackSection で返す（なければ None）"""
+        matched = [
+            (first, count)
+            for section_user_type, section_length, first, count in self.sections
+            if section_user_type == user_type and length in (None, section_length)
+        ]
+        if not matched:
+            return None
+        # 同じ推奨年齢のセクションは連続して並んでいる
+        start = matched[0][0]
+        end = matched[-1][0] + matched[-1][1]
+        return PackSection(self, start, end - start)
+
+    def close(self):
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _read_jsonl(paths):
+    """JSON Lines から (推奨年齢, 課題文データ) を読み出す（変換できない課題文は飛ばす）"""
+    skipped = 0
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                item = json.loads(line)
+                katakana = item.get("katakana", "")
+                try:
+                    romaji = item.get("romaji") or katakana_to_romaji(katakana)
+                except ValueError:
+                    skipped += 1
+                    continue
+                yield item["user_type"], {
+                    "japanese": item["japanese"],
+                    "katakana": katakana,
+                    "romaji": romaji,
+                }
+    if skipped:
+        print(f"Skipped {skipped} sentences that cannot be typed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="課題文パック（.vtdp）の作成と確認")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="JSON Lines から課題文パックを作る")
+    build.add_argument("output")
+    build.add_argument("inputs", nargs="+")
+
+    info = commands.add_parser("info", help="セクションごとの課題文数を表示する")
+    info.add_argument("pack")
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        total = write_pack(args.output, _read_jsonl(args.inputs))
+        print(f"Wrote {total:,} sentences to {args.output}")
+    else:
+        with SentencePack(args.pack) as pack:
+            print(f"{args.pack}: {len(pack):,} sentences")
+            for user_type, length, first, count in pack.sections:
+                print(f"  {user_type:<8} {LENGTH_NAMES[length]:<6} {count:>10,}")
+
+
+if __name__ == "__main__":
+    main()
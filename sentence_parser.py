@@ -0,0 +1,32 @@
+import json
+
+from romaji import katakana_to_romaji
+
+
+def parse_response(content):
+    """課題文生成 API の応答本文から sentences 配列の要素を取り出す"""
+    content = content.strip()
+    if content.startswith("```json"):
+        content = content[7:-3].strip()
+    elif content.startswith("```"):
+        content = content[3:-3].strip()
+
+    data = json.loads(content)
+    return data.get("sentences", [])
+
+
+def make_word(item):
+    """API の応答の1要素を課題文データに変換する（使えない課題文は None）"""
+    sentence = item.get("sentence", "").replace("、", "")
+    katakana = item.get("katakana", "").replace("、", "")
+    try:
+        romaji = katakana_to_romaji(katakana)
+    except ValueError as e:
+        # 漢字などが混ざっていて入力できない課題文は除外
+        print(f"Skipping sentence {sentence!r}: {e}")
+        return None
+
+    # Exclude sentences containing "ー" (long vowel mark)
+    if sentence and romaji and "ー" not in sentence:
+        return {"japanese": sentence, "katakana": katakana, "romaji": romaji}
+    return None
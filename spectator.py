@@ -0,0 +1,303 @@
+"""観戦モード（試合の様子を LAN 上の多数の観戦者に配信する）
+
+SpectatorFeed が Tk 側で試合の変化をまとめ、fps 回/秒までのスナップショット
+（JSON 1行）にして SpectatorServer に渡す。SpectatorServer は1つのイベントループで
+全観戦者に同じバイト列を送る。観戦者ごとの送信待ちは最新の1件だけで、送り終わる前に
+次のスナップショットができたら古い方は捨てる。遅い観戦者がいても試合やほかの観戦者は
+待たされない。
+
+    python spectator.py watch 192.168.1.10
+
+観戦者が多い場合は、別のプロセス（別の PC）で中継すると配信の負荷がゲームに
+かからない。ゲームの配信には中継だけが接続し、観戦者は中継に接続する。
+
+    python spectator.py relay 192.168.1.10 --port 8768
+"""
+import argparse
+import asyncio
+import json
+import socket
+import sys
+import time
+
+from netplay import EventLoopThread
+
+DEFAULT_PORT = 8767
+
+# 観戦者ごとの送信バッファの上限（これを超えたら最新のスナップショットだけを持つ）
+WRITE_BUFFER_LIMIT = 64 * 1024
+# 観戦者ごとのカーネルの送信バッファ（観戦者が多くてもメモリを使いすぎないように）
+SOCKET_SEND_BUFFER = 64 * 1024
+
+
+class SpectatorStats:
+    def __init__(self):
+        self.frames = 0
+        self.bytes_sent = 0
+        self.dropped = 0  # 送る前に新しいスナップショットで置き換えられた数
+        self.stalled = 0  # 送信が進まず切断した観戦者の数
+
+    def summary(self, viewers):
+        return (
+            f"{viewers} viewers, {self.frames} frames, sent {self.bytes_sent} B,"
+            f" {self.dropped} frames skipped for slow viewers, {self.stalled} stalled viewers"
+        )
+
+
+class _ViewerProtocol(asyncio.Protocol):
+    """観戦者1人分の接続
+
+    送信バッファが一杯になる（pause_writing）と、それ以降は最新のスナップショットだけを
+    持っておき、バッファが空く（resume_writing）と送る。
+    """
+
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+        self.paused = False
+        self.pending = None  # 送信を再開したら送るスナップショット
+        self._stall_job = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        sock = transport.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.server.send_buffer)
+        transport.set_write_buffer_limits(high=self.server.write_buffer_limit)
+        if not self.server._add(self):
+            transport.close()
+
+    def connection_lost(self, exc):
+        self.server._viewers.discard(self)
+        if self._stall_job is not None:
+            self._stall_job.cancel()
+
+    def data_received(self, data):
+        # 観戦者からは何も受け取らない
+        pass
+
+    def send(self, data):
+        if self.paused:
+            if self.pending is not None:
+                self.server.stats.dropped += 1
+            self.pending = data
+            return
+        self.transport.write(data)
+        self.server.stats.bytes_sent += len(data)
+
+    def pause_writing(self):
+        self.paused = True
+        loop = asyncio.get_running_loop()
+        self._stall_job = loop.call_later(self.server.stall_timeout, self._stalled)
+
+    def resume_writing(self):
+        self.paused = False
+        self._stall_job.cancel()
+        self._stall_job = None
+        if self.pending is not None:
+            data, self.pending = self.pending, None
+            self.send(data)
+
+    def _stalled(self):
+        # 送信がまったく進まない観戦者は切断する
+        self.server.stats.stalled += 1
+        self.transport.abort()
+
+
+class SpectatorServer:
+    """スナップショットを観戦者全員に送る
+
+    publish() はどのスレッドからでも呼べ、呼び出し側はループのスレッドに渡すだけで
+    待たされない。stall_timeout 秒たっても送信が進まない観戦者は切断する。
+    write_buffer_limit と send_buffer は観戦者ごとの送信バッファの大きさ（ベンチマークで
+    遅い観戦者をすぐに詰まらせるときに小さくする）。
+    """
+
+    def __init__(
+        self,
+        port=DEFAULT_PORT,
+        host="0.0.0.0",
+        max_viewers=1000,
+        stall_timeout=10.0,
+        write_buffer_limit=WRITE_BUFFER_LIMIT,
+        send_buffer=SOCKET_SEND_BUFFER,
+    ):
+        self.host = host
+        self.port = port
+        self.max_viewers = max_viewers
+        self.stall_timeout = stall_timeout
+        self.write_buffer_limit = write_buffer_limit
+        self.send_buffer = send_buffer
+        self.stats = SpectatorStats()
+
+        self._loop = EventLoopThread("spectator")
+        self._server = None
+        self._viewers = set()
+        self._latest = None
+
+    def start(self):
+        """待ち受けを開始する（ポートが使えなければ OSError）"""
+        self._loop.start()
+        try:
+            self._loop.run(self._listen())
+        except OSError:
+            self._loop.stop()
+            raise
+
+    async def _listen(self):
+        loop = asyncio.get_running_loop()
+        self._server = await loop.create_server(
+            lambda: _ViewerProtocol(self), self.host, self.port, backlog=1024
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    def stop(self):
+        self._loop.run(self._close())
+        self._loop.stop()
+
+    async def _close(self):
+        self._server.close()
+        for viewer in list(self._viewers):
+            viewer.transport.close()
+
+    @property
+    def viewer_count(self):
+        return len(self._viewers)
+
+    def publish(self, data):
+        """スナップショット（bytes）を全観戦者に送る"""
+        self._loop.call(self._fan_out, data)
+
+    def _fan_out(self, data):
+        self._latest = data
+        self.stats.frames += 1
+        for viewer in self._viewers:
+            viewer.send(data)
+
+    def _add(self, viewer):
+        if len(self._viewers) >= self.max_viewers:
+            return False
+        self._viewers.add(viewer)
+        # 接続してすぐに現在の様子が見えるよう、最新のスナップショットを送る
+        if self._latest is not None:
+            viewer.send(self._latest)
+        return True
+
+
+class SpectatorFeed:
+    """試合の変化をまとめて、fps 回/秒までのスナップショットにして配信する
+
+    mark_dirty() は何度呼んでもよく、スナップショットは次の送信時刻に1回だけ
+    snapshot() を呼んで作る。Tk のメインループから使う。
+    """
+
+    def __init__(self, root, snapshot, server, fps=15):
+        self.root = root
+        self.snapshot = snapshot
+        self.server = server
+        self.interval = 1.0 / fps
+        self._next_at = 0.0
+        self._job = None
+
+    def mark_dirty(self):
+        if self._job is not None:
+            return
+        delay = max(0.0, self._next_at - time.monotonic())
+        self._job = self.root.after(int(delay * 1000), self._send)
+
+    def _send(self):
+        self._job = None
+        self._next_at = time.monotonic() + self.interval
+        data = json.dumps(self.snapshot(), ensure_ascii=False, separators=(",", ":"))
+        self.server.publish(data.encode("utf-8") + b"\n")
+
+    def cancel(self):
+        if self._job is not None:
+            self.root.after_cancel(self._job)
+            self._job = None
+
+
+def format_snapshot(snapshot):
+    """スナップショットを端末に表示する1行にする"""
+    players = "  ".join(
+        f"P{i + 1} {player['score']:>5} ({player['words']} words, {player['accuracy']:.0f}%)"
+        for i, player in enumerate(snapshot["players"])
+    )
+    if snapshot["active"]:
+        status = f"残り {snapshot['remaining'] or 0:>3}s"
+    else:
+        status = "待機中"
+    sentence = snapshot["sentence"] or ""
+    return f"{status}  {players}  {sentence}"
+
+
+async def watch(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            text = format_snapshot(json.loads(line))
+            sys.stdout.write("\r\033[K" + text)
+            sys.stdout.flush()
+    finally:
+        writer.close()
+        print()
+
+
+async def relay(host, port, server):
+    """配信元のスナップショットを server の観戦者に中継する"""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            server.publish(line)
+    finally:
+        writer.close()
+
+
+def parse_address(address):
+    host, _, port = address.rpartition(":")
+    if not host:
+        return address, DEFAULT_PORT
+    return host, int(port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="VS Typing Dojo spectator")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    watch_parser = subparsers.add_parser("watch", help="試合を端末で観戦する")
+    watch_parser.add_argument("address", metavar="HOST[:PORT]")
+
+    relay_parser = subparsers.add_parser("relay", help="配信を中継する")
+    relay_parser.add_argument("address", metavar="HOST[:PORT]", help="配信元")
+    relay_parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="観戦者が接続するポート")
+    relay_parser.add_argument("--max-viewers", type=int, default=1000)
+
+    args = parser.parse_args()
+    host, port = parse_address(args.address)
+    try:
+        if args.command == "watch":
+            asyncio.run(watch(host, port))
+        else:
+            server = SpectatorServer(args.port, max_viewers=args.max_viewers)
+            server.start()
+            print(f"Relaying {args.address} on port {server.port}")
+            try:
+                asyncio.run(relay(host, port, server))
+            finally:
+                print(server.stats.summary(server.viewer_count))
+                server.stop()
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print(f"Cannot {args.command} {args.address}: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import os
+import random
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from adaptive import AdaptiveSelector  # noqa: E402
+from sentence_deck import SentenceDeck  # noqa: E402
+
+
+def word(romaji):
+    return {"japanese": romaji, "katakana": romaji, "romaji": romaji}
+
+
+def wait_for_index(selector, words):
+    deadline = time.monotonic() + 5
+    while not selector.index.is_ready(words):
+        if time.monotonic() > deadline:
+            raise AssertionError("the index was not built")
+        time.sleep(0.01)
+
+
+class AdaptiveSelectorTest(unittest.TestCase):
+    def setUp(self):
+        self.words = [word("aiueo"), word("kyoto"), word("sakura"), word("tokyo")]
+        self.deck = SentenceDeck(len(self.words), random.Random(0))
+        self.selector = AdaptiveSelector(1, random.Random(0))
+
+    def weaken(self, bigram):
+        self.selector.trackers[0].weights = {bigram: 10.0}
+
+    def test_choose_falls_back_until_the_index_is_ready(self):
+        self.weaken("ky")
+        self.assertIsNone(self.selector.choose(self.words, self.deck))
+        self.assertFalse(self.deck.is_drawn(1) or self.deck.is_drawn(3))
+
+        wait_for_index(self.selector, self.words)
+        picks = set()
+        for _ in range(20):
+            self.weaken("ky")
+            index = self.selector.choose(self.words, self.deck)
+            if index is not None:
+                picks.add(index)
+        self.assertEqual(picks, {1, 3})
+
+    def test_added_sentences_are_indexed_in_the_background(self):
+        self.selector.update_index(self.words)
+        wait_for_index(self.selector, self.words)
+
+        self.words.append(word("kyuukei"))
+        self.deck.resize(len(self.words))
+        self.selector.choose(self.words, self.deck)
+        wait_for_index(self.selector, self.words)
+        self.assertTrue(self.selector.index.contains("ky", 4))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,182 @@
+import asyncio
+import os
+import sys
+import time
+import types
+import unittest
+
+import openai
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from api_client import (  # noqa: E402
+    ApiClient,
+    AsyncApiClient,
+    CircuitBreaker,
+    CircuitOpenError,
+    DeadlineExceeded,
+    RetryPolicy,
+)
+from fake_openai_server import FakeOpenAIServer  # noqa: E402
+from vs_typing_dojo import VsTypingDojo  # noqa: E402
+
+MESSAGES = [{"role": "user", "content": "一般的な学力の12歳が"}]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class ApiClientTest(unittest.TestCase):
+    def start_server(self, **options):
+        server = FakeOpenAIServer(latency=0, sentences=3, seed=0, **options)
+        server.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def make_client(self, server, cls=ApiClient, deadline=5.0, max_retries=3, breaker=None):
+        client = cls(
+            api_key="fake",
+            base_url=server.base_url,
+            request_timeout=2.0,
+            connect_timeout=1.0,
+            deadline=deadline,
+            retry=RetryPolicy(max_retries=max_retries, base_delay=0.01, max_delay=0.05),
+            breaker=breaker or CircuitBreaker(threshold=2, reset_timeout=30.0),
+        )
+        if cls is ApiClient:
+            self.addCleanup(client.close)
+        return client
+
+    def call(self, client):
+        return client.create_chat_completion(model="fake", messages=MESSAGES)
+
+    def test_retries_429_and_5xx(self):
+        for status in (429, 503):
+            with self.subTest(status=status):
+                server = self.start_server(fail_first=2, fail_status=status)
+                client = self.make_client(server, breaker=CircuitBreaker(threshold=5))
+                response = self.call(client)
+                self.assertEqual(response.choices[0].finish_reason, "stop")
+                self.assertEqual(client.stats.retries, 2)
+                self.assertEqual(server.request_count, 3)
+
+    def test_4xx_is_not_retried(self):
+        server = self.start_server(fail_first=1, fail_status=400)
+        client = self.make_client(server)
+        with self.assertRaises(openai.BadRequestError):
+            self.call(client)
+        self.assertEqual(server.request_count, 1)
+        self.assertEqual(client.stats.retries, 0)
+        self.assertEqual(client.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_gives_up_at_the_deadline(self):
+        server = self.start_server(hang_rate=1.0, hang_time=5.0)
+        client = self.make_client(server, deadline=0.5)
+        start = time.monotonic()
+        with self.assertRaises((openai.APITimeoutError, DeadlineExceeded)):
+            self.call(client)
+        self.assertLess(time.monotonic() - start, 1.5)
+
+    def test_breaker_opens_after_repeated_failures(self):
+        server = self.start_server(fail_rate=1.0, fail_status=500)
+        client = self.make_client(server, max_retries=0)
+        for _ in range(2):
+            with self.assertRaises(openai.InternalServerError):
+                self.call(client)
+        with self.assertRaises(CircuitOpenError):
+            self.call(client)
+        self.assertEqual(server.request_count, 2)
+        self.assertEqual(client.breaker.trips, 1)
+
+    def test_half_open_trial(self):
+        server = self.start_server(fail_rate=1.0, fail_status=500)
+        clock = FakeClock()
+        breaker = CircuitBreaker(threshold=1, reset_timeout=30.0, clock=clock)
+        client = self.make_client(server, max_retries=0, breaker=breaker)
+        with self.assertRaises(openai.InternalServerError):
+            self.call(client)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+        # 失敗した試行で再び開く
+        clock.now += 30
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        with self.assertRaises(openai.InternalServerError):
+            self.call(client)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(breaker.trips, 2)
+
+        # 成功した試行で閉じる
+        clock.now += 30
+        server.fail_rate = 0.0
+        self.call(client)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_cancelled_trial_is_released(self):
+        server = self.start_server(fail_first=1, fail_status=500, hang_rate=1.0, hang_time=5.0)
+        clock = FakeClock()
+        breaker = CircuitBreaker(threshold=1, reset_timeout=30.0, clock=clock)
+
+        async def run():
+            client = self.make_client(server, AsyncApiClient, max_retries=0, breaker=breaker)
+            try:
+                with self.assertRaises(openai.InternalServerError):
+                    await client.create_chat_completion(model="fake", messages=MESSAGES)
+                clock.now += 30
+                # half-open の試行中にキャンセルする
+                task = asyncio.ensure_future(
+                    client.create_chat_completion(model="fake", messages=MESSAGES)
+                )
+                await asyncio.sleep(0.2)
+                task.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await task
+            finally:
+                await client.close()
+
+        asyncio.run(run())
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(breaker.allow())
+
+
+class BrokenStream:
+    """1チャンク返した後に接続が切れるストリーミング応答"""
+
+    def __init__(self):
+        self.closed = False
+
+    def __iter__(self):
+        delta = types.SimpleNamespace(content='{"sentences": [')
+        yield types.SimpleNamespace(
+            choices=[types.SimpleNamespace(delta=delta, finish_reason=None)]
+        )
+        raise openai.APIConnectionError(request=None)
+
+    def close(self):
+        self.closed = True
+
+
+class StreamSentencesTest(unittest.TestCase):
+    def test_dropped_stream_counts_as_a_breaker_failure(self):
+        client = ApiClient(api_key="fake", base_url="http://127.0.0.1:9/v1")
+        self.addCleanup(client.close)
+        stream = BrokenStream()
+        client.create_chat_completion = lambda **kwargs: stream
+        view = types.SimpleNamespace(openai_client=client)
+
+        with self.assertRaises(openai.APIConnectionError):
+            VsTypingDojo.stream_sentences(view, "prompt", lambda word: True)
+        self.assertTrue(stream.closed)
+        self.assertEqual(client.breaker.failures, 1)
+        self.assertEqual(client.stats.failures, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
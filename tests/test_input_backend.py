@@ -0,0 +1,173 @@
+import os
+import select
+import sys
+import time
+import types
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from input_backend import (  # noqa: E402
+    DeviceInputBackend,
+    FakeKeyboard,
+    TkInputBackend,
+    open_evdev_keyboards,
+)
+from vs_typing_dojo import VsTypingDojo  # noqa: E402
+
+EV_KEY, KEY_A, KEY_Z = 1, 30, 44
+
+
+class Device:
+    def __init__(self, path, keys=(KEY_A, KEY_Z), fail_grab=False):
+        self.path = path
+        self.keys = list(keys)
+        self.fail_grab = fail_grab
+        self.grabbed = False
+        self.closed = False
+
+    def capabilities(self):
+        return {EV_KEY: self.keys}
+
+    def grab(self):
+        if self.fail_grab:
+            raise OSError(16, "Device or resource busy")
+        self.grabbed = True
+
+    def close(self):
+        self.closed = True
+
+
+def fake_evdev(devices):
+    """devices（パス → Device）を持つ evdev モジュールの代わり"""
+    module = types.ModuleType("evdev")
+    module.ecodes = types.SimpleNamespace(EV_KEY=EV_KEY, KEY_A=KEY_A, KEY_Z=KEY_Z)
+    module.list_devices = lambda: list(devices)
+    module.InputDevice = lambda path: devices[path]
+    return module
+
+
+class OpenEvdevKeyboardsTest(unittest.TestCase):
+    def test_no_keyboards_raises(self):
+        mouse = Device("/dev/input/event0", keys=())
+        with mock.patch.dict(sys.modules, evdev=fake_evdev({mouse.path: mouse})):
+            with self.assertRaises(RuntimeError):
+                open_evdev_keyboards()
+        self.assertTrue(mouse.closed)
+
+    def test_failed_grab_closes_opened_keyboards(self):
+        first = Device("/dev/input/event0")
+        busy = Device("/dev/input/event1", fail_grab=True)
+        devices = {first.path: first, busy.path: busy}
+        with mock.patch.dict(sys.modules, evdev=fake_evdev(devices)):
+            with self.assertRaises(OSError):
+                open_evdev_keyboards()
+        self.assertTrue(first.grabbed)
+        self.assertTrue(first.closed)
+        self.assertTrue(busy.closed)
+
+
+class FakeTk:
+    """Tk のファイルハンドラだけを持つ root.tk の代わり（pump() でメインループを1回まわす）"""
+
+    def __init__(self):
+        self.handlers = {}
+
+    def createfilehandler(self, fd, mask, callback):
+        self.handlers[fd] = callback
+
+    def deletefilehandler(self, fd):
+        del self.handlers[fd]
+
+    def pump(self, timeout):
+        ready, _, _ = select.select(list(self.handlers), [], [], timeout)
+        for fd in ready:
+            self.handlers[fd](fd, 0)
+
+
+class DeviceInputBackendTest(unittest.TestCase):
+    def setUp(self):
+        self.root = types.SimpleNamespace(tk=FakeTk())
+        self.keyboards = [FakeKeyboard(), FakeKeyboard()]
+        self.keys = []
+        self.backend = DeviceInputBackend(self.root, self.keyboards, self.on_key)
+        self.addCleanup(self.backend.stop)
+
+    def on_key(self, player, char, timestamp, event):
+        self.keys.append((player, char))
+
+    def wait_for_keys(self, count):
+        deadline = time.monotonic() + 5
+        while len(self.keys) < count:
+            if time.monotonic() > deadline:
+                raise AssertionError(f"only {self.keys} arrived")
+            self.root.tk.pump(0.1)
+
+    def test_each_keyboard_is_a_player(self):
+        self.backend.start()
+        self.keyboards[0].type("ka")
+        self.wait_for_keys(2)
+        self.keyboards[1].type("Ni-")
+        self.wait_for_keys(5)
+        self.assertEqual(self.keys, [(0, "k"), (0, "a"), (1, "n"), (1, "i"), (1, "-")])
+
+    def test_stop_closes_the_devices(self):
+        self.backend.start()
+        self.backend.stop()
+        self.assertEqual(self.root.tk.handlers, {})
+        for keyboard in self.keyboards:
+            with self.assertRaises(OSError):
+                keyboard.type("a")
+        self.backend.stop()
+
+    def test_stop_without_start_closes_the_devices(self):
+        self.backend.stop()
+        for keyboard in self.keyboards:
+            with self.assertRaises(OSError):
+                keyboard.type("a")
+
+
+class SetupInputTest(unittest.TestCase):
+    def setup_input(self, keyboard_count, local_player=None):
+        keyboards = [FakeKeyboard() for _ in range(keyboard_count)]
+        view = types.SimpleNamespace(
+            root=None,
+            handle_key=lambda *args: None,
+            engine=types.SimpleNamespace(players=[None, None]),
+        )
+        with mock.patch("input_backend.open_evdev_keyboards", return_value=keyboards):
+            backend = VsTypingDojo.setup_input(view, "evdev", None, local_player)
+        if isinstance(backend, DeviceInputBackend):
+            self.addCleanup(backend.stop)
+        return backend, keyboards
+
+    def test_one_keyboard_falls_back_to_tk(self):
+        backend, keyboards = self.setup_input(1)
+        self.assertIsInstance(backend, TkInputBackend)
+        self.assertEqual(backend.player_count, 2)
+        with self.assertRaises(OSError):
+            keyboards[0].type("a")
+
+    def test_one_keyboard_is_kept_for_a_netplay_host(self):
+        backend, _ = self.setup_input(1, local_player=0)
+        self.assertIsInstance(backend, DeviceInputBackend)
+
+    def test_window_close_stops_the_input_backend(self):
+        backend, keyboards = self.setup_input(2)
+        view = mock.Mock(
+            input_backend=backend, netplay_host=None, netplay_client=None, spectator_feed=None
+        )
+        VsTypingDojo.on_close(view)
+        view.root.destroy.assert_called_once_with()
+        with self.assertRaises(OSError):
+            keyboards[0].type("a")
+
+    def test_two_keyboards(self):
+        backend, _ = self.setup_input(2)
+        self.assertIsInstance(backend, DeviceInputBackend)
+        self.assertEqual(backend.player_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
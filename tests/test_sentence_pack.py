@@ -0,0 +1,44 @@
+import errno
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sentence_pack import SentencePack, write_pack  # noqa: E402
+
+
+def entries():
+    for japanese, katakana, romaji in (
+        ("犬も歩けば棒に当たる", "イヌモアルケバボウニアタル", "inumoarukebabouniataru"),
+        ("類は友を呼ぶ", "ルイハトモヲヨブ", "ruihatomowoyobu"),
+    ):
+        yield "12歳", {"japanese": japanese, "katakana": katakana, "romaji": romaji}
+
+
+class WritePackTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "sentences.vtdp")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        self.assertEqual(write_pack(self.path, entries()), 2)
+        with SentencePack(self.path) as pack:
+            section = pack.select("12歳")
+            self.assertEqual([word["romaji"] for word in section][1], "ruihatomowoyobu")
+
+    def test_failed_write_removes_the_temporary_file(self):
+        full = OSError(errno.ENOSPC, "No space left on device")
+        with mock.patch("sentence_pack.shutil.copyfileobj", side_effect=full):
+            with self.assertRaises(OSError):
+                write_pack(self.path, entries())
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import asyncio
+import os
+import sys
+import types
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from spectator import SpectatorStats, _ViewerProtocol  # noqa: E402
+
+
+class FakeTransport:
+    def __init__(self):
+        self.written = []
+        self.aborted = False
+        self.limits = None
+
+    def get_extra_info(self, name):
+        return None
+
+    def set_write_buffer_limits(self, high):
+        self.limits = high
+
+    def write(self, data):
+        self.written.append(data)
+
+    def abort(self):
+        self.aborted = True
+
+
+class ViewerProtocolTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.server = types.SimpleNamespace(
+            stats=SpectatorStats(),
+            stall_timeout=0.05,
+            write_buffer_limit=4096,
+            send_buffer=4096,
+            _viewers=set(),
+            _add=lambda viewer: True,
+        )
+        self.transport = FakeTransport()
+        self.viewer = _ViewerProtocol(self.server)
+        self.viewer.connection_made(self.transport)
+
+    async def test_keeps_only_the_latest_snapshot_while_paused(self):
+        self.assertEqual(self.transport.limits, 4096)
+        self.viewer.send(b"1\n")
+        self.viewer.pause_writing()
+        for data in (b"2\n", b"3\n", b"4\n"):
+            self.viewer.send(data)
+        self.assertEqual(self.transport.written, [b"1\n"])
+        self.assertEqual(self.server.stats.dropped, 2)
+
+        self.viewer.resume_writing()
+        self.assertEqual(self.transport.written, [b"1\n", b"4\n"])
+        self.assertIsNone(self.viewer.pending)
+
+        # 再開したので切断しない
+        await asyncio.sleep(0.1)
+        self.assertFalse(self.transport.aborted)
+        self.assertEqual(self.server.stats.stalled, 0)
+
+    async def test_aborts_after_stall_timeout(self):
+        self.viewer.pause_writing()
+        self.viewer.send(b"1\n")
+        await asyncio.sleep(0.1)
+        self.assertTrue(self.transport.aborted)
+        self.assertEqual(self.server.stats.stalled, 1)
+        self.assertEqual(self.transport.written, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
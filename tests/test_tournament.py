@@ -0,0 +1,86 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import types
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tournament import ResultsStore, Tournament  # noqa: E402
+from vs_typing_dojo import VsTypingDojo  # noqa: E402
+
+
+def stat(score, accuracy):
+    return {
+        "score": score,
+        "cpm": 200.0,
+        "accuracy": accuracy,
+        "perfect_count": 0,
+        "words_typed": 5,
+    }
+
+
+class ResultsStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "results.sqlite3")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_newer_schema_raises_sqlite_error(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA user_version = 99")
+        conn.close()
+        with self.assertRaises(sqlite3.Error):
+            ResultsStore(self.path)
+
+    def test_bracket_tiebreak_is_stored_as_a_win(self):
+        store = ResultsStore(self.path)
+        tournament = Tournament(store, "cup", ["a", "b"], "bracket")
+        tournament.record([stat(100, 90.0), stat(100, 95.0)], "12歳", 60)
+        self.assertEqual(tournament.champion, "b")
+
+        rows = {row[0]: row[2:5] for row in tournament.leaderboard()}
+        self.assertEqual(rows["b"], (1, 0, 0))
+        self.assertEqual(rows["a"], (0, 0, 1))
+        store.close()
+
+    def test_bracket_tiebreak_winner_is_shown(self):
+        store = ResultsStore(self.path)
+        tournament = Tournament(store, "cup", ["a", "b"], "bracket")
+        self.assertEqual(tournament.winner([stat(100, 90.0), stat(100, 95.0)]), 1)
+
+        # end_game() はこの戻り値で勝者を表示する
+        players = [
+            types.SimpleNamespace(
+                score=100, correct_chars=200, accuracy=accuracy, perfect_count=0, words_typed=5
+            )
+            for accuracy in (90.0, 95.0)
+        ]
+        view = types.SimpleNamespace(
+            tournament=tournament,
+            engine=types.SimpleNamespace(players=players),
+            game_duration=60,
+            selected_user_type="12歳",
+            show_next_match=lambda: None,
+        )
+        self.assertEqual(VsTypingDojo.record_tournament_match(view), 1)
+        self.assertEqual(tournament.champion, "b")
+        store.close()
+
+    def test_round_robin_tie_is_a_draw(self):
+        store = ResultsStore(self.path)
+        tournament = Tournament(store, "league", ["a", "b"])
+        tournament.record([stat(100, 90.0), stat(100, 95.0)], "12歳", 60)
+
+        self.assertIsNone(tournament.winner([stat(100, 90.0), stat(100, 95.0)]))
+        rows = {row[0]: row[2:5] for row in tournament.leaderboard()}
+        self.assertEqual(rows["a"], (0, 1, 0))
+        self.assertEqual(rows["b"], (0, 1, 0))
+        store.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
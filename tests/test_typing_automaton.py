@@ -0,0 +1,39 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from typing_automaton import REJECT, compile_katakana  # noqa: E402
+
+
+def accepts(katakana, typed):
+    automaton = compile_katakana(katakana)
+    state = 0
+    for char in typed:
+        state = automaton.step(state, char)
+        if state == REJECT:
+            return False
+    return automaton.is_accepting(state)
+
+
+class HatsuonTest(unittest.TestCase):
+    def test_single_n_before_vowel_y_or_n_is_rejected(self):
+        self.assertFalse(accepts("ハンイ", "hani"))
+        self.assertFalse(accepts("ホンヤ", "honya"))
+        self.assertFalse(accepts("キンニク", "kinniku"))
+
+    def test_doubled_n_is_accepted(self):
+        self.assertTrue(accepts("ハンイ", "hanni"))
+        self.assertTrue(accepts("ハンイ", "han'i"))
+        self.assertTrue(accepts("ハンイ", "haxni"))
+        self.assertTrue(accepts("ホンヤ", "honnya"))
+        self.assertTrue(accepts("キンニク", "kinnniku"))
+
+    def test_single_n_before_consonant_is_accepted(self):
+        self.assertTrue(accepts("カンジ", "kanji"))
+        self.assertTrue(accepts("カンジ", "kannji"))
+
+
+if __name__ == "__main__":
+    unittest.main()
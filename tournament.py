@@ -0,0 +1,448 @@
+"""大会モード（総当たり・トーナメントで対戦を続け、結果を SQLite に保存する）
+
+    python tournament.py leaderboard --event "CoderDojo 2026-10"
+    python tournament.py leaderboard --by cpm --limit 20
+    python tournament.py events
+"""
+import argparse
+import collections
+import os
+import sqlite3
+import threading
+import time
+
+from paths import get_data_dir
+
+SCHEMA_VERSION = 1
+
+# 順位表の勝ち点
+WIN_POINTS = 3
+DRAW_POINTS = 1
+
+# 全大会の通算成績を入れる event_id
+ALL_EVENTS = 0
+
+# 順位表の並び順（それぞれ standings のインデックスと同じ順）
+LEADERBOARD_ORDERS = {
+    "points": "points DESC, total_score DESC",
+    "score": "best_score DESC",
+    "cpm": "best_cpm DESC",
+}
+
+FORMATS = ("round-robin", "bracket")
+
+
+class ResultsStore:
+    """対戦結果を保存する SQLite データベース
+
+    試合ごとの結果（results）に加えて、大会ごと・通算のプレイヤー成績（standings）を
+    保存のたびに更新しておく。順位表は standings のインデックスを順に読むだけなので、
+    保存した試合が何万件あっても表示する件数分の時間しかかからない。
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            path = os.path.join(get_data_dir(), "results.sqlite3")
+        self.path = path
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._setup_schema()
+
+    def _setup_schema(self):
+        with self._lock, self._conn:
+            version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            if version > SCHEMA_VERSION:
+                # 呼び出し側は sqlite3.Error だけを捕まえればよいようにする
+                raise sqlite3.DatabaseError(
+                    f"{self.path} was written by a newer version (schema {version})"
+                )
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS events (
+                    id INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    format TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS events_name ON events (name, created_at);
+
+                CREATE TABLE IF NOT EXISTS players (
+                    id INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL UNIQUE
+                );
+
+                CREATE TABLE IF NOT EXISTS matches (
+                    id INTEGER PRIMARY KEY,
+                    event_id INTEGER NOT NULL REFERENCES events (id),
+                    round INTEGER NOT NULL,
+                    user_type TEXT NOT NULL,
+                    duration REAL NOT NULL,
+                    played_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS matches_event ON matches (event_id, round);
+
+                CREATE TABLE IF NOT EXISTS results (
+                    match_id INTEGER NOT NULL REFERENCES matches (id),
+                    slot INTEGER NOT NULL,
+                    player_id INTEGER NOT NULL REFERENCES players (id),
+                    score INTEGER NOT NULL,
+                    cpm REAL NOT NULL,
+                    accuracy REAL NOT NULL,
+                    perfect_count INTEGER NOT NULL,
+                    words_typed INTEGER NOT NULL,
+                    outcome INTEGER NOT NULL,
+                    PRIMARY KEY (match_id, slot)
+                );
+                CREATE INDEX IF NOT EXISTS results_player ON results (player_id, match_id);
+
+                CREATE TABLE IF NOT EXISTS standings (
+                    event_id INTEGER NOT NULL,
+                    player_id INTEGER NOT NULL REFERENCES players (id),
+                    matches INTEGER NOT NULL,
+                    wins INTEGER NOT NULL,
+                    draws INTEGER NOT NULL,
+                    losses INTEGER NOT NULL,
+                    points INTEGER NOT NULL,
+                    total_score INTEGER NOT NULL,
+                    best_score INTEGER NOT NULL,
+                    best_cpm REAL NOT NULL,
+                    accuracy_sum REAL NOT NULL,
+                    PRIMARY KEY (event_id, player_id)
+                );
+                CREATE INDEX IF NOT EXISTS standings_points
+                    ON standings (event_id, points DESC, total_score DESC);
+                CREATE INDEX IF NOT EXISTS standings_score
+                    ON standings (event_id, best_score DESC);
+                CREATE INDEX IF NOT EXISTS standings_cpm
+                    ON standings (event_id, best_cpm DESC);
+                """
+            )
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def create_event(self, name, format):
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO events (name, format, created_at) VALUES (?, ?, ?)",
+                (name, format, time.time()),
+            )
+        return cursor.lastrowid
+
+    def find_event(self, name):
+        """name の大会のうち最も新しいものの id（なければ None）"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id FROM events WHERE name = ? ORDER BY created_at DESC LIMIT 1",
+                (name,),
+            ).fetchone()
+        return row[0] if row else None
+
+    def events(self):
+        """(id, 大会名, 形式, 作成日時, 試合数) の一覧（新しい順）"""
+        with self._lock:
+            return self._conn.execute(
+                """
+                SELECT events.id, name, format, created_at,
+                       (SELECT COUNT(*) FROM matches WHERE event_id = events.id)
+                FROM events ORDER BY created_at DESC
+                """
+            ).fetchall()
+
+    def _player_id(self, name):
+        self._conn.execute("INSERT OR IGNORE INTO players (name) VALUES (?)", (name,))
+        return self._conn.execute("SELECT id FROM players WHERE name = ?", (name,)).fetchone()[0]
+
+    def record_match(self, event_id, round, user_type, duration, results, winner=None):
+        """1試合の結果を保存して match_id を返す
+
+        results はプレイヤーごとの辞書（name, score, cpm, accuracy, perfect_count,
+        words_typed）のリスト。最高得点のプレイヤーが勝ち（複数なら引き分け）。
+        winner（results の番号）を渡すと、得点に関係なくそのプレイヤーの勝ちとする
+        （トーナメントの同点を正確度などで決めた場合）。
+        """
+        best = max(result["score"] for result in results)
+        leaders = sum(1 for result in results if result["score"] == best)
+
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO matches (event_id, round, user_type, duration, played_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (event_id, round, user_type, duration, time.time()),
+            )
+            match_id = cursor.lastrowid
+
+            for slot, result in enumerate(results):
+                player_id = self._player_id(result["name"])
+                if winner is not None:
+                    outcome = 1 if slot == winner else -1
+                elif result["score"] < best:
+                    outcome = -1
+                else:
+                    outcome = 1 if leaders == 1 else 0
+                self._conn.execute(
+                    """
+                    INSERT INTO results (match_id, slot, player_id, score, cpm, accuracy,
+                                         perfect_count, words_typed, outcome)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (
+                        match_id,
+                        slot,
+                        player_id,
+                        result["score"],
+                        result["cpm"],
+                        result["accuracy"],
+                        result["perfect_count"],
+                        result["words_typed"],
+                        outcome,
+                    ),
+                )
+
+                points = {1: WIN_POINTS, 0: DRAW_POINTS, -1: 0}[outcome]
+                for standings_event in (event_id, ALL_EVENTS):
+                    self._conn.execute(
+                        """
+                        INSERT INTO standings (event_id, player_id, matches, wins, draws,
+                                               losses, points, total_score, best_score,
+                                               best_cpm, accuracy_sum)
+                        VALUES (?, ?, 1, ?, ?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT (event_id, player_id) DO UPDATE SET
+                            matches = matches + 1,
+                            wins = wins + excluded.wins,
+                            draws = draws + excluded.draws,
+                            losses = losses + excluded.losses,
+                            points = points + excluded.points,
+                            total_score = total_score + excluded.total_score,
+                            best_score = MAX(best_score, excluded.best_score),
+                            best_cpm = MAX(best_cpm, excluded.best_cpm),
+                            accuracy_sum = accuracy_sum + excluded.accuracy_sum
+                        """,
+                        (
+                            standings_event,
+                            player_id,
+                            int(outcome == 1),
+                            int(outcome == 0),
+                            int(outcome == -1),
+                            points,
+                            result["score"],
+                            result["score"],
+                            result["cpm"],
+                            result["accuracy"],
+                        ),
+                    )
+        return match_id
+
+    def leaderboard(self, event_id=ALL_EVENTS, by="points", limit=10):
+        """順位表（上位 limit 人）
+
+        (名前, 試合数, 勝, 分, 敗, 勝ち点, 最高得点, 最高 CPM, 平均正確度) のリストを返す。
+        event_id を省略すると全大会の通算。
+        """
+        order = LEADERBOARD_ORDERS[by]
+        with self._lock:
+            return self._conn.execute(
+                f"""
+                SELECT players.name, matches, wins, draws, losses, points,
+                       best_score, best_cpm, accuracy_sum / matches
+                FROM standings JOIN players ON players.id = standings.player_id
+                WHERE event_id = ?
+                ORDER BY {order}
+                LIMIT ?
+                """,
+                (event_id, limit),
+            ).fetchall()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def round_robin_rounds(players):
+    """総当たりの組み合わせを回戦ごとに返す（サークル方式、奇数なら毎回戦1人が休み）"""
+    entrants = list(players)
+    if len(entrants) % 2:
+        entrants.append(None)
+    count = len(entrants)
+
+    rounds = []
+    for _ in range(count - 1):
+        pairs = [(entrants[i], entrants[count - 1 - i]) for i in range(count // 2)]
+        rounds.append([pair for pair in pairs if None not in pair])
+        # 先頭を固定して残りを回転させる
+        entrants = [entrants[0], entrants[-1]] + entrants[1:-1]
+    return rounds
+
+
+def bracket_order(size):
+    """トーナメント表でのシード順（上位シード同士が最後まで当たらない並び）"""
+    order = [0]
+    while len(order) < size:
+        count = len(order) * 2
+        order = [seed for top in order for seed in (top, count - 1 - top)]
+    return order
+
+
+def match_winner(results):
+    """勝ち上がるプレイヤーの番号（得点、正確度、パーフェクト回数の順に比べ、同じなら上位シード）"""
+    return max(
+        range(len(results)),
+        key=lambda i: (
+            results[i]["score"],
+            results[i]["accuracy"],
+            results[i]["perfect_count"],
+            -i,
+        ),
+    )
+
+
+class Tournament:
+    """大会の進行（次の対戦の組み合わせと結果の保存）
+
+    players の順番をシード順とする。bracket（トーナメント）では、人数が2のべき乗で
+    なければ上位シードが1回戦を不戦勝で勝ち上がる。
+    """
+
+    def __init__(self, store, name, players, format="round-robin"):
+        if format not in FORMATS:
+            raise ValueError(f"unknown tournament format {format!r}")
+        if len(players) < 2:
+            raise ValueError("a tournament needs at least two players")
+        if len(set(players)) != len(players):
+            raise ValueError("player names must be unique")
+
+        self.store = store
+        self.name = name
+        self.players = list(players)
+        self.format = format
+        self.event_id = store.create_event(name, format)
+        self.round = 1
+        self.champion = None
+
+        self._queue = collections.deque()
+        if format == "round-robin":
+            for round, pairs in enumerate(round_robin_rounds(self.players), 1):
+                self._queue.extend((round, a, b) for a, b in pairs)
+        else:
+            size = 1
+            while size < len(self.players):
+                size *= 2
+            seeded = [
+                self.players[seed] if seed < len(self.players) else None
+                for seed in bracket_order(size)
+            ]
+            self._start_bracket_round(seeded)
+
+    def _start_bracket_round(self, entrants):
+        # 相手がいない（None）プレイヤーは不戦勝
+        self._advancing = []
+        for a, b in zip(entrants[0::2], entrants[1::2]):
+            if a is None or b is None:
+                self._advancing.append(a if b is None else b)
+            else:
+                self._advancing.append(None)
+                self._queue.append((self.round, a, b))
+        if not self._queue:
+            self._finish_bracket_round()
+
+    def _finish_bracket_round(self):
+        if len(self._advancing) == 1:
+            self.champion = self._advancing[0]
+            return
+        self.round += 1
+        self._start_bracket_round(self._advancing)
+
+    @property
+    def finished(self):
+        return not self._queue
+
+    @property
+    def current(self):
+        """次の対戦 (回戦, プレイヤー1, プレイヤー2)（終わっていれば None）"""
+        return self._queue[0] if self._queue else None
+
+    @property
+    def remaining_matches(self):
+        return len(self._queue)
+
+    def winner(self, stats):
+        """対戦した2人の成績 stats のうち勝った方の番号（引き分けなら None）
+
+        トーナメントでは同点でも match_winner() で勝ち上がる方を決める。
+        """
+        if self.format == "bracket":
+            return match_winner(stats)
+        best = max(stat["score"] for stat in stats)
+        leaders = [i for i, stat in enumerate(stats) if stat["score"] == best]
+        return leaders[0] if len(leaders) == 1 else None
+
+    def record(self, stats, user_type, duration):
+        """現在の対戦の結果を保存して、次の対戦に進む
+
+        stats は対戦した2人の成績（score, cpm, accuracy, perfect_count, words_typed）。
+        """
+        round, a, b = self._queue.popleft()
+        results = [dict(stat, name=name) for name, stat in zip((a, b), stats)]
+        if self.format != "bracket":
+            return self.store.record_match(self.event_id, round, user_type, duration, results)
+
+        # 同点でも勝ち上がった方を勝ちとして保存する（順位表と勝ち上がりを一致させる）
+        winner = self.winner(results)
+        match_id = self.store.record_match(
+            self.event_id, round, user_type, duration, results, winner
+        )
+        # 不戦勝でない最初の空き（この対戦の勝者の位置）に入れる
+        self._advancing[self._advancing.index(None)] = (a, b)[winner]
+        if not self._queue:
+            self._finish_bracket_round()
+        return match_id
+
+    def leaderboard(self, by="points", limit=10):
+        return self.store.leaderboard(self.event_id, by, limit)
+
+
+def format_leaderboard(rows):
+    lines = [f"{'#':>2} {'name':<12} {'MP':>4} {'W':>3} {'D':>3} {'L':>3} {'Pts':>4}"
+             f" {'best':>6} {'CPM':>7} {'acc':>6}"]
+    for rank, (name, matches, wins, draws, losses, points, best, cpm, accuracy) in enumerate(
+        rows, 1
+    ):
+        lines.append(
+            f"{rank:>2} {name:<12} {matches:>4} {wins:>3} {draws:>3} {losses:>3} {points:>4}"
+            f" {best:>6} {cpm:>7.1f} {accuracy:>5.1f}%"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="VS Typing Dojo tournament results")
+    parser.add_argument("--db", help="結果のデータベース（既定は ~/.vs-typing-dojo/results.sqlite3）")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    board = subparsers.add_parser("leaderboard", help="順位表を表示する")
+    board.add_argument("--event", help="大会名（省略すると通算）")
+    board.add_argument("--by", choices=sorted(LEADERBOARD_ORDERS), default="points")
+    board.add_argument("--limit", type=int, default=10)
+
+    subparsers.add_parser("events", help="大会の一覧を表示する")
+
+    args = parser.parse_args()
+    store = ResultsStore(args.db)
+    try:
+        if args.command == "events":
+            for event_id, name, format, created_at, matches in store.events():
+                created = time.strftime("%Y-%m-%d %H:%M", time.localtime(created_at))
+                print(f"{event_id:>4}  {created}  {format:<11} {matches:>4} matches  {name}")
+            return
+
+        event_id = ALL_EVENTS
+        if args.event:
+            event_id = store.find_event(args.event)
+            if event_id is None:
+                parser.error(f"no event named {args.event!r}")
+        print(format_leaderboard(store.leaderboard(event_id, args.by, args.limit)))
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
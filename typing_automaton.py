@@ -0,0 +1,194 @@
+import functools
+
+from romaji import (
+    HATSUON,
+    KANA_SPELLINGS,
+    SOKUON,
+    hatsuon_needs_double,
+    sokuon_prefix,
+    token_spellings,
+    tokenize,
+)
+
+REJECT = -1
+
+
+class TypingAutomaton:
+    """1つの課題文の入力を受理する決定性オートマトン
+
+    ヘボン式・訓令式・IME で一般的な表記ゆれ（si/shi, tu/tsu, kixya など）を
+    すべて受理する。状態は整数で、1打鍵ごとの処理は辞書引き1回で済む。
+    """
+
+    __slots__ = ("transitions", "remaining", "accepting", "canonical")
+
+    def __init__(self, transitions, remaining, accepting):
+        # transitions[state] = {char: next_state}
+        self.transitions = transitions
+        # remaining[state] = その状態から標準表記で入力する場合の残りの文字列
+        self.remaining = remaining
+        # accepting[state] = 課題文を最後まで入力し終えた状態かどうか
+        self.accepting = accepting
+        self.canonical = remaining[0]
+
+    def step(self, state, char):
+        """次の状態を返す（受理できない文字なら REJECT）"""
+        return self.transitions[state].get(char, REJECT)
+
+    def is_accepting(self, state):
+        return self.accepting[state]
+
+    def expected_char(self, state):
+        """標準表記で次に入力する文字"""
+        remaining = self.remaining[state]
+        return remaining[0] if remaining else ""
+
+
+def _token_units(tokens):
+    """トークン列を入力単位（受理する綴りの一覧、先頭が標準表記）に変換する"""
+    units = []
+    i = 0
+    n = len(tokens)
+    while i < n:
+        token = tokens[i]
+        spellings = list(_spellings_with_small_kana(token))
+
+        if token == SOKUON and i + 1 < n:
+            following = tokens[i + 1]
+            following_spellings = list(_spellings_with_small_kana(following))
+            prefix = sokuon_prefix(following_spellings[0])
+            if prefix and following not in (SOKUON, HATSUON):
+                # 促音は次の音と1つの単位にまとめる（kka, xtuka, tchi など）
+                merged = []
+                for spelling in following_spellings:
+                    head = spelling[0]
+                    if head.isalpha() and head not in "aiueonxl":
+                        merged.append(head + spelling)
+                    if spelling.startswith("ch"):
+                        merged.append("t" + spelling)
+                for sokuon in spellings:
+                    merged.extend(sokuon + spelling for spelling in following_spellings)
+                # 標準表記（katakana_to_romaji と同じもの）を先頭にする
+                canonical = prefix + following_spellings[0]
+                merged.remove(canonical)
+                units.append([canonical] + merged)
+                i += 2
+                continue
+
+        if token == HATSUON:
+            following = tokens[i + 1] if i + 1 < n else None
+            following_spelling = token_spellings(following)[0] if following else ""
+            if following_spelling and hatsuon_needs_double(following_spelling):
+                # 母音・ヤ行・ナ行の前の "n" 1つは次の音と続いてしまう（hani → ハニ）
+                spellings = ["nn", "xn", "n'"]
+            else:
+                spellings = ["n", "nn", "xn", "n'"]
+
+        units.append(spellings)
+        i += 1
+
+    return [_dedupe(unit) for unit in units]
+
+
+def _spellings_with_small_kana(token):
+    """拗音などは「キ」+「ャ」のように1文字ずつ入力する綴りも受理する"""
+    spellings = list(token_spellings(token))
+    if len(token) == 2 and token in KANA_SPELLINGS:
+        for head in token_spellings(token[0]):
+            for tail in token_spellings(token[1]):
+                spellings.append(head + tail)
+    return spellings
+
+
+def _dedupe(spellings):
+    seen = set()
+    result = []
+    for spelling in spellings:
+        if spelling not in seen:
+            seen.add(spelling)
+            result.append(spelling)
+    return result
+
+
+def _build(units):
+    """入力単位の列から部分集合構成法で決定性オートマトンを作る"""
+    unit_count = len(units)
+
+    # canonical_suffix[u] = u 番目以降を標準表記で入力した文字列
+    canonical_suffix = [""] * (unit_count + 1)
+    for u in range(unit_count - 1, -1, -1):
+        canonical_suffix[u] = units[u][0] + canonical_suffix[u + 1]
+
+    def completion(position):
+        """位置 (u, 入力済みの綴り) から標準的に入力した場合の残り"""
+        u, prefix = position
+        if u == unit_count:
+            return ""
+        for spelling in units[u]:
+            if spelling.startswith(prefix) and len(spelling) > len(prefix):
+                return spelling[len(prefix) :] + canonical_suffix[u + 1]
+        return canonical_suffix[u + 1]
+
+    start = frozenset([(0, "")])
+    state_ids = {start: 0}
+    queue = [start]
+    transitions = []
+    remaining = []
+    accepting = []
+
+    while len(transitions) < len(queue):
+        positions = queue[len(transitions)]
+
+        # 短い方の残りを優先し、同じ長さなら入力が進んでいる方を表示する
+        best = min(positions, key=lambda p: (len(completion(p)), -p[0]))
+        remaining.append(completion(best))
+        accepting.append((unit_count, "") in positions)
+
+        moves = {}
+        for u, prefix in positions:
+            if u == unit_count:
+                continue
+            for spelling in units[u]:
+                if not spelling.startswith(prefix) or len(spelling) == len(prefix):
+                    continue
+                char = spelling[len(prefix)]
+                typed = prefix + char
+                target = moves.setdefault(char, set())
+                if typed == spelling:
+                    target.add((u + 1, ""))
+                else:
+                    target.add((u, typed))
+
+        edges = {}
+        for char, target in moves.items():
+            target = frozenset(target)
+            if target not in state_ids:
+                state_ids[target] = len(queue)
+                queue.append(target)
+            edges[char] = state_ids[target]
+        transitions.append(edges)
+
+    return TypingAutomaton(transitions, remaining, accepting)
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_katakana(katakana):
+    """カナ文字列から入力オートマトンを作る（文字列ごとにキャッシュ）"""
+    return _build(_token_units(tokenize(katakana)))
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_romaji(romaji):
+    """ローマ字しかない課題文は表記どおりの1通りだけを受理する"""
+    return _build([[char] for char in romaji])
+
+
+def compile_word(word):
+    """課題文データから入力オートマトンを作る"""
+    katakana = word.get("katakana")
+    if katakana:
+        try:
+            return compile_katakana(katakana)
+        except ValueError as e:
+            print(f"Falling back to romaji for {word['japanese']!r}: {e}")
+    return compile_romaji(word["romaji"])
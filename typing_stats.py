@@ -0,0 +1,117 @@
+"""打鍵ごとに少しずつ更新する統計（直近の CPM・瞬間最高速度・課題文ごとの正確度）
+
+正しく入力した打鍵の時刻をプレイヤーごとのリングバッファに入れておく。隣り合う時刻の
+差が打鍵間隔で、バッファの2点の差がその間の打鍵間隔の合計になる。どの値も打鍵1回・
+表示1回あたり定数時間で求まる（古い打鍵を捨てる処理も、1打鍵につき1回しか起きない）。
+"""
+
+# 直近の CPM を求める期間
+WINDOW_SECONDS = 10
+# 瞬間最高速度を測る打鍵数
+BURST_KEYS = 10
+# リングバッファの大きさ（直近 WINDOW_SECONDS 秒に入る打鍵数より大きくする）
+CAPACITY = 1024
+
+NS_PER_MINUTE = 60 * 1_000_000_000
+
+
+class RollingStats:
+    """1人分の打鍵統計
+
+    時刻は time.monotonic_ns() の値を使う。
+    """
+
+    __slots__ = (
+        "window_ns",
+        "burst_keys",
+        "times",
+        "head",
+        "window_count",
+        "total_hits",
+        "burst_cpm",
+        "sentence_hits",
+        "sentence_misses",
+        "last_sentence_accuracy",
+    )
+
+    def __init__(self, window_seconds=WINDOW_SECONDS, burst_keys=BURST_KEYS, capacity=CAPACITY):
+        self.window_ns = int(window_seconds * 1_000_000_000)
+        self.burst_keys = burst_keys
+        self.times = [0] * capacity
+        self.reset()
+
+    def reset(self):
+        self.head = 0  # 次に書き込む位置
+        self.window_count = 0  # 直近 window_ns に入る打鍵の数（先頭から数えた個数）
+        self.total_hits = 0
+        self.burst_cpm = 0.0  # この試合の瞬間最高速度
+        self.last_sentence_accuracy = None  # 直前の課題文の正確度
+        self.sentence_hits = 0
+        self.sentence_misses = 0
+
+    def new_sentence(self):
+        """次の課題文に進んだ（課題文ごとの正確度をリセット）"""
+        if self.sentence_hits or self.sentence_misses:
+            self.last_sentence_accuracy = self._sentence_accuracy()
+        self.sentence_hits = 0
+        self.sentence_misses = 0
+
+    def miss(self):
+        self.sentence_misses += 1
+
+    def hit(self, timestamp):
+        """正しく入力した打鍵を1つ加える"""
+        times = self.times
+        capacity = len(times)
+        head = self.head
+        times[head] = timestamp
+        head += 1
+        if head == capacity:
+            head = 0
+        self.head = head
+        self.total_hits += 1
+        self.sentence_hits += 1
+
+        # 直前 burst_keys 打鍵の打鍵間隔の合計から瞬間速度を求める
+        keys = self.burst_keys
+        if self.total_hits > keys:
+            span = timestamp - times[head - keys - 1]
+            if span > 0 and keys * NS_PER_MINUTE > self.burst_cpm * span:
+                self.burst_cpm = keys * NS_PER_MINUTE / span
+
+        count = self.window_count
+        if count < capacity:
+            count += 1
+        self.window_count = count
+        self._expire(timestamp)
+
+    def _expire(self, now):
+        # 期間外になった古い打鍵を捨てる（負の添字でリングの末尾側を指す）
+        times = self.times
+        head = self.head
+        oldest = now - self.window_ns
+        count = self.window_count
+        while count and times[head - count] <= oldest:
+            count -= 1
+        self.window_count = count
+
+    def rolling_cpm(self, now, elapsed_ns=None):
+        """直近 window_ns の1分あたりの正しい打鍵数
+
+        試合開始から window_ns たっていなければ、経過時間 elapsed_ns（1秒未満なら1秒）で割る。
+        """
+        self._expire(now)
+        span = self.window_ns
+        if elapsed_ns is not None and elapsed_ns < span:
+            span = max(elapsed_ns, 1_000_000_000)
+        return self.window_count * NS_PER_MINUTE / span
+
+    def _sentence_accuracy(self):
+        return self.sentence_hits / (self.sentence_hits + self.sentence_misses) * 100
+
+    @property
+    def sentence_accuracy(self):
+        """現在の課題文の正確度（まだ打鍵がなければ直前の課題文、どちらもなければ None）"""
+        if self.sentence_hits or self.sentence_misses:
+            return self._sentence_accuracy()
+        return self.last_sentence_accuracy
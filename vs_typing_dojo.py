@@ -1,35 +1,51 @@
 import tkinter as tk
+import argparse
 import random
-import jaconv
-import time
 import os
-import json
-from openai import OpenAI
-from prompt import get_kadai_list_creation_prompt
-
-
-def katakana_to_romaji(text):
-    """Convert katakana characters to romaji using jaconv library"""
-    try:
-        # Use jaconv for the main conversion
-        result = jaconv.kata2alphabet(text)
-
-        # Replace any remaining full-width characters with half-width
-        result = result.replace("ー", "-")
-        result = result.replace("－", "-")  # Full-width minus
-        result = result.replace("—", "-")  # Em dash
-        result = result.replace("‐", "-")  # Hyphen
-
-        return result
-
-    except Exception as e:
-        print(f"jaconv conversion failed: {e}")
-        # Fall back to basic conversion
-        pass
+import sqlite3
+import time
+import openai
+from api_client import ApiClient, CircuitOpenError
+from prompt import MODEL, get_kadai_list_creation_prompt
+from batch_generation import USER_TYPES, run_batch_generation
+from generation_worker import GenerationWorker
+from json_stream import ObjectStreamParser
+from sentence_cache import SentenceCache
+from sentence_pack import SentencePack
+from sentence_parser import make_word, parse_response
+from dedup import DedupIndex
+from engine import COMPLETED, IGNORED, MISS, TypingEngine
+from input_backend import create_input_backend
+from netplay import DEFAULT_PORT, MirrorEngine, NetplayClient, NetplayHost
+from spectator import DEFAULT_PORT as SPECTATOR_PORT, SpectatorFeed, SpectatorServer
+from recorder import KeystrokeRecorder
+from latency_monitor import LatencyMonitor
+from game_clock import GameClock
+from word_canvas import WordCanvas
+from render_scheduler import RenderScheduler
+from prefetcher import SentencePrefetcher
+from adaptive import AdaptiveSelector
+from typing_stats import WINDOW_SECONDS
+from tournament import ResultsStore, Tournament, format_leaderboard
 
 
 class VsTypingDojo:
-    def __init__(self, root):
+    def __init__(
+        self,
+        root,
+        latency_hud=False,
+        seed=None,
+        pack_path=None,
+        input_kind="tk",
+        keyboards=None,
+        host_port=None,
+        connect=None,
+        spectate_port=None,
+        tournament_players=None,
+        tournament_format="round-robin",
+        event_name=None,
+        adaptive=False,
+    ):
         self.root = root
         self.root.title("VS Typing Dojo")
         self.root.geometry("1000x730")
@@ -37,135 +53,578 @@ class VsTypingDojo:
 
         # ゲーム変数（日本語のことわざ）
         self.default_words = [
-            {"japanese": "犬も歩けば棒に当たる", "romaji": "inumoarukebabouniataru"},
-            {"japanese": "猫に小判", "romaji": "nekonikoban"},
-            {"japanese": "七転び八起き", "romaji": "nanakorobiyaoki"},
-            {"japanese": "花より団子", "romaji": "hanayoridango"},
-            {"japanese": "石の上にも三年", "romaji": "ishinouenimosannen"},
-            {"japanese": "時は金なり", "romaji": "tokihakanenari"},
-            {"japanese": "急がば回れ", "romaji": "isogabamaware"},
+            {
+                "japanese": "犬も歩けば棒に当たる",
+                "katakana": "イヌモアルケバボウニアタル",
+                "romaji": "inumoarukebabouniataru",
+            },
+            {
+                "japanese": "猫に小判",
+                "katakana": "ネコニコバン",
+                "romaji": "nekonikoban",
+            },
+            {
+                "japanese": "七転び八起き",
+                "katakana": "ナナコロビヤオキ",
+                "romaji": "nanakorobiyaoki",
+            },
+            {
+                "japanese": "花より団子",
+                "katakana": "ハナヨリダンゴ",
+                "romaji": "hanayoridango",
+            },
+            {
+                "japanese": "石の上にも三年",
+                "katakana": "イシノウエニモサンネン",
+                "romaji": "ishinouenimosannnen",
+            },
+            {
+                "japanese": "時は金なり",
+                "katakana": "トキハカネナリ",
+                "romaji": "tokihakanenari",
+            },
+            {
+                "japanese": "急がば回れ",
+                "katakana": "イソガバマワレ",
+                "romaji": "isogabamaware",
+            },
             {
                 "japanese": "塵も積もれば山となる",
+                "katakana": "チリモツモレバヤマトナル",
                 "romaji": "chirimotsumorebayamatonaru",
             },
-            {"japanese": "継続は力なり", "romaji": "keizokuhachikaranari"},
-            {"japanese": "案ずるより産むが易し", "romaji": "anzuruyoriumugayasushi"},
-            {"japanese": "一期一会", "romaji": "ichigoichie"},
-            {"japanese": "温故知新", "romaji": "onkochishin"},
-            {"japanese": "十人十色", "romaji": "juunintoiro"},
-            {"japanese": "百聞は一見に如かず", "romaji": "hyakubunhaikkennishikazu"},
-            {"japanese": "類は友を呼ぶ", "romaji": "ruihatomowoyobu"},
+            {
+                "japanese": "継続は力なり",
+                "katakana": "ケイゾクハチカラナリ",
+                "romaji": "keizokuhachikaranari",
+            },
+            {
+                "japanese": "案ずるより産むが易し",
+                "katakana": "アンズルヨリウムガヤスシ",
+                "romaji": "anzuruyoriumugayasushi",
+            },
+            {
+                "japanese": "一期一会",
+                "katakana": "イチゴイチエ",
+                "romaji": "ichigoichie",
+            },
+            {
+                "japanese": "温故知新",
+                "katakana": "オンコチシン",
+                "romaji": "onkochishin",
+            },
+            {
+                "japanese": "十人十色",
+                "katakana": "ジュウニントイロ",
+                "romaji": "juunintoiro",
+            },
+            {
+                "japanese": "百聞は一見に如かず",
+                "katakana": "ヒャクブンハイッケンニシカズ",
+                "romaji": "hyakubunhaikkennnishikazu",
+            },
+            {
+                "japanese": "類は友を呼ぶ",
+                "katakana": "ルイハトモヲヨブ",
+                "romaji": "ruihatomowoyobu",
+            },
         ]
 
-        self.words = self.default_words.copy()
+        # ゲームのルールは TypingEngine が持ち、このクラスは入力と表示を担当する
+        self.engine = TypingEngine(self.default_words.copy(), rng=random.Random(seed))
+        if adaptive:
+            # 苦手なローマ字の並びを多く含む課題文を優先して出す
+            self.engine.selector = AdaptiveSelector(len(self.engine.players), self.engine.rng)
         self.openai_client = None
         self.setup_openai()
 
+        # 課題文生成用のバックグラウンドワーカー
+        self.generation_worker = GenerationWorker()
+        self.generation_poll_job = None
+
+        # 生成済み課題文のローカルキャッシュ
+        self.sentence_cache = None
+        self.setup_sentence_cache()
+
+        # 課題文パック（指定された場合）
+        self.sentence_pack = None
+        self.setup_sentence_pack(pack_path)
+
         # ユーザータイプ選択（refresh_wordsより前に初期化）
         self.selected_user_type = "12歳"  # デフォルト値
-        self.current_word_data = None
-        self.current_romaji = ""
-
-        # Player 1 (小文字)
-        self.p1_score = 0
-        self.p1_words_typed = 0
-        self.p1_current_position = 0
-        self.p1_correct_chars = 0
-        self.p1_total_chars = 0
-        self.p1_perfect_typing = True  # 現在の文章でパーフェクトタイピング中かどうか
-        self.p1_perfect_count = 0  # パーフェクトタイピング回数
-
-        # Player 2 (大文字)
-        self.p2_score = 0
-        self.p2_words_typed = 0
-        self.p2_current_position = 0
-        self.p2_correct_chars = 0
-        self.p2_total_chars = 0
-        self.p2_perfect_typing = True  # 現在の文章でパーフェクトタイピング中かどうか
-        self.p2_perfect_count = 0  # パーフェクトタイピング回数
+        if not self.load_pack_words():
+            self.load_cached_words()
+
+        # 残りの課題文が少なくなったらバックグラウンドで補充する
+        self.prefetcher = SentencePrefetcher(self.root, self.engine, self.fetch_more_words)
 
         # ゲーム共通
-        self.start_time = 0
         self.game_active = False
         self.game_duration = 60  # デフォルト60秒間
         self.selected_duration = 60  # 選択可能な時間
-        self.timer_job = None
-        self.countdown_job = None
-        self.countdown_value = 3
 
-        # 使用済み文章の追跡（1ゲーム内で重複を防ぐ）
-        self.used_sentences = set()
+        # カウントダウン・残り時間・ゲーム終了は1つの単調時計で管理
+        self.game_clock = GameClock(
+            self.root,
+            on_countdown=self.show_countdown,
+            on_start=self.actual_start_game,
+            on_second=self.update_timer,
+            on_end=self.on_time_up,
+        )
+
+        # 表示更新はフレーム単位でまとめて行う
+        self.render_scheduler = RenderScheduler(self.root)
+        self.timer_text = ""
+        self.remaining_seconds = None
+
+        # 入力遅延の計測（--latency-hud 指定時のみ）
+        self.latency_hud = latency_hud
+        self.latency_monitor = None
+
+        # キー入力（--input evdev ならキーボードごとにプレイヤーを割り当てる）
+        # LAN 対戦のホストでは、Tk の入力はすべて Player 1 の入力にする
+        self.input_backend = self.setup_input(
+            input_kind, keyboards, local_player=0 if host_port is not None else None
+        )
 
         self.setup_ui()
+        self.render_scheduler.register("word", self.update_word_display)
+        self.render_scheduler.register("scores", self.update_score_labels)
+        self.render_scheduler.register("stats", self.update_stats)
+        self.render_scheduler.register("timer", self.update_timer_label)
         self.hide_word()
 
+        # LAN 対戦（--host / --connect 指定時のみ）
+        self.netplay_host = None
+        self.netplay_client = None
+        self.setup_netplay(host_port, connect)
+
+        # 観戦者への配信（--spectate 指定時のみ）
+        self.spectator_feed = None
+        self.setup_spectator(spectate_port)
+
+        # 大会モード（--tournament 指定時のみ）
+        self.tournament = None
+        self.setup_tournament(tournament_players, tournament_format, event_name)
+
+        # ウィンドウを閉じたら、入力デバイスや通信のスレッドを止めてから終了する
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    @property
+    def words(self):
+        return self.engine.words
+
+    @words.setter
+    def words(self, words):
+        self.engine.set_words(words)
+
+    def setup_input(self, input_kind, keyboards, local_player=None):
+        try:
+            backend = create_input_backend(
+                input_kind, self.root, self.handle_key, keyboards, local_player
+            )
+        except (OSError, RuntimeError) as e:
+            print(f"Input backend {input_kind!r} unavailable ({e}), using Tk key events")
+            return create_input_backend("tk", self.root, self.handle_key, player=local_player)
+
+        player_count = len(self.engine.players)
+        if backend.player_count > player_count:
+            print(
+                f"{backend.player_count} keyboards found for {player_count} players"
+                f" (extra keyboards are ignored)"
+            )
+        elif backend.player_count < player_count and local_player is None:
+            # LAN 対戦のホストでなければ足りないプレイヤーの入力がどこからも来ない
+            # （grab したキーボードの入力は Tk にも届かない）
+            backend.stop()
+            print(
+                f"Input backend {input_kind!r}: {backend.player_count} keyboard(s) found"
+                f" for {player_count} players, using Tk key events"
+            )
+            return create_input_backend("tk", self.root, self.handle_key)
+        return backend
+
+    def on_close(self):
+        """入力バックエンド（grab したキーボード）や LAN 対戦・観戦の通信を止めて終了する"""
+        self.game_clock.cancel()
+        self.render_scheduler.cancel()
+        self.generation_worker.cancel()
+        self.prefetcher.cancel()
+        self.input_backend.stop()
+        if self.netplay_host is not None:
+            self.netplay_host.stop()
+        if self.netplay_client is not None:
+            self.netplay_client.stop()
+        if self.spectator_feed is not None:
+            self.spectator_feed.cancel()
+            self.spectator_feed.server.stop()
+        self.root.destroy()
+
+    def setup_netplay(self, host_port, connect):
+        """LAN 対戦のホストとして待ち受けるか、ホストに接続する"""
+        player_count = len(self.engine.players)
+        if host_port is not None:
+            # 手元の入力で使わないプレイヤーを、接続してきた順に割り当てる
+            host = NetplayHost(
+                self.root,
+                self.handle_key,
+                player_count,
+                first_player=self.input_backend.player_count,
+                port=host_port,
+            )
+            try:
+                host.start()
+            except OSError as e:
+                print(f"Netplay: cannot listen on port {host_port}: {e}")
+                return
+            print(f"Netplay: hosting on port {host.port}")
+            self.netplay_host = host
+
+        elif connect is not None:
+            address, _, port = connect.rpartition(":")
+            if not address:
+                address, port = connect, DEFAULT_PORT
+            client = NetplayClient(self.root, address, int(port), self.on_netplay_message)
+            try:
+                client.start()
+            except OSError as e:
+                print(f"Netplay: {e}")
+                return
+            print(f"Netplay: connected to {address}:{port}")
+            self.netplay_client = client
+
+            # 試合の状態はホストから届く差分で再現する（開始もホストが行う）
+            self.engine = MirrorEngine(self.engine.words, player_count, self.engine.rng)
+            self.prefetcher.engine = self.engine
+            self.start_button.config(state="disabled")
+
+    def setup_tournament(self, players, format, event_name):
+        """大会を始めて、最初の対戦を表示する"""
+        if not players:
+            return
+        if self.netplay_client is not None:
+            print("Tournament: results are recorded by the host, ignoring --tournament")
+            return
+
+        if event_name is None:
+            event_name = time.strftime("Tournament %Y-%m-%d %H:%M")
+        try:
+            store = ResultsStore()
+            self.tournament = Tournament(store, event_name, players, format)
+        except (ValueError, OSError, sqlite3.Error) as e:
+            print(f"Tournament unavailable: {e}")
+            return
+        print(f"Tournament: {event_name!r} ({format}, {len(players)} players)")
+        self.show_next_match()
+
+    def show_next_match(self):
+        """大会の次の対戦をプレイヤー名とタイマーの位置に表示する"""
+        match = self.tournament.current
+        if match is None:
+            self.p1_title_label.config(text="PLAYER 1")
+            self.p2_title_label.config(text="PLAYER 2")
+            return
+
+        round, name1, name2 = match
+        self.p1_title_label.config(text=f"PLAYER 1: {name1}")
+        self.p2_title_label.config(text=f"PLAYER 2: {name2}")
+        if not self.game_active:
+            self.timer_label.config(text=self.match_text(match))
+
+    def match_text(self, match):
+        round, name1, name2 = match
+        remaining = self.tournament.remaining_matches
+        return f"第{round}回戦（残り{remaining}試合）\n{name1} vs {name2}"
+
+    def record_tournament_match(self):
+        """大会の対戦結果を保存し、順位表を表示して次の対戦に進む
+
+        勝った方のプレイヤー番号（引き分けなら None）を返す。
+        """
+        stats = [
+            {
+                "score": player.score,
+                "cpm": player.correct_chars / self.game_duration * 60,
+                "accuracy": player.accuracy,
+                "perfect_count": player.perfect_count,
+                "words_typed": player.words_typed,
+            }
+            for player in self.engine.players
+        ]
+        winner = self.tournament.winner(stats)
+        try:
+            self.tournament.record(stats, self.selected_user_type, self.game_duration)
+            print(format_leaderboard(self.tournament.leaderboard()))
+        except sqlite3.Error as e:
+            print(f"Failed to record tournament result: {e}")
+        self.show_next_match()
+        return winner
+
+    def setup_spectator(self, port):
+        """観戦者への配信を開始する"""
+        if port is None:
+            return
+        server = SpectatorServer(port)
+        try:
+            server.start()
+        except OSError as e:
+            print(f"Spectator: cannot listen on port {port}: {e}")
+            return
+        print(f"Spectator: broadcasting on port {server.port}")
+        self.spectator_feed = SpectatorFeed(self.root, self.spectator_snapshot, server)
+
+    def spectator_snapshot(self):
+        """観戦者に配信する試合の様子"""
+        engine = self.engine
+        word = engine.current_word_data
+        return {
+            "active": self.game_active,
+            "remaining": self.remaining_seconds if self.game_active else None,
+            "sentence": word["japanese"] if word else None,
+            "players": [
+                {
+                    "score": player.score,
+                    "romaji": engine.romaji_for(i),
+                    "position": player.current_position,
+                    "words": player.words_typed,
+                    "accuracy": round(player.accuracy, 1),
+                    "perfect": player.perfect_count,
+                }
+                for i, player in enumerate(engine.players)
+            ],
+            "leaders": engine.leaders(),
+        }
+
+    def mark_spectators_dirty(self):
+        # 配信はフレームレートの上限までまとめて行う
+        if self.spectator_feed is not None:
+            self.spectator_feed.mark_dirty()
+
+    def on_netplay_message(self, kind, *args):
+        """LAN 対戦のホストからメッセージが届いた（クライアントのみ）"""
+        if self.engine.apply(kind, *args):
+            self.render_scheduler.mark_dirty("word", "scores", "stats")
+            self.mark_spectators_dirty()
+
+        if kind == "welcome":
+            player, player_count = args
+            print(f"Netplay: joined as player {player + 1} of {player_count}")
+        elif kind == "start":
+            duration, countdown = args
+            self.game_duration = duration
+            self.start_game(countdown)
+        elif kind == "end":
+            # 試合の途中で接続した場合は、次の試合から参加する
+            if self.game_active or self.game_clock.running:
+                self.game_clock.cancel()
+                self.end_game()
+        elif kind == "disconnected":
+            error = args[0]
+            print(f"Netplay: disconnected from host ({error or 'closed'})")
+            self.game_clock.cancel()
+            if self.game_active:
+                self.end_game()
+
     def setup_openai(self):
         api_key = os.getenv("OPENAI_API_KEY")
         if api_key:
             try:
-                self.openai_client = OpenAI(api_key=api_key)
+                # 接続の共有・タイムアウト・リトライ・サーキットブレーカー付きのクライアント
+                self.openai_client = ApiClient(api_key=api_key)
             except Exception as e:
                 print(f"OpenAI setup failed: {e}")
                 self.openai_client = None
 
-    def generate_sentences_with_openai(self, user_type=None):
-        """Generate sentences using the prompt from prompt.py with structured output"""
-        if not self.openai_client:
-            return []
-
-        # デフォルトまたは選択されたユーザータイプを使用
-        if user_type is None:
-            user_type = self.selected_user_type
+    def setup_sentence_cache(self):
+        try:
+            self.sentence_cache = SentenceCache()
+        except (OSError, sqlite3.Error) as e:
+            print(f"Sentence cache setup failed: {e}")
+            self.sentence_cache = None
 
+    def setup_sentence_pack(self, path):
+        if not path:
+            return
         try:
-            prompt = get_kadai_list_creation_prompt(user_type)
+            self.sentence_pack = SentencePack(path)
+            print(f"Opened sentence pack {path} ({len(self.sentence_pack):,} sentences)")
+        except (OSError, ValueError) as e:
+            print(f"Sentence pack setup failed: {e}")
+            self.sentence_pack = None
+
+    def load_pack_words(self):
+        """課題文パックに選択中のユーザータイプの課題文があれば使用する"""
+        if not self.sentence_pack:
+            return False
+
+        section = self.sentence_pack.select(self.selected_user_type)
+        if not section:
+            return False
+
+        # 課題文は山札から引かれたときに初めてファイルから読み出される
+        self.words = section
+        print(f"Using {len(section):,} pack sentences for {self.selected_user_type}")
+        return True
+
+    def load_cached_words(self):
+        """キャッシュ済みの課題文があれば起動時から使用する"""
+        if not self.sentence_cache:
+            return
 
-            response = self.openai_client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.7,
-                max_tokens=2000,
+        cached_words = self.sentence_cache.get(self.selected_user_type)
+        if cached_words:
+            self.words = cached_words
+            print(
+                f"Loaded {len(cached_words)} cached sentences for {self.selected_user_type}"
             )
 
-            content = response.choices[0].message.content.strip()
+    def generate_sentences_with_openai(
+        self, user_type=None, use_cache=True, on_progress=None
+    ):
+        """Generate sentences using the prompt from prompt.py with structured output
 
-            print(response.choices[0].message.content)
+        Cached sentences for the user type are returned without calling the API.
+        When on_progress is given the completion is streamed and each sentence is
+        passed to on_progress as soon as its JSON object is complete.
+        """
+        # デフォルトまたは選択されたユーザータイプを使用
+        if user_type is None:
+            user_type = self.selected_user_type
 
-            if content.startswith("```json"):
-                content = content[7:-3].strip()
-            elif content.startswith("```"):
-                content = content[3:-3].strip()
+        if use_cache and self.sentence_cache:
+            cached_words = self.sentence_cache.get(user_type)
+            if cached_words:
+                print(f"Using {len(cached_words)} cached sentences for {user_type}")
+                return cached_words
 
-            data = json.loads(content)
-            sentences = data.get("sentences", [])
+        if not self.openai_client:
+            return []
 
-            # Convert to the format expected by the game
-            words = []
-            for item in sentences:
-                sentence = item.get("sentence", "").replace("、", "")
-                katakana = item.get("katakana", "").replace("、", "")
-                romaji = katakana_to_romaji(katakana)
+        try:
+            prompt = get_kadai_list_creation_prompt(user_type)
 
-                # Exclude sentences containing "ー" (long vowel mark)
-                if sentence and romaji and "ー" not in sentence:
-                    words.append({"japanese": sentence, "romaji": romaji})
+            if on_progress is not None:
+                words, finished = self.stream_sentences(prompt, on_progress)
+            else:
+                response = self.openai_client.create_chat_completion(
+                    model=MODEL,
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=0.7,
+                    max_tokens=2000,
+                )
+
+                content = response.choices[0].message.content
+
+                print(content)
+
+                # Convert to the format expected by the game
+                # （同じ応答内で内容が重複する課題文は1つにまとめる）
+                seen = DedupIndex()
+                words = []
+                for item in parse_response(content):
+                    word = make_word(item)
+                    if word and seen.add(word):
+                        words.append(word)
+                finished = True
+
+            # キャンセルや途中で切れた応答の一部は、全件としてキャッシュしない
+            if words and finished and self.sentence_cache:
+                self.sentence_cache.put(user_type, words)
 
             return words
 
+        except CircuitOpenError as e:
+            print(f"OpenAI sentence generation skipped: {e}")
+            return self.fallback_words(user_type)
         except Exception as e:
             print(f"OpenAI sentence generation failed: {e}")
+            return self.fallback_words(user_type)
+
+    def fallback_words(self, user_type):
+        """API が使えないときの課題文（キャッシュ、なければデフォルトの課題文）"""
+        if self.sentence_cache:
+            cached_words = self.sentence_cache.get(user_type)
+            if cached_words:
+                print(f"Falling back to {len(cached_words)} cached sentences")
+                return cached_words
+        print("Falling back to default sentences")
+        return self.default_words.copy()
+
+    def stream_sentences(self, prompt, on_progress):
+        """応答をストリーミングで受け取り、課題文が1つ届くごとに on_progress に渡す
+
+        (課題文のリスト, 応答を最後まで受け取ったか) を返す。キャンセルされた場合や、
+        応答が長さの上限などで途中で終わった場合は False。
+        """
+        stream = self.openai_client.create_chat_completion(
+            model=MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.7,
+            max_tokens=2000,
+            stream=True,
+        )
+
+        parser = ObjectStreamParser()
+        seen = DedupIndex()
+        words = []
+        finished = False
+        try:
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                choice = chunk.choices[0]
+                if choice.finish_reason is not None:
+                    finished = choice.finish_reason == "stop"
+                delta = choice.delta.content
+                if not delta:
+                    continue
+                for item in parser.feed(delta):
+                    word = make_word(item)
+                    if not word or not seen.add(word):
+                        continue
+                    words.append(word)
+                    # キャンセルされたら残りは受け取らない
+                    if on_progress(word) is False:
+                        return words, False
+        except openai.APIError:
+            # 応答の開始は成功として記録されているので、途中の切断を失敗として数える
+            self.openai_client.stream_failed()
+            raise
+        finally:
+            stream.close()
+
+        print(parser.text)
+        return words, finished
+
+    def fetch_more_words(self, user_type, known):
+        """プリフェッチ用に、known（DedupIndex）にない課題文をキャッシュまたは API から取得する
+
+        バックグラウンドスレッドで実行される。
+        """
+        if self.sentence_cache:
+            fresh = [
+                word
+                for word in self.sentence_cache.get(user_type)
+                if word not in known
+            ]
+            if fresh:
+                return fresh
+
+        if not self.openai_client:
             return []
+        words = self.generate_sentences_with_openai(user_type, use_cache=False)
+        return [word for word in words if word not in known]
 
     def refresh_words(self):
-        if self.openai_client:
-            new_words = self.generate_sentences_with_openai()
+        # キャッシュを優先し、なければ OpenAI で生成
+        new_words = self.generate_sentences_with_openai()
 
-            if new_words:
-                self.words = new_words
-                print(f"Added {len(new_words)} new words from OpenAI")
-            else:
-                self.words = self.default_words.copy()
-                print("Using default words (OpenAI generation failed)")
+        if new_words:
+            self.words = new_words
+            print(f"Added {len(new_words)} new words")
+        elif self.openai_client:
+            self.words = self.default_words.copy()
+            print("Using default words (OpenAI generation failed)")
         else:
             self.words = self.default_words.copy()
             print("Using default words (OpenAI not available)")
@@ -174,19 +633,62 @@ class VsTypingDojo:
         if hasattr(self, "refresh_sentences_button"):
             self.refresh_sentences_button.config(text="取得中...", state="disabled")
 
-        def do_refresh():
-            if self.openai_client:
-                new_words = self.generate_sentences_with_openai()
-                if new_words:
-                    self.words = new_words + self.default_words
-                    print(f"Added {len(new_words)} new sentences from OpenAI")
-                else:
-                    print("Sentence generation failed")
+        def on_done(new_words, error):
+            if error:
+                print(f"Sentence generation failed: {error}")
+            elif new_words:
+                self.words = DedupIndex().filter(new_words + self.default_words)
+                print(f"Added {len(new_words)} new sentences from OpenAI")
+            else:
+                print("Sentence generation failed")
 
             if hasattr(self, "refresh_sentences_button"):
                 self.refresh_sentences_button.config(text="新しい課題", state="normal")
 
-        self.root.after(100, do_refresh)
+        if self.openai_client or self.sentence_cache:
+            self.run_generation(self.selected_user_type, on_done)
+        else:
+            on_done([], None)
+
+    def run_generation(self, user_type, on_done, on_sentence=None):
+        """課題文生成をバックグラウンドで実行し、完了をメインループで受け取る
+
+        on_sentence を指定すると応答をストリーミングし、課題文が1つ届くごとに
+        メインループで on_sentence(word) を呼ぶ。
+        """
+        self.generation_worker.submit(
+            self.generate_sentences_with_openai,
+            user_type,
+            on_done=on_done,
+            on_progress=on_sentence,
+        )
+        self.schedule_generation_poll()
+
+    def schedule_generation_poll(self):
+        if self.generation_poll_job is None:
+            self.generation_poll_job = self.root.after(50, self.poll_generation)
+
+    def poll_generation(self):
+        """ワーカーの結果キューを取り出す（メインループ上で実行）"""
+        self.generation_poll_job = None
+        self.generation_worker.poll()
+        if self.generation_worker.is_busy():
+            self.schedule_generation_poll()
+
+    def cancel_generation(self):
+        """実行中の課題文生成をキャンセル"""
+        if self.generation_poll_job:
+            self.root.after_cancel(self.generation_poll_job)
+            self.generation_poll_job = None
+
+        if self.generation_worker.cancel():
+            print("Sentence generation cancelled")
+
+        self.generate_button.config(text="課題文生成", state="normal")
+        if hasattr(self, "generate_start_button"):
+            self.generate_start_button.config(text="生成開始", state="normal")
+        if hasattr(self, "generate_batch_button"):
+            self.generate_batch_button.config(text="全年齢生成", state="normal")
 
     def setup_ui(self):
         # タイマー表示
@@ -204,24 +706,38 @@ class VsTypingDojo:
         )
         self.timer_label.pack(expand=True)
 
+        # 入力遅延 HUD（タイマーの右側）
+        if self.latency_hud:
+            latency_label = tk.Label(
+                timer_frame,
+                text="",
+                font=("Arial", 9),
+                bg="#1a1a2e",
+                fg="#888",
+                justify="right",
+            )
+            latency_label.place(relx=1.0, rely=0.5, x=-10, anchor="e")
+            self.latency_monitor = LatencyMonitor(self.root, latency_label)
+
         # Player 1 エリア
         p1_main_frame = tk.Frame(self.root, bg="#1a1a2e", height=200)
         p1_main_frame.pack(fill="x", pady=5)
         p1_main_frame.pack_propagate(False)
 
-        # Player 1 タイトル
-        tk.Label(
+        # Player 1 タイトル（大会モードではプレイヤー名も表示）
+        self.p1_title_label = tk.Label(
             p1_main_frame,
             text="PLAYER 1",
             font=("Arial", 12, "bold"),
             bg="#1a1a2e",
             fg="#4CAF50",
-        ).pack(pady=2)
+        )
+        self.p1_title_label.pack(pady=2)
 
         # Player 1 スコア
         self.p1_score_label = tk.Label(
             p1_main_frame,
-            text=f"スコア: {self.p1_score}",
+            text="スコア: 0",
             font=("Arial", 12, "bold"),
             bg="#1a1a2e",
             fg="#4CAF50",
@@ -235,9 +751,7 @@ class VsTypingDojo:
         p1_word_frame.pack(pady=5, padx=50, fill="x")
         p1_word_frame.pack_propagate(False)
 
-        self.p1_char_frame = tk.Frame(p1_word_frame, bg="#16213e")
-        self.p1_char_frame.pack(expand=True)
-        self.p1_char_labels = []
+        self.p1_word_canvas = WordCanvas(p1_word_frame)
 
         # Player 1 統計
         self.p1_stats_label = tk.Label(
@@ -253,19 +767,20 @@ class VsTypingDojo:
         p2_main_frame.pack(fill="x", pady=5)
         p2_main_frame.pack_propagate(False)
 
-        # Player 2 タイトル
-        tk.Label(
+        # Player 2 タイトル（大会モードではプレイヤー名も表示）
+        self.p2_title_label = tk.Label(
             p2_main_frame,
             text="PLAYER 2",
             font=("Arial", 12, "bold"),
             bg="#1a1a2e",
             fg="#2196F3",
-        ).pack(pady=2)
+        )
+        self.p2_title_label.pack(pady=2)
 
         # Player 2 スコア
         self.p2_score_label = tk.Label(
             p2_main_frame,
-            text=f"スコア: {self.p2_score}",
+            text="スコア: 0",
             font=("Arial", 12, "bold"),
             bg="#1a1a2e",
             fg="#2196F3",
@@ -279,9 +794,7 @@ class VsTypingDojo:
         p2_word_frame.pack(pady=5, padx=50, fill="x")
         p2_word_frame.pack_propagate(False)
 
-        self.p2_char_frame = tk.Frame(p2_word_frame, bg="#16213e")
-        self.p2_char_frame.pack(expand=True)
-        self.p2_char_labels = []
+        self.p2_word_canvas = WordCanvas(p2_word_frame)
 
         # Player 2 統計
         self.p2_stats_label = tk.Label(
@@ -353,10 +866,8 @@ class VsTypingDojo:
         self.user_type_buttons_frame.pack(pady=(3, 0))
 
         self.user_type_var = tk.StringVar(value=self.selected_user_type)
-        user_types = ["7歳", "12歳", "15歳", "18歳", "20歳以上"]
-
         self.user_type_radios = []
-        for user_type in user_types:
+        for user_type in USER_TYPES:
             rb = tk.Radiobutton(
                 self.user_type_buttons_frame,
                 text=user_type,
@@ -438,8 +949,8 @@ class VsTypingDojo:
         )
         self.generate_button.pack(side="left", padx=5)
 
-        # キーボードイベントをrootにバインド
-        self.root.bind("<KeyPress>", self.on_key_press)
+        # キー入力の受け付けを開始
+        self.input_backend.start()
         self.root.focus_set()
         self.update_displays()
 
@@ -451,6 +962,7 @@ class VsTypingDojo:
         )
         self.selected_user_type = new_user_type
         print(f"User type changed to: {self.selected_user_type}")
+        self.load_pack_words()
 
     def on_duration_change(self):
         """タイマー時間変更時のコールバック"""
@@ -499,6 +1011,24 @@ class VsTypingDojo:
             )
             self.generate_start_button.pack(side="left", padx=(0, 10))
 
+        # 全推奨年齢をまとめて生成するボタンを追加
+        if not hasattr(self, "generate_batch_button"):
+            self.generate_batch_button = tk.Button(
+                self.generate_buttons_frame,
+                text="全年齢生成",
+                font=("Arial", 8, "bold"),
+                bg="#2196F3",
+                fg="black",
+                width=10,
+                height=1,
+                command=self.start_batch_generation,
+                activebackground="#1976D2",
+                activeforeground="white",
+                relief="flat",
+                bd=0,
+            )
+            self.generate_batch_button.pack(side="left", padx=(0, 10))
+
         # キャンセルボタンを追加
         if not hasattr(self, "generate_cancel_button"):
             self.generate_cancel_button = tk.Button(
@@ -509,7 +1039,7 @@ class VsTypingDojo:
                 fg="black",
                 width=10,
                 height=1,
-                command=self.hide_user_type_selection,
+                command=self.on_generate_cancel,
                 activebackground="#da190b",
                 activeforeground="white",
                 relief="flat",
@@ -521,122 +1051,129 @@ class VsTypingDojo:
         """推奨年齢選択UIを非表示"""
         self.user_type_section.pack_forget()
 
+    def on_generate_cancel(self):
+        """キャンセルボタンのコールバック（生成中なら生成も中止）"""
+        self.cancel_generation()
+        self.hide_user_type_selection()
+
     def start_generation(self):
         """実際の生成処理を開始"""
         # 選択されたユーザータイプを更新
         self.selected_user_type = self.user_type_var.get()
+        user_type = self.selected_user_type
 
-        # UIを非表示
-        self.hide_user_type_selection()
+        # ボタンを無効化して処理中表示（キャンセルボタンは生成中も有効）
+        self.generate_button.config(text="生成中...", state="disabled")
+        self.generate_start_button.config(text="生成中...", state="disabled")
+
+        # ストリーミングで届いた課題文（エンジンと同じリストを共有する）
+        streamed = []
+
+        def on_sentence(word):
+            streamed.append(word)
+            if len(streamed) == 1:
+                # 最初の1文が届いた時点で使い始める（以降の課題文は山札に追加される）
+                self.words = streamed
+                self.hide_user_type_selection()
+                print(f"First sentence for {user_type} arrived, ready to play")
+
+        def on_done(new_words, error):
+            if error:
+                print(f"Error generating sentences: {error}")
+            elif streamed:
+                print(f"Generated {len(streamed)} sentences for {user_type}")
+            elif new_words:
+                self.words = new_words
+                print(f"Generated {len(new_words)} sentences for {user_type}")
+            else:
+                print(f"Sentence generation failed for {user_type}")
+
+            # ボタンを元に戻してUIを非表示
+            self.generate_button.config(text="課題文生成", state="normal")
+            self.generate_start_button.config(text="生成開始", state="normal")
+            self.hide_user_type_selection()
+
+        # バックグラウンドスレッドで実行
+        self.run_generation(user_type, on_done, on_sentence)
+
+    def start_batch_generation(self):
+        """全推奨年齢の課題文を並列に生成してキャッシュに保存する"""
+        self.selected_user_type = self.user_type_var.get()
+        user_type = self.selected_user_type
 
-        # ボタンを無効化して処理中表示
         self.generate_button.config(text="生成中...", state="disabled")
+        self.generate_start_button.config(state="disabled")
+        self.generate_batch_button.config(text="生成中...", state="disabled")
 
-        def do_generate():
-            try:
-                new_words = self.generate_sentences_with_openai()
-                if new_words:
-                    self.words = new_words
-                    print(
-                        f"Generated {len(new_words)} sentences for {self.selected_user_type}"
-                    )
-                    # 使用済み文章リストをクリア（新しい課題文セット）
-                    self.used_sentences.clear()
-                else:
-                    print(f"Sentence generation failed for {self.selected_user_type}")
-            except Exception as e:
-                print(f"Error generating sentences: {e}")
+        def on_done(result, error):
+            if error:
+                print(f"Error generating sentences: {error}")
+            else:
+                total = sum(len(words) for words in result.pools.values())
+                print(
+                    f"Generated {total} sentences for {len(result.pools)} user types"
+                    f" in {result.elapsed:.1f} s"
+                )
+                for failed_user_type, failure in result.errors:
+                    print(f"Sentence generation failed for {failed_user_type}: {failure}")
+                if result.pools.get(user_type):
+                    self.words = result.pools[user_type]
 
-            # ボタンを元に戻す
             self.generate_button.config(text="課題文生成", state="normal")
+            self.generate_start_button.config(text="生成開始", state="normal")
+            self.generate_batch_button.config(text="全年齢生成", state="normal")
+            self.hide_user_type_selection()
+
+        # OpenAI クライアントと同じ API キーを使い、結果はワーカーのスレッドでキャッシュに保存
+        self.generation_worker.submit(
+            run_batch_generation,
+            USER_TYPES,
+            1,
+            4,
+            os.getenv("OPENAI_API_KEY"),
+            None,
+            self.sentence_cache,
+            on_done=on_done,
+        )
+        self.schedule_generation_poll()
 
-        # 非同期で実行
-        self.root.after(100, do_generate)
-
-    def start_game(self):
+    def start_game(self, countdown=3):
         if not self.game_active:
             # タイマーの背景色をリセット
             self.timer_label.config(
                 bg="#1a1a2e", fg="#FFC107", relief="flat", bd=0, padx=0, pady=0
             )
 
-            # 単語データもリセット
-            self.current_word_data = None
-            self.current_romaji = ""
-
-            # Player 1 リセット
-            self.p1_score = 0
-            self.p1_words_typed = 0
-            self.p1_current_position = 0
-            self.p1_correct_chars = 0
-            self.p1_total_chars = 0
-            self.p1_perfect_typing = True
-            self.p1_perfect_count = 0
-
-            # Player 2 リセット
-            self.p2_score = 0
-            self.p2_words_typed = 0
-            self.p2_current_position = 0
-            self.p2_correct_chars = 0
-            self.p2_total_chars = 0
-            self.p2_perfect_typing = True
-            self.p2_perfect_count = 0
+            # 単語データとプレイヤーの状態をリセット
+            self.engine.reset()
 
             # 統計表示をクリア
             self.p1_stats_label.config(text="")
             self.p2_stats_label.config(text="")
-            self.p1_words_typed = 0
-            self.p1_correct_chars = 0
-            self.p_total_chars = 0
-            self.p2_words_typed = 0
-            self.p2_correct_chars = 0
-            self.p2_total_chars = 0
 
             self.start_button.config(state="disabled")
-            self.countdown_value = 3
             self.hide_word()
             self.update_displays()
-            self.start_countdown()
+            self.game_clock.start(self.game_duration, countdown)
+            if self.netplay_host is not None:
+                self.netplay_host.game_started(self.game_duration, countdown)
 
     def reset_game(self):
-        if self.timer_job:
-            self.root.after_cancel(self.timer_job)
-            self.timer_job = None
+        # 生成中・補充中の課題文はキャンセル
+        self.cancel_generation()
+        self.prefetcher.cancel()
+        self.hide_user_type_selection()
 
-        if self.countdown_job:
-            self.root.after_cancel(self.countdown_job)
-            self.countdown_job = None
+        # カウントダウン・タイマーを停止
+        self.game_clock.cancel()
+        if self.netplay_host is not None:
+            self.netplay_host.game_ended()
 
         self.game_active = False
-        self.countdown_value = 3  # カウントダウン値をリセット
-
-        # 単語データもリセット
-        self.current_word_data = None
-        self.current_romaji = ""
-
-        # Player 1 リセット
-        self.p1_score = 0
-        self.p1_words_typed = 0
-        self.p1_current_position = 0
-        self.p1_correct_chars = 0
-        self.p1_total_chars = 0
-        self.p1_perfect_typing = True
-        self.p1_perfect_count = 0
-
-        # Player 2 リセット
-        self.p2_score = 0
-        self.p2_words_typed = 0
-        self.p2_current_position = 0
-        self.p2_correct_chars = 0
-        self.p2_total_chars = 0
-        self.p2_perfect_typing = True
-        self.p2_perfect_count = 0
-
-        # 共通リセット
-        self.start_time = 0
-
-        # 使用済み文章リストをリセット
-        self.used_sentences.clear()
+
+        # 単語データ・プレイヤーの状態・使用済み文章リストをリセット（記録は破棄）
+        self.engine.reset()
+        self.engine.recorder = None
 
         # ゲーム時間を60秒にリセット
         self.selected_duration = 60
@@ -647,8 +1184,7 @@ class VsTypingDojo:
         self.selected_user_type = "12歳"
         self.user_type_var.set("12歳")
 
-        self.p1_score_label.config(text=f"スコア: {self.p1_score}")
-        self.p2_score_label.config(text=f"スコア: {self.p2_score}")
+        self.update_score_labels()
 
         # 統計表示をクリア
         self.p1_stats_label.config(text="")
@@ -664,182 +1200,146 @@ class VsTypingDojo:
         self.timer_label.config(
             text="", bg="#1a1a2e", fg="#FFC107", relief="flat", bd=0, padx=0, pady=0
         )
-        self.start_button.config(text="ゲーム開始", state="normal")
+        self.start_button.config(text="ゲーム開始", state=self.start_button_state())
+        self.render_scheduler.cancel()
+        self.mark_spectators_dirty()
         self.hide_word()
         self.update_displays()
+        if self.tournament is not None:
+            self.show_next_match()
+
+    def handle_key(self, player, char, timestamp, event=None):
+        """入力バックエンドから1打鍵を受け取る（player が None なら入力待ちのプレイヤー）"""
+        if self.netplay_client is not None:
+            # LAN 対戦のクライアントはホストに送るだけ（結果はホストから届く）
+            if self.game_active:
+                self.netplay_client.send_key(char)
+            return
 
-    def new_word(self):
-        # 使用可能な文章（まだ使用されていない）を取得
-        available_words = [
-            word for word in self.words if word["japanese"] not in self.used_sentences
-        ]
-
-        # 使用可能な文章がない場合は、すべての文章をリセット
-        if not available_words:
-            self.used_sentences.clear()
-            available_words = self.words.copy()
-            print("All sentences used, resetting for new round")
-
-        # 使用可能な文章から選択
-        if available_words:
-            self.current_word_data = random.choice(available_words)
-            self.current_romaji = self.current_word_data["romaji"]
-
-            # 使用済みリストに追加
-            self.used_sentences.add(self.current_word_data["japanese"])
-
-            self.p1_current_position = 0
-            self.p2_current_position = 0
-
-            # パーフェクトタイピングフラグをリセット
-            self.p1_perfect_typing = True
-            self.p2_perfect_typing = True
-
-            self.update_word_display()
-        else:
-            # フォールバック: リストが空の場合
-            print("No words available")
-
-    def on_key_press(self, event):
         if not self.game_active:
+            if self.netplay_host is not None and player is not None:
+                # 接続しているプレイヤーの打鍵には、試合中でなくても結果を返す
+                self.netplay_host.key_result(player, char, IGNORED)
             return
 
-        # 特殊キーは無視
-        if len(event.char) != 1 or not event.char.isprintable():
+        if player is None:
+            # どのプレイヤーも入力できなければ Player 1 のミスにする
+            player = self.engine.player_expecting(char)
+        elif player >= len(self.engine.players):
             return
 
-        typed_char = event.char
-
-        # Player 1 (小文字 + ハイフン) の入力処理
-        if (
-            typed_char.islower() or typed_char == "-"
-        ) and self.p1_current_position < len(self.current_romaji):
-            correct_char = self.current_romaji[self.p1_current_position].lower()
-            # ハイフンの場合は小文字変換しない
-            if typed_char == "-":
-                correct_char = self.current_romaji[self.p1_current_position]
-
-            self.p1_total_chars += 1
-
-            if typed_char == correct_char:
-                self.p1_correct_chars += 1
-                self.p1_score += 10
-                self.p1_current_position += 1
+        result = self.engine.feed(player, char, timestamp)
+        self.mark_spectators_dirty()
+        if self.netplay_host is not None:
+            self.netplay_host.key_result(player, char, result)
+            if result == COMPLETED:
+                self.netplay_host.sentence(self.engine.current_word_data)
 
-                # Player 1 単語完了チェック
-                if self.p1_current_position >= len(self.current_romaji):
-                    self.p1_words_typed += 1
-                    self.p1_score += 50
-
-                    # パーフェクトタイピングボーナス
-                    if self.p1_perfect_typing:
-                        self.p1_score += 100
-                        self.p1_perfect_count += 1
-
-                    self.new_word()  # どちらか完了で次の単語へ
-
-                self.update_displays()
-            else:
-                # ミスタイプ：パーフェクトタイピングフラグをオフ
-                self.p1_perfect_typing = False
-
-        # Player 2 (大文字 + ハイフン) の入力処理
-        elif (
-            typed_char.isupper() or typed_char == "-"
-        ) and self.p2_current_position < len(self.current_romaji):
-            correct_char = self.current_romaji[self.p2_current_position].upper()
-            # ハイフンの場合は大文字変換しない
-            if typed_char == "-":
-                correct_char = self.current_romaji[self.p2_current_position]
-
-            self.p2_total_chars += 1
-
-            if typed_char == correct_char:
-                self.p2_correct_chars += 1
-                self.p2_score += 10
-                self.p2_current_position += 1
-
-                # Player 2 単語完了チェック
-                if self.p2_current_position >= len(self.current_romaji):
-                    self.p2_words_typed += 1
-                    self.p2_score += 50
-
-                    # パーフェクトタイピングボーナス
-                    if self.p2_perfect_typing:
-                        self.p2_score += 100
-                        self.p2_perfect_count += 1
-
-                    self.new_word()  # どちらか完了で次の単語へ
-
-                self.update_displays()
-            else:
-                # ミスタイプ：パーフェクトタイピングフラグをオフ
-                self.p2_perfect_typing = False
+        if result > MISS:
+            self.render_scheduler.mark_dirty("word", "scores", "stats")
+            if self.latency_monitor:
+                self.latency_monitor.on_key(event, timestamp)
+            if result == COMPLETED:
+                self.prefetcher.check(self.selected_user_type)
 
     def update_displays(self):
         """全表示を更新"""
-        self.p1_score_label.config(text=f"スコア: {self.p1_score}")
-        self.p2_score_label.config(text=f"スコア: {self.p2_score}")
+        self.update_score_labels()
         self.update_stats()
         self.update_word_display()
         # タイマーは別のメソッドで更新されるため、ここでは呼ばない
 
-    def start_countdown(self):
-        """カウントダウン開始"""
-        if self.countdown_value > 0:
-            self.timer_label.config(text=str(self.countdown_value))
-            self.countdown_value -= 1
-            self.countdown_job = self.root.after(1000, self.start_countdown)
-        else:
-            # カウントダウン終了、ゲーム開始
-            self.actual_start_game()
+    def update_score_labels(self):
+        """スコア表示を更新"""
+        p1, p2 = self.engine.players
+        self.p1_score_label.config(text=f"スコア: {p1.score}")
+        self.p2_score_label.config(text=f"スコア: {p2.score}")
+
+    def show_countdown(self, value):
+        """カウントダウン表示"""
+        self.timer_label.config(text=str(value))
 
     def actual_start_game(self):
         """実際のゲーム開始処理"""
         self.game_active = True
-        self.start_time = time.time()
         self.start_button.config(state="disabled")
         self.root.focus_set()
 
-        # 新しいゲーム開始時に使用済み文章をクリア
-        self.used_sentences.clear()
-
-        # パーフェクトカウントをリセット
-        self.p1_perfect_count = 0
-        self.p2_perfect_count = 0
-
-        # 新しいゲーム開始時は統計表示とキャッシュをクリア（start_game()で実行済み）
+        if self.latency_monitor:
+            self.latency_monitor.reset()
 
-        self.new_word()
-        # タイマー表示を開始
-        self.timer_label.config(text=f"残り時間\n{self.game_duration}")
-        # タイマーを開始
-        self.update_timer()
-        self.timer_job = self.root.after(self.game_duration * 1000, self.end_game)
+        if self.netplay_client is not None:
+            # 課題文と打鍵の結果はホストから届く
+            return
 
-    def update_timer(self):
-        """タイマー更新"""
+        # 試合中の打鍵をすべて記録する（終了時にまとめて保存）
+        self.engine.recorder = KeystrokeRecorder(len(self.engine.players))
+
+        # 使用済み文章・プレイヤーの状態をクリアして最初の課題文を選ぶ
+        # （統計表示とキャッシュのクリアは start_game() で実行済み）
+        self.engine.start()
+        if self.netplay_host is not None:
+            self.netplay_host.game_go()
+            self.netplay_host.sentence(self.engine.current_word_data)
+        self.render_scheduler.mark_dirty("word")
+        self.mark_spectators_dirty()
+        self.prefetcher.check(self.selected_user_type)
+
+    def update_timer(self, remaining):
+        """残り時間の表示が変わった（CPM も1秒ごとに更新する）"""
+        self.timer_text = f"残り時間\n{remaining}"
+        self.remaining_seconds = remaining
+        self.render_scheduler.mark_dirty("timer", "stats")
+        self.mark_spectators_dirty()
+
+    def update_timer_label(self):
+        """タイマー表示を更新（ゲーム終了後は結果表示を上書きしない）"""
         if self.game_active:
-            elapsed = time.time() - self.start_time
-            remaining = max(0, self.game_duration - elapsed)
-            timer_text = f"残り時間\n{remaining:.0f}"
-            self.timer_label.config(text=timer_text)
+            self.timer_label.config(text=self.timer_text)
 
-            if remaining > 0:
-                self.root.after(100, self.update_timer)
+    def on_time_up(self):
+        """制限時間になった"""
+        if self.netplay_client is not None:
+            # LAN 対戦のクライアントは、最後の打鍵まで反映したホストの終了を待つ
+            return
+        self.end_game()
 
     def end_game(self):
         """ゲーム終了処理"""
+        # 溜まっている表示更新を反映してから終了する
+        self.render_scheduler.flush()
         self.game_active = False
-        self.start_button.config(text="ゲーム開始", state="normal")
+        self.start_button.config(text="ゲーム開始", state=self.start_button_state())
+        self.save_recording()
+        self.save_latency_samples()
+        self.mark_spectators_dirty()
+
+        if self.netplay_host is not None:
+            self.netplay_host.game_ended()
+            print(f"Netplay: {self.netplay_host.stats.summary()}")
+        if self.netplay_client is not None:
+            print(f"Netplay: {self.netplay_client.stats.summary()}")
+
+        # 勝者決定（大会の対戦なら、トーナメントの同点の判定も含めて大会と同じ勝者にする）
+        p1, p2 = self.engine.players
+        names = ("PLAYER 1", "PLAYER 2")
+        if self.tournament is not None and self.tournament.current is not None:
+            # 結果を保存すると次の対戦に進むので、先にプレイヤー名を取っておく
+            names = self.tournament.current[1:]
+            winner_index = self.record_tournament_match()
+        elif p1.score != p2.score:
+            winner_index = 0 if p1.score > p2.score else 1
+        else:
+            winner_index = None
 
-        # 勝者決定と色設定
-        if self.p1_score > self.p2_score:
-            winner = "PLAYER 1 の勝ち！"
+        # 色設定
+        tiebreak = "（同点のため判定）" if p1.score == p2.score else ""
+        if winner_index == 0:
+            winner = f"{names[0]} の勝ち！{tiebreak}"
             winner_bg_color = "#4CAF50"  # Player 1の緑色
             winner_text_color = "white"
-        elif self.p2_score > self.p1_score:
-            winner = "PLAYER 2 の勝ち！"
+        elif winner_index == 1:
+            winner = f"{names[1]} の勝ち！{tiebreak}"
             winner_bg_color = "#2196F3"  # Player 2の青色
             winner_text_color = "white"
         else:
@@ -849,6 +1349,14 @@ class VsTypingDojo:
 
         # タイマー位置にゲーム結果を表示（色付き背景）
         result_text = f"ゲーム終了\n{winner}"
+        if self.tournament is not None:
+            if self.tournament.current is not None:
+                round, name1, name2 = self.tournament.current
+                result_text += f"　次: {name1} vs {name2}"
+            elif self.tournament.champion is not None:
+                result_text += f"　優勝: {self.tournament.champion}"
+            else:
+                result_text += "　全試合終了"
         self.timer_label.config(
             text=result_text,
             bg=winner_bg_color,
@@ -859,176 +1367,118 @@ class VsTypingDojo:
             pady=10,
         )
 
+    def start_button_state(self):
+        # LAN 対戦のクライアントではホストがゲームを開始する
+        if self.netplay_client is not None:
+            return "disabled"
+        # 大会の全試合が終わったら開始できない
+        if self.tournament is not None and self.tournament.finished:
+            return "disabled"
+        return "normal"
+
+    def save_recording(self):
+        """試合の打鍵記録をファイルに書き出す"""
+        recorder = self.engine.recorder
+        self.engine.recorder = None
+        if recorder is None:
+            return
+
+        try:
+            path = recorder.save()
+            print(f"Saved {len(recorder)} keystrokes to {path}")
+        except OSError as e:
+            print(f"Failed to save keystroke recording: {e}")
+
+    def save_latency_samples(self):
+        """入力遅延の計測結果をファイルに書き出す"""
+        if not self.latency_monitor:
+            return
+
+        try:
+            path = self.latency_monitor.dump()
+        except OSError as e:
+            print(f"Failed to save latency samples: {e}")
+            return
+        if path:
+            print(
+                f"Saved {len(self.latency_monitor.samples)} latency samples to {path}"
+                f" ({self.latency_monitor.dropped_frames} dropped frames)"
+            )
+
     def update_word_display(self):
         """現在の入力位置をハイライト表示"""
-        if not self.current_word_data:
+        word_data = self.engine.current_word_data
+        if not word_data:
             return
 
         # 新しい単語の場合のみ、表示を再構築
         if (
             not hasattr(self, "current_displayed_word")
-            or self.current_displayed_word != self.current_word_data["japanese"]
+            or self.current_displayed_word != word_data["japanese"]
         ):
             self.create_word_display()
-            self.current_displayed_word = self.current_word_data["japanese"]
+            self.current_displayed_word = word_data["japanese"]
         else:
             # 既存の表示の色のみを更新（ちらつき防止）
             self.update_character_colors()
 
+        if self.latency_monitor:
+            self.latency_monitor.on_render()
+
     def create_word_display(self):
         """新しい単語の表示を作成"""
-        # Player 1 の文字表示を再構築
-        for label in self.p1_char_labels:
-            label.destroy()
-        self.p1_char_labels.clear()
-
-        # 日本語表示
-        japanese_label = tk.Label(
-            self.p1_char_frame,
-            text=self.current_word_data["japanese"],
-            font=("Arial", 14, "bold"),
-            bg="#16213e",
-            fg="#eee",
-        )
-        japanese_label.pack(pady=(3, 8))
-        self.p1_char_labels.append(japanese_label)
-
-        # ローマ字表示（文字ごとにハイライト）
-        self.p1_romaji_frame = tk.Frame(self.p1_char_frame, bg="#16213e")
-        self.p1_romaji_frame.pack()
-        self.p1_char_labels.append(self.p1_romaji_frame)
-
-        self.p1_romaji_labels = []
-        for i, char in enumerate(self.current_romaji):
-            label = tk.Label(
-                self.p1_romaji_frame,
-                text=char.lower(),
-                font=("Arial", 16, "bold"),
-                bg="#16213e",
-                fg="#eee",
-                pady=0,
-                padx=1,
-            )
-            label.pack(side="left")
-            self.p1_char_labels.append(label)
-            self.p1_romaji_labels.append(label)
-
-        # Player 2 の文字表示を再構築
-        for label in self.p2_char_labels:
-            label.destroy()
-        self.p2_char_labels.clear()
-
-        # 日本語表示
-        japanese_label2 = tk.Label(
-            self.p2_char_frame,
-            text=self.current_word_data["japanese"],
-            font=("Arial", 14, "bold"),
-            bg="#16213e",
-            fg="#eee",
-        )
-        japanese_label2.pack(pady=(3, 8))
-        self.p2_char_labels.append(japanese_label2)
-
-        # ローマ字表示（文字ごとにハイライト）
-        self.p2_romaji_frame = tk.Frame(self.p2_char_frame, bg="#16213e")
-        self.p2_romaji_frame.pack()
-        self.p2_char_labels.append(self.p2_romaji_frame)
-
-        self.p2_romaji_labels = []
-        for i, char in enumerate(self.current_romaji):
-            label = tk.Label(
-                self.p2_romaji_frame,
-                text=char.lower(),
-                font=("Arial", 16, "bold"),
-                bg="#16213e",
-                fg="#eee",
-                pady=0,
-                padx=1,
-            )
-            label.pack(side="left")
-            self.p2_char_labels.append(label)
-            self.p2_romaji_labels.append(label)
-
-        # 初回色更新
-        self.update_character_colors()
+        japanese = self.engine.current_word_data["japanese"]
+        p1, p2 = self.engine.players
+        self.p1_word_canvas.show(japanese, self.engine.romaji_for(0), p1.current_position)
+        self.p2_word_canvas.show(japanese, self.engine.romaji_for(1), p2.current_position)
 
     def update_character_colors(self):
         """文字の色のみを更新（ちらつき防止）"""
-        if not hasattr(self, "p1_romaji_labels") or not hasattr(
-            self, "p2_romaji_labels"
-        ):
+        if self.engine.automaton is None:
             return
 
-        # Player 1の色更新
-        for i, label in enumerate(self.p1_romaji_labels):
-            if i < self.p1_current_position:
-                color = "#666666"  # ダークグレー（完了）
-            elif i == self.p1_current_position:
-                color = "#FFC107"  # 黄（現在位置）
-            else:
-                color = "#eee"  # 白（未入力）
-            label.config(fg=color)
-
-        # Player 2の色更新
-        for i, label in enumerate(self.p2_romaji_labels):
-            if i < self.p2_current_position:
-                color = "#666666"  # ダークグレー（完了）
-            elif i == self.p2_current_position:
-                color = "#FFC107"  # 黄（現在位置）
-            else:
-                color = "#eee"  # 白（未入力）
-            label.config(fg=color)
+        # 標準と異なる綴りで入力中なら、その綴りに合わせて表示する
+        p1, p2 = self.engine.players
+        self.p1_word_canvas.update(self.engine.romaji_for(0), p1.current_position)
+        self.p2_word_canvas.update(self.engine.romaji_for(1), p2.current_position)
 
     def hide_word(self):
         """単語を非表示にする"""
-        # Player 1 の文字表示をクリア
-        for label in self.p1_char_labels:
-            label.destroy()
-        self.p1_char_labels.clear()
-
-        # Player 2 の文字表示をクリア
-        for label in self.p2_char_labels:
-            label.destroy()
-        self.p2_char_labels.clear()
+        self.p1_word_canvas.clear()
+        self.p2_word_canvas.clear()
 
         # 現在表示中の単語をクリア
         if hasattr(self, "current_displayed_word"):
             delattr(self, "current_displayed_word")
 
+    def stats_text(self, player, now, elapsed_ns):
+        """統計ラベルの文字列（CPM は直近 WINDOW_SECONDS 秒、最高は瞬間最高速度）"""
+        rolling = player.rolling
+        sentence_accuracy = rolling.sentence_accuracy
+        if sentence_accuracy is None:
+            sentence_text = "-"
+        else:
+            sentence_text = f"{sentence_accuracy:.0f}%"
+        return (
+            f"CPM: {rolling.rolling_cpm(now, elapsed_ns):.0f}（直近{WINDOW_SECONDS}秒）"
+            f" | 最高: {rolling.burst_cpm:.0f}"
+            f" | 正確度: {player.accuracy:.1f}%（この文 {sentence_text}）"
+            f" | 単語: {player.words_typed} | パーフェクト: {player.perfect_count}"
+        )
+
     def update_stats(self):
         """統計情報を更新"""
         if not self.game_active:
             return
 
-        elapsed_time = time.time() - self.start_time
+        elapsed_time = self.game_clock.elapsed()
         if elapsed_time > 0:
-            # Player 1 統計
-            p1_cpm = (
-                (self.p1_correct_chars / elapsed_time) * 60
-                if self.p1_correct_chars > 0
-                else 0
-            )
-            p1_accuracy = (
-                (self.p1_correct_chars / self.p1_total_chars) * 100
-                if self.p1_total_chars > 0
-                else 0
-            )
-
-            # Player 2 統計
-            p2_cpm = (
-                (self.p2_correct_chars / elapsed_time) * 60
-                if self.p2_correct_chars > 0
-                else 0
-            )
-            p2_accuracy = (
-                (self.p2_correct_chars / self.p2_total_chars) * 100
-                if self.p2_total_chars > 0
-                else 0
-            )
-
-            # 統計テキストの構築
-            p1_text = f"CPM: {p1_cpm:.1f} | 正確度: {p1_accuracy:.1f}% | 単語: {self.p1_words_typed} | パーフェクト: {self.p1_perfect_count}"
-            p2_text = f"CPM: {p2_cpm:.1f} | 正確度: {p2_accuracy:.1f}% | 単語: {self.p2_words_typed} | パーフェクト: {self.p2_perfect_count}"
+            # 直近の CPM などは打鍵ごとに更新済みなので、ここでは読み出すだけ
+            now = time.monotonic_ns()
+            elapsed_ns = int(elapsed_time * 1_000_000_000)
+            p1, p2 = self.engine.players
+            p1_text = self.stats_text(p1, now, elapsed_ns)
+            p2_text = self.stats_text(p2, now, elapsed_ns)
 
             # 前回の値と比較して、変更がある場合のみ更新
             if not hasattr(self, "_last_p1_stats") or self._last_p1_stats != p1_text:
@@ -1041,6 +1491,92 @@ class VsTypingDojo:
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="VS Typing Dojo")
+    parser.add_argument(
+        "--latency-hud",
+        action="store_true",
+        help="キー入力から描画までの遅延を計測して表示する",
+    )
+    parser.add_argument(
+        "--pack",
+        help="課題文パック（.vtdp）から課題文を出す",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        help="課題文を出す順番の乱数シード（同じ値なら同じ順番になる）",
+    )
+    parser.add_argument(
+        "--adaptive",
+        action="store_true",
+        help="ミスしたり遅かったりしたローマ字の並びを多く含む課題文を優先して出す",
+    )
+    parser.add_argument(
+        "--input",
+        choices=["tk", "evdev"],
+        default="tk",
+        help="キー入力の取得方法（evdev: キーボードごとにプレイヤーを割り当てる、Linux のみ）",
+    )
+    parser.add_argument(
+        "--keyboard",
+        action="append",
+        dest="keyboards",
+        metavar="DEVICE",
+        help="--input evdev で使うキーボード（/dev/input/eventN、指定した順に Player 1, 2）",
+    )
+    parser.add_argument(
+        "--host",
+        type=int,
+        nargs="?",
+        const=DEFAULT_PORT,
+        metavar="PORT",
+        help=f"LAN 対戦のホストになる（既定のポートは {DEFAULT_PORT}）",
+    )
+    parser.add_argument(
+        "--connect",
+        metavar="HOST[:PORT]",
+        help="LAN 対戦のホストに接続して対戦する",
+    )
+    parser.add_argument(
+        "--spectate",
+        type=int,
+        nargs="?",
+        const=SPECTATOR_PORT,
+        metavar="PORT",
+        help=f"試合の様子を観戦者に配信する（既定のポートは {SPECTATOR_PORT}）",
+    )
+    parser.add_argument(
+        "--tournament",
+        nargs="+",
+        metavar="NAME",
+        help="大会モード（参加者の名前をシード順に指定し、対戦を続けて結果を保存する）",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["round-robin", "bracket"],
+        default="round-robin",
+        help="大会の形式（round-robin: 総当たり、bracket: トーナメント）",
+    )
+    parser.add_argument(
+        "--event",
+        help="大会名（順位表で使う、省略すると日時）",
+    )
+    args = parser.parse_args()
+
     root = tk.Tk()
-    game = VsTypingDojo(root)
+    game = VsTypingDojo(
+        root,
+        latency_hud=args.latency_hud,
+        seed=args.seed,
+        pack_path=args.pack,
+        input_kind=args.input,
+        keyboards=args.keyboards,
+        host_port=args.host,
+        connect=args.connect,
+        spectate_port=args.spectate,
+        tournament_players=args.tournament,
+        tournament_format=args.format,
+        event_name=args.event,
+        adaptive=args.adaptive,
+    )
     root.mainloop()
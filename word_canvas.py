@@ -0,0 +1,137 @@
+import tkinter as tk
+import tkinter.font as tkfont
+
+DONE_COLOR = "#666666"  # ダークグレー（完了）
+CURRENT_COLOR = "#FFC107"  # 黄（現在位置）
+PENDING_COLOR = "#eee"  # 白（未入力）
+
+BG_COLOR = "#16213e"
+GLYPH_PADDING = 2  # 旧表示（Label の padx=1）と同じ文字間隔
+
+
+class WordCanvas:
+    """1人分の課題文（日本語＋ローマ字）を1枚の Canvas に描画する
+
+    ローマ字は1文字ずつテキストアイテムとして描画し、入力位置が変わったときは
+    状態が変わった文字だけ色を変える。文章が長くなっても1打鍵あたりの描画コストは一定。
+    """
+
+    def __init__(self, parent):
+        self.canvas = tk.Canvas(parent, bg=BG_COLOR, highlightthickness=0, bd=0)
+        self.canvas.pack(fill="both", expand=True)
+
+        self.japanese_font = tkfont.Font(
+            root=self.canvas, family="Arial", size=14, weight="bold"
+        )
+        self.romaji_font = tkfont.Font(
+            root=self.canvas, family="Arial", size=16, weight="bold"
+        )
+        self._advance_cache = {}
+
+        self.japanese_item = None
+        self.romaji = ""
+        self.position = 0
+        self.glyph_items = []
+        # glyph_x[i] = i 文字目の左端（ローマ字行の先頭からの距離）、末尾は行の幅
+        self.glyph_x = [0]
+        self.line_left = 0
+
+        self.canvas.bind("<Configure>", self.on_resize)
+
+    def _advance(self, char):
+        advance = self._advance_cache.get(char)
+        if advance is None:
+            advance = self.romaji_font.measure(char) + GLYPH_PADDING
+            self._advance_cache[char] = advance
+        return advance
+
+    def _center_x(self):
+        return self.canvas.winfo_width() / 2
+
+    def _color(self, index):
+        if index < self.position:
+            return DONE_COLOR
+        if index == self.position:
+            return CURRENT_COLOR
+        return PENDING_COLOR
+
+    def show(self, japanese, romaji, position=0):
+        """新しい課題文を描画する"""
+        self.clear()
+        center_x = self._center_x()
+        self.japanese_item = self.canvas.create_text(
+            center_x,
+            26,
+            text=japanese,
+            font=self.japanese_font,
+            fill=PENDING_COLOR,
+            tags=("japanese",),
+        )
+        self.position = position
+        self.line_left = center_x
+        self._append_glyphs(romaji, 0)
+        self._recenter()
+
+    def update(self, romaji, position):
+        """入力位置（と、入力中の綴り）の変化を反映する"""
+        if romaji != self.romaji:
+            # 表記ゆれで綴りが変わった場合は、異なる文字以降だけ作り直す
+            common = 0
+            limit = min(len(romaji), len(self.romaji))
+            while common < limit and romaji[common] == self.romaji[common]:
+                common += 1
+            for item in self.glyph_items[common:]:
+                self.canvas.delete(item)
+            del self.glyph_items[common:]
+            del self.glyph_x[common + 1 :]
+            self.romaji = self.romaji[:common]
+            self._append_glyphs(romaji, common)
+            self._recenter()
+
+        if position != self.position:
+            old_position = self.position
+            self.position = position
+            start = min(old_position, position)
+            end = min(max(old_position, position) + 1, len(self.glyph_items))
+            for index in range(start, end):
+                self.canvas.itemconfigure(self.glyph_items[index], fill=self._color(index))
+
+    def _append_glyphs(self, romaji, start):
+        x = self.glyph_x[start]
+        for index in range(start, len(romaji)):
+            char = romaji[index]
+            item = self.canvas.create_text(
+                self.line_left + x,
+                64,
+                text=char.lower(),
+                anchor="w",
+                font=self.romaji_font,
+                fill=self._color(index),
+                tags=("romaji",),
+            )
+            self.glyph_items.append(item)
+            x += self._advance(char)
+            self.glyph_x.append(x)
+        self.romaji = romaji
+
+    def _recenter(self):
+        """ローマ字行を中央揃えにする（行全体を移動するだけで再描画はしない）"""
+        line_left = self._center_x() - self.glyph_x[-1] / 2
+        dx = line_left - self.line_left
+        if dx:
+            self.canvas.move("romaji", dx, 0)
+            self.line_left = line_left
+
+    def on_resize(self, event):
+        if self.japanese_item is not None:
+            self.canvas.coords(self.japanese_item, event.width / 2, 26)
+        self._recenter()
+
+    def clear(self):
+        self.canvas.delete("all")
+        self.japanese_item = None
+        self.romaji = ""
+        self.position = 0
+        self.glyph_items = []
+        self.glyph_x = [0]
+        self.line_left = self._center_x()